@@ -0,0 +1,285 @@
+"""Benchmark the launch hook against offline fixtures.
+
+Builds local bare repositories standing in for ComfyUI and its plugins, a
+synthetic model tree and stubbed AYON server access, then times the
+repository setup, extra model configuration (referenced and copied) and
+`create_package.py` in cold and warm scenarios.
+
+Usage:
+    python benchmarks/bench_launch.py --output results.json
+    python benchmarks/bench_launch.py --compare baseline.json
+
+Results are written as JSON. With `--compare` the medians are compared to
+an earlier result and the exit code is 1 if any scenario got slower than
+`--threshold`.
+"""
+import os
+import sys
+import json
+import copy
+import time
+import shutil
+import logging
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import importlib.util
+from types import SimpleNamespace
+from pathlib import Path
+
+import fixtures
+import stubs
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+PROJECT_NAME = "bench"
+BENCHMARKS = [
+    "clone_repositories",
+    "extra_models_reference",
+    "extra_models_copy",
+    "create_package",
+]
+
+
+def _noop_progress(message: str):
+    pass
+
+
+def import_hook_module():
+    sys.path.insert(0, (REPO_ROOT / "client").as_posix())
+    stubs.install_stubs()
+    from ayon_comfyui.hooks import pre_launch
+
+    return pre_launch
+
+
+class LaunchBench:
+    def __init__(self, root: Path, args: argparse.Namespace):
+        self.root = root
+        self.args = args
+        self.work_root = root / "work_root"
+        self.comfy_root = self.work_root / PROJECT_NAME / "comfyui"
+
+        fixture_root = root / "fixtures"
+        self.comfy_repo = fixtures.create_comfyui_repo(
+            fixture_root, files=args.repo_files, file_size=args.repo_file_size
+        )
+        self.plugin_repos = fixtures.create_plugin_repos(
+            fixture_root,
+            args.plugins,
+            files=max(1, args.repo_files // 10),
+            file_size=args.repo_file_size,
+        )
+        self.models_root = fixtures.create_model_tree(
+            fixture_root / "models", args.model_files, args.model_size
+        )
+        self.hook_module = import_hook_module()
+
+    def _settings(self, copy_to_base: bool = False) -> dict:
+        return fixtures.get_settings(
+            self.comfy_repo,
+            self.plugin_repos,
+            self.models_root,
+            copy_to_base=copy_to_base,
+            max_parallel_clones=self.args.workers,
+            max_parallel_copies=self.args.workers,
+        )
+
+    def _hook(self, settings: dict):
+        stubs.patch_hook_module(
+            self.hook_module, settings, {"work": self.work_root.as_posix()}
+        )
+        hook_cls = self.hook_module.ComfyUIPreLaunchHook
+        hook = hook_cls.__new__(hook_cls)
+        hook.launch_context = SimpleNamespace(data={
+            "app": SimpleNamespace(name=fixtures.FIXTURE_TAG),
+            "project_name": PROJECT_NAME,
+            "project_entity": {"name": PROJECT_NAME, "code": PROJECT_NAME},
+            "env": dict(os.environ),
+        })
+        hook.addon_settings = copy.deepcopy(settings)
+        hook.pre_process(_noop_progress)
+        return hook
+
+    def _reset_checkout(self):
+        shutil.rmtree(self.work_root, ignore_errors=True)
+
+    def _reset_models(self):
+        if not self.comfy_root.exists():
+            self._hook(self._settings()).clone_repositories(_noop_progress)
+        state_dir = self.hook_module.get_state_dir(self.comfy_root)
+        shutil.rmtree(state_dir, ignore_errors=True)
+        state_dir.mkdir()
+        (self.comfy_root / "extra_model_paths.yaml").unlink(missing_ok=True)
+        for model_type in fixtures.MODEL_TYPES:
+            shutil.rmtree(self.comfy_root / "models" / model_type, ignore_errors=True)
+
+    def clone_repositories(self):
+        self._hook(self._settings()).clone_repositories(_noop_progress)
+
+    def _configure_extra_models(self, copy_to_base: bool):
+        hook = self._hook(self._settings(copy_to_base))
+        hook.index_extra_models(_noop_progress)
+        hook.configure_extra_models(_noop_progress)
+
+    def extra_models_reference(self):
+        self._configure_extra_models(copy_to_base=False)
+
+    def extra_models_copy(self):
+        self._configure_extra_models(copy_to_base=True)
+
+    def create_package(self):
+        spec = importlib.util.spec_from_file_location(
+            "create_package", REPO_ROOT / "create_package.py"
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.main(
+            output_dir=(self.root / "package").as_posix(),
+            cache_dir=(self.root / "package_cache").as_posix(),
+        )
+
+    def _reset_package(self):
+        shutil.rmtree(self.root / "package", ignore_errors=True)
+        shutil.rmtree(self.root / "package_cache", ignore_errors=True)
+
+    def get_resets(self) -> dict:
+        return {
+            "clone_repositories": self._reset_checkout,
+            "extra_models_reference": self._reset_models,
+            "extra_models_copy": self._reset_models,
+            "create_package": self._reset_package,
+        }
+
+
+def _time(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def _summarize(runs: list[float]) -> dict:
+    return {
+        "runs": [round(run, 6) for run in runs],
+        "min": round(min(runs), 6),
+        "median": round(statistics.median(runs), 6),
+        "mean": round(statistics.mean(runs), 6),
+    }
+
+
+def run_benchmarks(bench: LaunchBench, names: list[str], repeat: int) -> dict:
+    resets = bench.get_resets()
+    results = {}
+    for name in names:
+        func = getattr(bench, name)
+        reset = resets[name]
+        cold = []
+        for _ in range(repeat):
+            reset()
+            cold.append(_time(func))
+        # the last cold run leaves everything in place for the warm runs
+        warm = [_time(func) for _ in range(repeat)]
+        results[name] = {"cold": _summarize(cold), "warm": _summarize(warm)}
+        print(
+            f"{name:<24} cold {results[name]['cold']['median']:8.3f}s  "
+            f"warm {results[name]['warm']['median']:8.3f}s",
+            file=sys.stderr,
+        )
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """Print median ratios against `baseline`.
+
+    Returns:
+        bool: Whether any scenario is slower than `threshold`.
+    """
+    regressed = False
+    for name, scenarios in results.items():
+        for scenario, summary in scenarios.items():
+            previous = baseline.get("results", {}).get(name, {}).get(scenario)
+            if not previous or not previous["median"]:
+                continue
+            ratio = summary["median"] / previous["median"]
+            flag = ""
+            if ratio > threshold:
+                flag = "  REGRESSION"
+                regressed = True
+            print(
+                f"{name:<24} {scenario:<5} {previous['median']:8.3f}s -> "
+                f"{summary['median']:8.3f}s  x{ratio:.2f}{flag}",
+                file=sys.stderr,
+            )
+    return regressed
+
+
+def get_metadata(args: argparse.Namespace) -> dict:
+    git_version = subprocess.run(
+        ["git", "--version"], capture_output=True, text=True
+    ).stdout.strip()
+    return {
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "git": git_version,
+        "params": {
+            "plugins": args.plugins,
+            "repo_files": args.repo_files,
+            "repo_file_size": args.repo_file_size,
+            "model_files": args.model_files,
+            "model_size": args.model_size,
+            "workers": args.workers,
+            "repeat": args.repeat,
+        },
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plugins", type=int, default=8, help="Number of plugin repositories.")
+    parser.add_argument("--repo-files", type=int, default=200, help="Files in the ComfyUI repository.")
+    parser.add_argument("--repo-file-size", type=int, default=4096, help="Size of repository files in bytes.")
+    parser.add_argument("--model-files", type=int, default=300, help="Number of model files.")
+    parser.add_argument("--model-size", type=int, default=256 * 1024, help="Size of model files in bytes.")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel clones and copies.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario.")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="Benchmarks to run.")
+    parser.add_argument("--output", help="Write results to this file instead of stdout.")
+    parser.add_argument("--compare", help="Earlier result file to compare against.")
+    parser.add_argument(
+        "--threshold", type=float, default=1.2,
+        help="Median ratio above which a scenario counts as regression.",
+    )
+    parser.add_argument("--keep", action="store_true", help="Keep the fixture directory.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    root = Path(tempfile.mkdtemp(prefix="ayon_comfyui_bench_"))
+    try:
+        bench = LaunchBench(root, args)
+        results = {
+            **get_metadata(args),
+            "results": run_benchmarks(bench, args.only or BENCHMARKS, args.repeat),
+        }
+    finally:
+        if args.keep:
+            print(f"Fixtures kept in {root}", file=sys.stderr)
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    content = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(content)
+    else:
+        print(content)
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if compare(results["results"], baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""Offline fixtures for the launch benchmarks."""
+import os
+import random
+import subprocess
+from pathlib import Path
+
+FIXTURE_TAG = "v1.0"
+MODEL_TYPES = ["checkpoints", "loras", "vae"]
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "bench",
+    "GIT_AUTHOR_EMAIL": "bench@localhost",
+    "GIT_COMMITTER_NAME": "bench",
+    "GIT_COMMITTER_EMAIL": "bench@localhost",
+}
+
+
+def _git(*args, cwd: Path):
+    subprocess.run(
+        ["git", *args],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+        env={**os.environ, **GIT_ENV},
+    )
+
+
+def create_bare_repo(
+    root: Path,
+    name: str,
+    files: dict[str, bytes],
+    commits: int = 3,
+    tag: str = FIXTURE_TAG,
+) -> Path:
+    """Create a bare repository `name.git` in `root` with a tagged history.
+
+    Returns:
+        Path: Path of the bare repository, usable as clone url.
+    """
+    work = root / "work" / name
+    work.mkdir(parents=True)
+    _git("init", "-q", cwd=work)
+    for commit in range(commits):
+        for rel_path, content in files.items():
+            path = work / rel_path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(content + f"\n# revision {commit}\n".encode())
+        _git("add", "-A", cwd=work)
+        _git("commit", "-q", "-m", f"revision {commit}", cwd=work)
+    _git("tag", tag, cwd=work)
+
+    bare = root / "remotes" / f"{name}.git"
+    bare.parent.mkdir(parents=True, exist_ok=True)
+    _git("clone", "-q", "--bare", work.as_posix(), bare.as_posix(), cwd=root)
+    return bare
+
+
+def _source_files(count: int, size: int, rng: random.Random) -> dict[str, bytes]:
+    return {
+        f"src/module_{index}.py": rng.randbytes(size).hex().encode()[:size]
+        for index in range(count)
+    }
+
+
+def create_comfyui_repo(root: Path, files: int = 200, file_size: int = 4096) -> Path:
+    rng = random.Random(0)
+    repo_files = _source_files(files, file_size, rng)
+    repo_files.update({
+        "main.py": b"print('ComfyUI')\n",
+        "requirements.txt": b"numpy\npillow\n",
+        "extra_model_paths.yaml.example": b"comfyui:\n  base_path: .\n",
+        # what ComfyUI ignores of the files the launcher creates
+        ".gitignore": b"/custom_nodes/\n/models/\nextra_model_paths.yaml\n.venv/\n*.log\n",
+    })
+    return create_bare_repo(root, "ComfyUI", repo_files)
+
+
+def create_plugin_repos(
+    root: Path, count: int, files: int = 20, file_size: int = 4096
+) -> list[Path]:
+    rng = random.Random(1)
+    repos = []
+    for index in range(count):
+        repo_files = _source_files(files, file_size, rng)
+        repo_files["requirements.txt"] = f"package-{index}\n".encode()
+        repos.append(create_bare_repo(root, f"plugin_{index}", repo_files))
+    return repos
+
+
+def create_model_tree(root: Path, files: int, file_size: int) -> Path:
+    """Spread `files` models of `file_size` bytes over the model types."""
+    rng = random.Random(2)
+    for index in range(files):
+        model_type = MODEL_TYPES[index % len(MODEL_TYPES)]
+        path = root / model_type / f"group_{index % 7}" / f"model_{index}.safetensors"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(rng.randbytes(file_size))
+    return root
+
+
+def get_settings(
+    comfy_repo: Path,
+    plugin_repos: list[Path],
+    models_root: Path,
+    copy_to_base: bool = False,
+    max_parallel_clones: int = 4,
+    max_parallel_copies: int = 4,
+) -> dict:
+    """Addon settings matching the server defaults, pointing at the fixtures."""
+    return {
+        "host": "127.0.0.1",
+        "port": 8188,
+        "port_pool_size": 1,
+        "gpu_indices": [],
+        "extra_flags": [],
+        "venv": {
+            "uv_path": "",
+            "python_version": "3.12",
+            "use_torch_nightly": False,
+            "lock_dependencies": False,
+            "torch_indices": [],
+        },
+        "repositories": {
+            "base_template": "{root[work]}/{project[name]}/comfyui",
+            "base_url": comfy_repo.as_posix(),
+            "base_depth": 0,
+            "base_blob_filter": False,
+            "max_parallel_clones": max_parallel_clones,
+            "mirror": {"enabled": False},
+            "plugins": [
+                {
+                    "url": repo.as_posix(),
+                    "tag": FIXTURE_TAG,
+                    "name": "",
+                    "depth": 0,
+                    "blob_filter": False,
+                    "extra_dependencies": [],
+                }
+                for repo in plugin_repos
+            ],
+        },
+        "extra_models": {
+            "enabled": True,
+            "dir_template": models_root.as_posix(),
+            "sources": [],
+            "local_cache": {"enabled": False},
+            "verify": {"enabled": False},
+            "downloads": {"enabled": False, "models": []},
+            "copy_to_base": copy_to_base,
+            "link_mode": "copy",
+            "sync_deletions": False,
+            "max_parallel_copies": max_parallel_copies,
+            "watch_changes": False,
+            "store": {"enabled": False},
+        },
+        "caching": {"enabled": False, "cache_dir_template": ""},
+    }
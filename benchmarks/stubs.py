@@ -0,0 +1,125 @@
+"""Stand-ins for the AYON and Qt modules the launch hook imports.
+
+Stubs are only installed for modules that can't be imported, so the
+benchmarks use the real AYON libraries where available. Everything that
+talks to a server (`ayon_api`, `Anatomy`, template data) is patched on
+the hook module itself by `patch_hook_module`.
+"""
+import sys
+import types
+import logging
+import importlib
+
+
+class StringTemplate:
+    def __init__(self, template: str):
+        self.template = template
+
+    def format_strict(self, data: dict) -> str:
+        return self.template.format_map(data)
+
+    def format(self, data: dict) -> str:
+        return self.format_strict(data)
+
+
+class Logger:
+    @staticmethod
+    def get_logger(name: str) -> logging.Logger:
+        return logging.getLogger(name)
+
+
+class _Hook:
+    hosts = set()
+    launch_types = set()
+
+    def __init__(self, launch_context=None):
+        self.launch_context = launch_context
+
+    @property
+    def data(self):
+        return self.launch_context.data
+
+
+class _ClickWrap:
+    """`click_wrap` decorators leaving the functions untouched."""
+
+    def group(self, *args, **kwargs):
+        def decorator(func):
+            func.command = lambda *args, **kwargs: (lambda command: command)
+            return func
+        return decorator
+
+    def option(self, *args, **kwargs):
+        return lambda func: func
+
+
+class _Qt:
+    """Any attribute access resolves to a usable placeholder class."""
+
+    def __getattr__(self, name):
+        if name == "Signal":
+            return lambda *args, **kwargs: None
+        return type(name, (), {"__init__": lambda self, *args, **kwargs: None})
+
+
+def _module(name: str, **attrs) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    return module
+
+
+def _is_importable(name: str) -> bool:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        return False
+    return True
+
+
+def install_stubs():
+    stubs = {
+        "ayon_core": lambda: _module("ayon_core"),
+        "ayon_core.lib": lambda: _module(
+            "ayon_core.lib", Logger=Logger, StringTemplate=StringTemplate
+        ),
+        "ayon_core.addon": lambda: _module(
+            "ayon_core.addon",
+            AYONAddon=type("AYONAddon", (), {}),
+            IHostAddon=type("IHostAddon", (), {}),
+            click_wrap=_ClickWrap(),
+        ),
+        "ayon_core.pipeline": lambda: _module("ayon_core.pipeline", Anatomy=None),
+        "ayon_core.pipeline.template_data": lambda: _module(
+            "ayon_core.pipeline.template_data", get_template_data=None
+        ),
+        "ayon_applications": lambda: _module(
+            "ayon_applications",
+            PreLaunchHook=_Hook,
+            PostLaunchHook=_Hook,
+            LaunchTypes=types.SimpleNamespace(local="local"),
+        ),
+        "ayon_api": lambda: _module("ayon_api", get_addon_project_settings=None),
+        "qtpy": lambda: _module("qtpy", QtWidgets=_Qt(), QtCore=_Qt()),
+    }
+    for name, factory in stubs.items():
+        if name not in sys.modules and not _is_importable(name):
+            sys.modules[name] = factory()
+
+
+class FakeAnatomy:
+    roots: dict = {}
+
+    def __init__(self, project_name: str = ""):
+        self.project_name = project_name
+
+
+def patch_hook_module(module, settings: dict, roots: dict):
+    """Make the hook module read `settings` and `roots` instead of a server."""
+    FakeAnatomy.roots = roots
+    module.Anatomy = FakeAnatomy
+    module.get_template_data = lambda project_entity: {
+        "project": {"name": project_entity["name"], "code": project_entity["code"]}
+    }
+    module.ayon_api = types.SimpleNamespace(
+        get_addon_project_settings=lambda *args, **kwargs: settings
+    )
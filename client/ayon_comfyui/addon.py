@@ -1,5 +1,5 @@
 from pathlib import Path
-from ayon_core.addon import AYONAddon, IHostAddon
+from ayon_core.addon import AYONAddon, IHostAddon, click_wrap
 
 from .version import __version__
 
@@ -26,3 +26,54 @@ class ComfyUIAddon(AYONAddon, IHostAddon):
 
     def get_workfile_extension(self) -> None:
         return [".ps1"]
+
+    def cli(self, click_group):
+        click_group.add_command(cli_main.to_click_obj())
+
+
+@click_wrap.group(ComfyUIAddon.name, help="ComfyUI commands.")
+def cli_main():
+    pass
+
+
+@cli_main.command()
+@click_wrap.option(
+    "--requirements",
+    required=True,
+    help="Merged requirements or lockfile of a ComfyUI checkout.",
+)
+@click_wrap.option("--dest", required=True, help="Wheelhouse directory.")
+@click_wrap.option("--python-version", default="3.12", help="Python version of the venvs.")
+@click_wrap.option("--index-url", default="", help="Torch wheel index url.")
+@click_wrap.option("--nightly", is_flag=True, help="Allow torch pre-releases.")
+@click_wrap.option("--uv-path", default="", help="Path to the uv executable.")
+@click_wrap.option("--workers", type=int, default=8, help="Parallel downloads.")
+@click_wrap.option(
+    "--strict",
+    is_flag=True,
+    help="Fail if a package can only be installed from git, a directory or a url.",
+)
+def build_wheelhouse(
+    requirements, dest, python_version, index_url, nightly, uv_path, workers, strict
+):
+    """Download all wheels of a ComfyUI checkout for offline launches."""
+    from .lib.launcher import ensure_uv
+    from .lib.wheelhouse import (
+        Wheelhouse,
+        resolve_distributions,
+        format_wheelhouse_errors,
+    )
+
+    distributions, _ = resolve_distributions(
+        ensure_uv(uv_path),
+        Path(requirements).resolve(),
+        python_version=python_version,
+        strict=strict,
+        pypi_url=index_url or None,
+        prerelease=nightly,
+    )
+    errors = Wheelhouse(Path(dest)).build(
+        distributions, max_workers=workers, progress_callback=print
+    )
+    if errors:
+        raise RuntimeError(format_wheelhouse_errors(errors))
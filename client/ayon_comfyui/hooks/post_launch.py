@@ -0,0 +1,30 @@
+from ayon_applications import (
+    PostLaunchHook,
+    LaunchTypes,
+)
+from ayon_core.lib import Logger
+
+from ayon_comfyui.lib.instances import InstanceRegistry
+
+
+log = Logger.get_logger(__name__)
+
+
+class ComfyUIPostLaunchHook(PostLaunchHook):
+    """Record the pid of the started server in the instance registry."""
+
+    hosts = {"comfyui"}
+    launch_types = {LaunchTypes.local}
+
+    def execute(self):
+        # the server has its own handle of the log file by now
+        log_file = self.data.pop("comfyui_server_log", None)
+        if log_file is not None:
+            log_file.close()
+
+        instance = self.data.get("comfyui_instance")
+        process = self.launch_context.process
+        if not instance or process is None:
+            return
+        InstanceRegistry().set_pid(instance["port"], process.pid)
+        log.debug(f"ComfyUI server on port {instance['port']} has pid {process.pid}")
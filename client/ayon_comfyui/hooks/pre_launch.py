@@ -1,10 +1,9 @@
-import git
 import sys
 import yaml
+import time
 import shutil
-import socket
+import threading
 import ayon_api
-import subprocess
 from pathlib import Path
 from qtpy import QtWidgets, QtCore
 
@@ -17,11 +16,78 @@ from ayon_core.pipeline import Anatomy
 from ayon_core.pipeline.template_data import get_template_data
 
 
-from ayon_comfyui import ADDON_ROOT, ADDON_NAME, ADDON_VERSION
+from ayon_comfyui import ADDON_NAME, ADDON_VERSION
+from ayon_comfyui.lib.repositories import (
+    REF_CACHE_TTL,
+    MirrorCache,
+    git_clone,
+    clone_plugins,
+    format_clone_errors,
+    get_head_sha,
+)
+from ayon_comfyui.lib.dependencies import (
+    MERGED_REQUIREMENTS_FILENAME,
+    get_lock_path,
+    read_lock_key,
+    lock_requirements,
+    get_baseline_dependencies,
+    get_requirement_sources,
+    find_pin_conflicts,
+    write_merged_requirements,
+    resolve_requirements,
+    format_dependency_errors,
+)
+from ayon_comfyui.lib.models import sync_tree
+from ayon_comfyui.lib.model_store import ModelStore
+from ayon_comfyui.lib.model_cache import LocalModelCache
+from ayon_comfyui.lib.server import (
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    split_server_flags,
+    wait_until_ready_blocking,
+)
+from ayon_comfyui.lib.instances import InstanceRegistry
+from ayon_comfyui.lib.hardware import HardwareProbe, select_torch_index
+from ayon_comfyui.lib.pipeline import Pipeline, Step
+from ayon_comfyui.lib.profiling import LaunchProfiler, phase, record
+from ayon_comfyui.lib.launcher import LaunchEngine, ensure_uv
+from ayon_comfyui.lib.venv_store import VenvTemplateStore, get_template_key
+from ayon_comfyui.lib.wheelhouse import (
+    Wheelhouse,
+    resolve_distributions,
+    format_wheelhouse_errors,
+)
+from ayon_comfyui.lib.downloads import DownloadManager, get_download_filename
+from ayon_comfyui.lib.model_verify import (
+    VERIFY_CACHE_FILENAME,
+    VerificationCache,
+    read_checksum_manifest,
+    verify_models,
+    format_verification_errors,
+)
+from ayon_comfyui.lib.model_index import (
+    ModelIndex,
+    get_model_index_path,
+    start_model_index_watcher,
+)
+from ayon_comfyui.lib.manifest import (
+    LaunchManifest,
+    get_state_dir,
+    hash_data,
+    hash_file,
+    write_atomic,
+    get_dependencies_stamp,
+)
 
 
 log = Logger.get_logger(__name__)
 
+# time steps get to stop by themselves before the worker is terminated
+CANCEL_TIMEOUT_MS = 5000
+PIPELINE_WORKERS = 4
+# time the launcher gets to start the server process after the hook ran
+PROCESS_START_TIMEOUT = 60
+
 
 class SpinnerDialog(QtWidgets.QDialog):
     def __init__(self, message="", parent=None):
@@ -48,12 +114,16 @@ class Worker(QtCore.QThread):
     def __init__(self, func):
         super().__init__()
         self.func = func
+        self.error = None
 
     def run(self):
-        self.func(progress_callback=self.progress.emit)
+        try:
+            self.func(progress_callback=self.progress.emit)
+        except Exception as e:
+            self.error = e
         self.finished.emit()
 
-def run_with_spinner(func, msg=""):
+def run_with_spinner(func, msg="", cancel=None):
     app = QtWidgets.QApplication.instance()
     if app is None:
         app = QtWidgets.QApplication(sys.argv)
@@ -64,8 +134,12 @@ def run_with_spinner(func, msg=""):
     def abort():
         nonlocal aborted
         aborted = True
-        worker.terminate()
-        worker.wait()
+        if cancel is not None:
+            cancel()
+            worker.wait(CANCEL_TIMEOUT_MS)
+        if worker.isRunning():
+            worker.terminate()
+            worker.wait()
         app.quit()
 
     worker.finished.connect(spinner.accept)
@@ -75,57 +149,199 @@ def run_with_spinner(func, msg=""):
     worker.start()
     spinner.exec_()
     worker.wait()
+    if worker.error and not aborted:
+        raise worker.error
     return not aborted
 
 class ComfyUIPreLaunchHook(PreLaunchHook):
-    """Inject cli arguments to shell point at launch script."""
+    """Prepare the ComfyUI checkout and venv and launch the server from it."""
 
     hosts = {"comfyui"}
     launch_types = {LaunchTypes.local}
 
     def execute(self):
-        if self.server_is_running:
-            raise RuntimeError(
-                "ComfyUI server is already running. "
-                "Please stop it before launching again."
+        self.profiler = LaunchProfiler(
+            project=self.data["project_name"], addon_version=ADDON_VERSION
+        )
+        self.profiler.activate()
+        self.comfy_root = None
+        self.state_dir = None
+        with phase("settings"):
+            self.addon_settings = ayon_api.get_addon_project_settings(
+                ADDON_NAME, ADDON_VERSION, self.data["project_name"]
             )
+        self.host = self.addon_settings.get("host") or DEFAULT_HOST
+        self.port = self.addon_settings.get("port") or DEFAULT_PORT
+
+        self.registry = InstanceRegistry()
+        for instance in self.registry.instances():
+            if instance["project"] == self.data["project_name"]:
+                raise RuntimeError(
+                    f"ComfyUI server of project {instance['project']} is already "
+                    f"running on port {instance['port']}. Please stop it before launching again."
+                )
 
-        if not run_with_spinner(self.pre_launch_setup):
-            raise RuntimeError("Pre-launch setup was aborted by user.")
-        self.run_server()
-
-    @property
-    def server_is_running(self):
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            sock.settimeout(1)
-            try:
-                sock.connect(("127.0.0.1", 8188))   # hardcoded until making it dynamic via server settings
-                return True
-            except (ConnectionRefusedError, socket.timeout, OSError):
-                return False
-
-    def pre_launch_setup(self, progress_callback=None):
-        self.pre_process(progress_callback)
-        self.clone_repositories(progress_callback)
-        self.configure_extra_models(progress_callback)
+        pipeline = self.get_pre_launch_pipeline()
+        try:
+            if not run_with_spinner(pipeline.run, cancel=pipeline.cancel):
+                raise RuntimeError("Pre-launch setup was aborted by user.")
+        except Exception:
+            self._write_profile()
+            raise
+        self.allocate_instance()
+        try:
+            self.run_server()
+        except Exception:
+            self.registry.unregister(self.port)
+            self._write_profile()
+            raise
+        threading.Thread(target=self._log_when_ready, daemon=True).start()
+
+    def allocate_instance(self):
+        """Pick a free port and GPU for this server from the configured pools.
+
+        `--listen` and `--port` in the extra flags override the settings, an
+        explicit port is used as is instead of a port from the pool.
+        """
+        pool_size = self.addon_settings.get("port_pool_size", 1)
+        self.extra_flags, flag_host, flag_port = split_server_flags(self.extra_flags)
+        if flag_host:
+            self.host = flag_host
+        if flag_port:
+            self.port = flag_port
+            pool_size = 1
+
+        instance = self.registry.register(
+            project=self.data["project_name"],
+            comfy_root=self.comfy_root,
+            host=self.host,
+            base_port=self.port,
+            pool_size=pool_size,
+            gpu_indices=self.addon_settings.get("gpu_indices"),
+        )
+        self.port = instance["port"]
+        self.gpu = instance["gpu"]
+        self.data["comfyui_instance"] = instance
+        log.info(f"Allocated port {self.port} for ComfyUI server")
+        if self.gpu is not None:
+            log.info(f"Pinning ComfyUI server to GPU {self.gpu}")
+
+    def _wait_for_process(self):
+        """The server process once the launcher started it, None if it failed to."""
+        deadline = time.monotonic() + PROCESS_START_TIMEOUT
+        while time.monotonic() < deadline:
+            process = getattr(self.launch_context, "process", None)
+            if process is not None:
+                return process
+            time.sleep(0.5)
+        return None
+
+    def _log_when_ready(self):
+        with phase("server_ready") as current:
+            process = self._wait_for_process()
+            ready = None
+            if process is not None:
+                ready = wait_until_ready_blocking(self.host, self.port)
+            if not ready and current:
+                current.status = "timeout"
+        if ready:
+            log.info(f"ComfyUI server is ready at http://{self.host}:{self.port}")
+        else:
+            log.warning(f"ComfyUI server at port {self.port} didn't become ready")
+            if process is None or process.poll() is not None:
+                # don't block relaunching the project until the startup grace ends
+                self.registry.unregister(self.port)
+        self._write_profile()
+
+    def _write_profile(self):
+        """Write the launch profile into the state dir and log a summary."""
+        self.profiler.deactivate()
+        log.info(f"Launch profile:\n{self.profiler.format_summary()}")
+        if not self.state_dir or not self.state_dir.is_dir():
+            return
+        try:
+            path = self.profiler.write(self.state_dir)
+            log.debug(f"Launch profile written to {path}")
+        except OSError as e:
+            log.warning(f"Failed to write launch profile: {e}")
+
+    def get_pre_launch_pipeline(self) -> Pipeline:
+        """Pre-launch steps with the data they exchange.
+
+        Everything writing into the ComfyUI checkout waits for the
+        repositories, while hardware probing, model downloads and indexing
+        run alongside cloning.
+        """
+        return Pipeline(
+            [
+                Step("context", self.pre_process, outputs=("context",)),
+                Step("hardware", self.probe_hardware, outputs=("torch_index",)),
+                Step("uv", self.find_uv, outputs=("uv",)),
+                Step(
+                    "repositories",
+                    self.clone_repositories,
+                    inputs=("context",),
+                    outputs=("repositories",),
+                ),
+                Step(
+                    "dependencies",
+                    self.resolve_dependencies,
+                    inputs=("repositories", "torch_index", "uv"),
+                    outputs=("resolved_dependencies",),
+                ),
+                Step(
+                    "wheelhouse",
+                    self.build_wheelhouse,
+                    inputs=("resolved_dependencies",),
+                    outputs=("wheels",),
+                ),
+                Step(
+                    "install",
+                    self.install_dependencies,
+                    inputs=("resolved_dependencies", "wheels"),
+                    outputs=("venv",),
+                ),
+                Step(
+                    "downloads",
+                    self.download_models,
+                    inputs=("context",),
+                    outputs=("downloaded_models",),
+                ),
+                Step(
+                    "model_index",
+                    self.index_extra_models,
+                    inputs=("context", "downloaded_models"),
+                    outputs=("model_indexes",),
+                ),
+                Step(
+                    "extra_models",
+                    self.configure_extra_models,
+                    inputs=("repositories", "model_indexes"),
+                    outputs=("extra_models",),
+                ),
+            ],
+            max_workers=PIPELINE_WORKERS,
+        )
 
     def pre_process(self, progress_callback=None):
         progress_callback("Pre-processing...")
-        anatomy = Anatomy(project_name=self.data["project_name"])
-        self.tmpl_data = get_template_data(self.data["project_entity"])
-        self.tmpl_data.update({"root": anatomy.roots})
+        with phase("anatomy"):
+            anatomy = Anatomy(project_name=self.data["project_name"])
+            self.tmpl_data = get_template_data(self.data["project_entity"])
+            self.tmpl_data.update({"root": anatomy.roots})
 
-        self.addon_settings = ayon_api.get_addon_project_settings(
-            ADDON_NAME, ADDON_VERSION, self.tmpl_data["project"]["name"]
-        )
-
-        comfy_root_tmpl = StringTemplate(
-            self.addon_settings["repositories"]["base_template"]
-        )
-        self.comfy_root = Path(comfy_root_tmpl.format_strict(self.tmpl_data))
+            comfy_root_tmpl = StringTemplate(
+                self.addon_settings["repositories"]["base_template"]
+            )
+            self.comfy_root = Path(comfy_root_tmpl.format_strict(self.tmpl_data))
         log.debug(f"{self.comfy_root = }")
+        self.state_dir = get_state_dir(self.comfy_root)
+        self.manifest = LaunchManifest(self.state_dir)
 
         self.plugins = self.addon_settings["repositories"]["plugins"]
+        for plugin in self.plugins:
+            plugin_name = Path(plugin["url"]).stem
+            plugin.update({"root": self.comfy_root / "custom_nodes" / plugin_name})
         self.extra_dependencies = set()
         for plugin in self.plugins:
             if plugin.get("extra_dependencies"):
@@ -143,156 +359,494 @@ class ComfyUIPreLaunchHook(PreLaunchHook):
             cache_tmpl = self.addon_settings["caching"]["cache_dir_template"]
             self.cache_dir = StringTemplate(cache_tmpl).format_strict(self.tmpl_data)
 
-        # get installed CUDA version and build correct pypi index url
-        try:
-            smi_version_details = subprocess.check_output(
-                ["nvidia-smi", "--version"], text=True
-            ).strip()
-        except Exception as e:
-            raise RuntimeError(
-                "Failed to execute `nvidia-smi`. Ensure NVIDIA drivers are installed and on PATH."
-            ) from e
-
-        cuda_version = None
-        for line in smi_version_details.splitlines():
-            if "CUDA Version" in line:
-                parts = line.split(":", 1)
-                if len(parts) == 2:
-                    cuda_version = parts[1].strip()
-                break
-        if not cuda_version:
-            raise RuntimeError("CUDA version could not be determined from `nvidia-smi` output.")
-
-        # Known mappings; add new ones here as they become available
-        pypi_url_map = {
-            "11.8": {
-                "stable": "https://download.pytorch.org/whl/cu118",
-                "nightly": None,
-            },
-            "12.6": {
-                "stable": "https://download.pytorch.org/whl/cu126",
-                "nightly": "https://download.pytorch.org/whl/nightly/cu126",
-            },
-            "12.8": {
-                "stable": "https://download.pytorch.org/whl/cu128",
-                "nightly": "https://download.pytorch.org/whl/nightly/cu128",
-            },
-            "12.9": {
-                "stable": "https://download.pytorch.org/whl/cu129",
-                "nightly": "https://download.pytorch.org/whl/nightly/cu129",
-            },
-            # If/when 13.0 wheels exist, you can add them explicitly:
-            # "13.0": {
-            #     "stable": "https://download.pytorch.org/whl/cu130",
-            #     "nightly": "https://download.pytorch.org/whl/nightly/cu130",
-            # },
-        }
-
-        # choose channel
-        use_nightly = bool(self.addon_settings["venv"]["use_torch_nightly"])
-        channel = "nightly" if use_nightly else "stable"
+        self.wheelhouse = None
+        wheelhouse_settings = self.addon_settings["caching"].get("wheelhouse", {})
+        if wheelhouse_settings.get("enabled"):
+            wheelhouse_root = StringTemplate(
+                wheelhouse_settings["dir_template"]
+            ).format_strict(self.tmpl_data)
+            self.wheelhouse = Wheelhouse(Path(wheelhouse_root))
+        self.offline = self._is_offline()
 
-        def _ver_tuple(s: str):
-            return tuple(int(x) for x in s.split("."))
-
-        # exact hit if available (and URL exists)
-        if cuda_version in pypi_url_map and pypi_url_map[cuda_version][channel]:
-            self.pypi_url = pypi_url_map[cuda_version][channel]
-        else:
-            # graceful fallback: pick highest supported <= installed CUDA
-            supported = sorted(pypi_url_map.keys(), key=_ver_tuple)
-            lower_or_equal = [k for k in supported if _ver_tuple(k) <= _ver_tuple(cuda_version)]
-            if lower_or_equal:
-                fallback = lower_or_equal[-1]
-                log.warning(
-                    f"Unknown CUDA {cuda_version}; falling back to {fallback} ({channel}) for PyTorch wheels."
-                )
-                self.pypi_url = pypi_url_map[fallback][channel]
-            else:
-                log.warning(
-                    f"No suitable CUDA mapping for {cuda_version}; proceeding without custom PyTorch index."
-                )
-                self.pypi_url = None
+        self.py_version = self.addon_settings["venv"]["python_version"]
 
+    def probe_hardware(self, progress_callback=None):
+        """Pick the torch wheel index matching this machine's hardware."""
+        self.hardware = HardwareProbe().get_info()
+        log.debug(f"{self.hardware = }")
+        _, self.pypi_url = select_torch_index(
+            self.hardware,
+            self.addon_settings["venv"].get("torch_indices", []),
+            nightly=bool(self.addon_settings["venv"]["use_torch_nightly"]),
+            cpu="--cpu" in self.addon_settings.get("extra_flags", []),
+        )
+        # only run on the CPU if there is no GPU, `--cpu` in the extra
+        # flags is passed through anyway
+        self.force_cpu = self.hardware.get("vendor") == "cpu"
         log.info(f"Using PyPI URL: {self.pypi_url}")
 
-        self.py_version = self.addon_settings["venv"]["python_version"]
-        self.uv_path = self.addon_settings["venv"]["uv_path"]
+    def _is_offline(self) -> bool:
+        wheelhouse_settings = self.addon_settings["caching"].get("wheelhouse", {})
+        return bool(wheelhouse_settings.get("enabled") and wheelhouse_settings.get("offline"))
 
-    def clone_repositories(self, progress_callback=None):
-        def git_clone(url: str, dest: Path, tag: str = "") -> git.Repo:
-            if not dest.exists():
-                log.info(f"Cloning {url} to {dest}")
-                repo = git.Repo.clone_from(url, dest)
-            else:
-                repo = git.Repo(dest)
-
-            repo.git.fetch(tags=True)
-            if repo.is_dirty(untracked_files=True):
-                self.log.info(f"Stashing uncommitted changes in {repo}")
-                repo.git.stash("save", "--include-untracked")
-
-            if tag:
-                log.info(f"Checking out tag {tag} for {repo}")
-                repo.git.checkout(tag)
-            else:
-                repo.remotes.origin.pull()
-            return repo
+    def find_uv(self, progress_callback=None):
+        # runs alongside pre-processing, so settings are read directly
+        self.uv_path = ensure_uv(
+            self.addon_settings["venv"]["uv_path"], install=not self._is_offline()
+        )
 
+    def clone_repositories(self, progress_callback=None):
         app = self.launch_context.data["app"]
-        base_url = self.addon_settings["repositories"]["base_url"]
+        repo_settings = self.addon_settings["repositories"]
+
+        mirror = None
+        mirror_settings = repo_settings.get("mirror", {})
+        if mirror_settings.get("enabled"):
+            mirror_root = StringTemplate(
+                mirror_settings["dir_template"]
+            ).format_strict(self.tmpl_data)
+            mirror = MirrorCache(
+                Path(mirror_root), ttl=mirror_settings["ttl_minutes"] * 60
+            )
+
+        repos_fingerprint = self._repositories_fingerprint(app.name)
+        if repos_fingerprint and self.manifest.is_current("repositories", repos_fingerprint):
+            log.info("Repositories unchanged since last launch, skipping setup")
+            record(cache_hit=True)
+            return
+        record(cache_hit=False)
+
+        progress_callback("Setting up ComfyUI...")
         git_clone(
-            url=base_url,
+            url=repo_settings["base_url"],
             dest=self.comfy_root,
             tag=app.name,
+            depth=repo_settings.get("base_depth", 0),
+            blob_filter=repo_settings.get("base_blob_filter", False),
+            mirror=mirror,
         )
+        self.state_dir.mkdir(exist_ok=True)
 
         # clone custom nodes
-        for plugin in self.plugins:
-            plugin_name = Path(plugin["url"]).stem
-            progress_callback(f"Setting up Plugin: {plugin_name}")
-            plugin_root = self.comfy_root / "custom_nodes" / plugin_name
-            plugin.update({"root": plugin_root})
-            git_clone(
-                url=plugin["url"],
-                dest=plugin_root,
-                tag=plugin["tag"],
+        errors = clone_plugins(
+            self.plugins,
+            max_workers=repo_settings.get("max_parallel_clones", 1),
+            mirror=mirror,
+            progress_callback=progress_callback,
+        )
+        if errors:
+            raise RuntimeError(format_clone_errors(errors))
+
+        repos_fingerprint = self._repositories_fingerprint(app.name)
+        if repos_fingerprint:
+            self.manifest.update("repositories", repos_fingerprint)
+
+    def _repositories_fingerprint(self, comfy_tag: str):
+        """Fingerprint of the repository setup.
+
+        Returns None if any repository tracks the latest commit, as those
+        always have to be updated.
+        """
+        if not comfy_tag or not all(plugin["tag"] for plugin in self.plugins):
+            return None
+        heads = {
+            root.as_posix(): get_head_sha(root)
+            for root in [self.comfy_root] + [p["root"] for p in self.plugins]
+        }
+        if not all(heads.values()):
+            return None
+        return hash_data({
+            "settings": self.addon_settings["repositories"],
+            "comfy_tag": comfy_tag,
+            "heads": heads,
+            # let `git_clone` check for moved tags once per ttl
+            "ref_period": int(time.time() // REF_CACHE_TTL),
+        })
+
+    def resolve_dependencies(self, progress_callback=None):
+        """Merge and resolve ComfyUI and plugin requirements in one go.
+
+        Conflicts are reported per plugin before anything gets installed.
+        """
+        self.baseline_file = None
+        self.lock_file = None
+        self.deps_fingerprint = self._dependencies_fingerprint()
+        self.skip_install = (
+            get_dependencies_stamp(self.comfy_root / ".venv") == self.deps_fingerprint
+        )
+        record(cache_hit=self.skip_install)
+        if self.skip_install:
+            log.info("Dependencies unchanged since last launch, skipping install")
+            return
+
+        lock_mode = bool(self.addon_settings["venv"].get("lock_dependencies"))
+        lock_file = get_lock_path(self.comfy_root)
+        if lock_mode and read_lock_key(lock_file) == self.deps_fingerprint:
+            log.info(f"Lockfile {lock_file} is up to date, skipping resolution")
+            record(cache_hit=True)
+            self.lock_file = lock_file
+            return
+
+        progress_callback("Resolving dependencies...")
+        sources = get_requirement_sources(self.comfy_root, self.plugins)
+        pin_conflicts = find_pin_conflicts(sources)
+        if pin_conflicts:
+            # the resolver below decides, pins are only compared textually
+            log.warning(format_dependency_errors(pin_conflicts, "Possible pin conflicts:"))
+
+        merged_file = write_merged_requirements(
+            sources, self.state_dir / MERGED_REQUIREMENTS_FILENAME
+        )
+        uv = self.uv_path
+        compile_kwargs = {
+            "python_version": self.py_version,
+            "pypi_url": self.pypi_url,
+            "prerelease": bool(self.addon_settings["venv"]["use_torch_nightly"]),
+            "env": self._get_uv_env(local_only=self.offline),
+        }
+        lock_error = None
+        if lock_mode:
+            progress_callback("Updating lockfile...")
+            lock_error = lock_requirements(
+                uv, merged_file, lock_file, self.deps_fingerprint, **compile_kwargs
+            )
+            if not lock_error:
+                self.lock_file = lock_file
+                return
+
+        errors = resolve_requirements(uv, merged_file, sources, **compile_kwargs)
+        if errors:
+            raise RuntimeError(format_dependency_errors(errors))
+        if lock_error:
+            raise RuntimeError(f"Failed to resolve lockfile {lock_file}:\n{lock_error}")
+
+        self.baseline_file = get_baseline_dependencies(
+            uv, self.comfy_root, **compile_kwargs
+        )
+
+    def install_dependencies(self, progress_callback=None):
+        """Bring the venv in line with the resolved dependencies."""
+        self.engine = LaunchEngine(
+            self.comfy_root,
+            self.uv_path,
+            python_version=self.py_version,
+            pypi_url=self.pypi_url,
+            prerelease=bool(self.addon_settings["venv"]["use_torch_nightly"]),
+            env=self._get_uv_env(
+                local_only=bool(self.wheelhouse) and not self.source_only_packages
+            ),
+        )
+        if self.skip_install:
+            return
+
+        progress_callback("Installing dependencies...")
+        if not self._clone_venv_template(progress_callback):
+            self.engine.create_venv()
+        plugin_names = [plugin["root"].name for plugin in self.plugins]
+        if self.lock_file:
+            # dependencies of removed plugins are removed by the sync
+            self.engine.remove_unwanted_plugins(plugin_names)
+            succeeded = self.engine.sync(self.lock_file)
+        else:
+            succeeded = self.engine.install(
+                self.state_dir / MERGED_REQUIREMENTS_FILENAME,
+                plugin_names,
+                baseline_file=self.baseline_file,
+            )
+        if succeeded:
+            self.engine.write_stamp(self.deps_fingerprint)
+        else:
+            log.warning("Not all dependencies could be installed, retrying on next launch")
+
+    def _clone_venv_template(self, progress_callback=None) -> bool:
+        """Base the venv on a shared template with torch and ComfyUI installed.
+
+        Returns:
+            bool: Whether the venv is a clone of the current template.
+        """
+        store_settings = self.addon_settings["venv"].get("template_store", {})
+        if not store_settings.get("enabled"):
+            return False
+
+        store_root = StringTemplate(
+            store_settings["dir_template"]
+        ).format_strict(self.tmpl_data)
+        store = VenvTemplateStore(
+            Path(store_root), link_mode=store_settings.get("link_mode", "hardlink")
+        )
+        requirements_file = self.comfy_root / "requirements.txt"
+        key = store.get_key(
+            self.py_version, self.pypi_url, self.engine.prerelease, requirements_file
+        )
+        if get_template_key(self.engine.venv_dir) == key:
+            return True
+
+        progress_callback("Preparing venv template...")
+        if not store.ensure(key, self.engine, requirements_file):
+            log.warning("Venv template unavailable, installing into a fresh venv")
+            return False
+        progress_callback("Cloning venv template...")
+        store.clone(key, self.engine.venv_dir)
+        return True
+
+    def _get_uv_env(self, local_only: bool = False) -> dict:
+        """Environment of `uv` calls.
+
+        Args:
+            local_only: Resolve and install from the wheelhouse only.
+        """
+        env = self.data["env"].copy()
+        env.pop("PYTHONPATH", None)
+        if self.cache_dir:
+            env["UV_CACHE_DIR"] = self.cache_dir
+        if local_only and self.wheelhouse:
+            env.update(self.wheelhouse.get_uv_env())
+        return env
+
+    def build_wheelhouse(self, progress_callback=None):
+        """Download the resolved dependencies into the wheelhouse."""
+        # packages the wheelhouse can't serve, installed online instead
+        self.source_only_packages = []
+        if not self.wheelhouse or self.offline or self.skip_install:
+            return
+
+        progress_callback("Building wheelhouse...")
+        requirements_file = self.lock_file or self.state_dir / MERGED_REQUIREMENTS_FILENAME
+        distributions, self.source_only_packages = resolve_distributions(
+            self.uv_path,
+            requirements_file,
+            python_version=self.py_version,
+            pypi_url=self.pypi_url,
+            prerelease=bool(self.addon_settings["venv"]["use_torch_nightly"]),
+            env=self._get_uv_env(),
+        )
+        wheelhouse_settings = self.addon_settings["caching"]["wheelhouse"]
+        errors = self.wheelhouse.build(
+            distributions,
+            max_workers=wheelhouse_settings.get("max_parallel_downloads", 8),
+            progress_callback=progress_callback,
+        )
+        if errors:
+            raise RuntimeError(format_wheelhouse_errors(errors))
+
+    def download_models(self, progress_callback=None):
+        """Download configured models into their model type directory."""
+        download_settings = self.addon_settings["extra_models"].get("downloads", {})
+        if not download_settings.get("enabled") or not download_settings.get("models"):
+            return
+
+        download_root = self._get_download_root()
+        downloads = []
+        for model in download_settings["models"]:
+            filename = model.get("filename") or get_download_filename(model["url"])
+            downloads.append({
+                "url": model["url"],
+                "dest": download_root / model["model_type"] / filename,
+                "sha256": model.get("sha256", ""),
+                "size": model.get("size", 0),
+            })
+
+        progress_callback("Downloading models...")
+        manager = DownloadManager(
+            max_workers=download_settings.get("max_workers", 4),
+            max_connections_per_host=download_settings.get("max_connections_per_host", 2),
+        )
+        errors = manager.download_all(downloads, progress_callback)
+        record(bytes_transferred=manager.bytes_received, cache_hit=not manager.bytes_received)
+        if errors:
+            raise RuntimeError(
+                f"Failed to download {len(errors)} model(s):\n"
+                + "\n".join(f"  - {error}" for error in errors.values())
             )
 
+    def _get_download_root(self) -> Path:
+        model_settings = self.addon_settings["extra_models"]
+        dir_template = (
+            model_settings["downloads"].get("dir_template")
+            or model_settings["dir_template"]
+        )
+        return Path(StringTemplate(dir_template).format_strict(self.tmpl_data))
+
+    def index_extra_models(self, progress_callback=None):
+        """Scan the model sources, which doesn't need the ComfyUI checkout."""
+        progress_callback("Indexing extra models...")
+        self.model_indexes: list[ModelIndex] = []
+        for source_root in self._get_model_sources():
+            index = ModelIndex(
+                get_model_index_path(self.state_dir, source_root), source_root
+            )
+            changed = index.scan()
+            if changed:
+                log.info(f"Model directories in {source_root} changed")
+            record(cache_hit=not changed)
+            self.model_indexes.append(index)
+
     def configure_extra_models(self, progress_callback=None):
         progress_callback("Configuring extra models...")
-        extra_models_dir_tmpl = StringTemplate(
-            self.addon_settings["extra_models"]["dir_template"]
-        )
-        extra_models_dir = Path(extra_models_dir_tmpl.format_strict(self.tmpl_data))
-        extra_model_dirs = {
-            folder for folder in extra_models_dir.iterdir() if folder.is_dir()
-        }
-        if not extra_model_dirs:
+        model_settings = self.addon_settings["extra_models"]
+        for index in self.model_indexes:
+            # indexes are stored in the state dir, which exists by now
+            index.save()
+            if model_settings.get("watch_changes"):
+                start_model_index_watcher(index)
+
+        if model_settings.get("verify", {}).get("enabled"):
+            self.verify_extra_models(progress_callback)
+
+        # model type to its directories, highest priority first
+        extra_models_map: dict[str, list[str]] = {}
+        for index in self.model_indexes:
+            for model_key in sorted(index.top_level_dirs()):
+                extra_models_map.setdefault(model_key, []).append(
+                    (index.root / model_key).as_posix()
+                )
+        if not extra_models_map:
             return
 
-        extra_models_map: dict[str, str] = {}
-        for model_dir in extra_model_dirs:
-            model_key = model_dir.name
-            extra_models_map[model_key] = model_dir.as_posix()
+        # copying is incremental and has to pick up new files in the source
+        copy_to_base = model_settings.get("copy_to_base")
+        if not copy_to_base and model_settings.get("local_cache", {}).get("enabled"):
+            extra_models_map = self.__cache_extra_models(extra_models_map)
 
-        if self.addon_settings["extra_models"].get("copy_to_base"):
+        models_fingerprint = self._extra_models_fingerprint(extra_models_map)
+        if not copy_to_base and self.manifest.is_current("extra_models", models_fingerprint):
+            log.info("Extra models unchanged since last launch, skipping setup")
+            record(cache_hit=True)
+            return
+        record(cache_hit=False)
+
+        if copy_to_base:
             self.__copy_extra_models(extra_models_map, progress_callback)
         else:
             self.__reference_extra_models(extra_models_map, progress_callback)
+        self.manifest.update(
+            "extra_models", self._extra_models_fingerprint(extra_models_map)
+        )
 
-    def __copy_extra_models(self, extra_models_map: dict[str, Path], progress_callback=None):
-        for model_key, model_dir in extra_models_map.items():
+    def verify_extra_models(self, progress_callback=None):
+        """Check model files for corruption before ComfyUI loads them."""
+        progress_callback("Verifying extra models...")
+        verify_settings = self.addon_settings["extra_models"]["verify"]
+        files = []
+        checksums = {}
+        for index in self.model_indexes:
+            files.extend(index.root / rel_path for rel_path in index.files())
+            manifest_name = verify_settings.get("checksum_manifest")
+            manifest_path = index.root / manifest_name if manifest_name else None
+            if manifest_path and manifest_path.is_file():
+                for rel_path, checksum in read_checksum_manifest(manifest_path).items():
+                    checksums[index.root / rel_path] = checksum
+
+        errors = verify_models(
+            files,
+            checksums,
+            VerificationCache(self.state_dir / VERIFY_CACHE_FILENAME),
+            max_workers=verify_settings.get("max_workers", 4),
+        )
+        if not errors:
+            return
+        message = format_verification_errors(errors)
+        if verify_settings.get("fail_on_error", True):
+            raise RuntimeError(message)
+        log.warning(message)
+
+    def _get_model_sources(self) -> list[Path]:
+        """Model source roots ordered by priority, highest first."""
+        model_settings = self.addon_settings["extra_models"]
+        sources = []
+        if model_settings.get("dir_template"):
+            sources.append((0, model_settings["dir_template"]))
+        for source in model_settings.get("sources", []):
+            sources.append((source["priority"], source["dir_template"]))
+        download_settings = model_settings.get("downloads", {})
+        if download_settings.get("enabled") and download_settings.get("dir_template"):
+            sources.append(
+                (download_settings["priority"], download_settings["dir_template"])
+            )
+        # stable sort keeps the configured order for equal priorities
+        sources.sort(key=lambda item: -item[0])
+
+        roots = []
+        for _, dir_template in sources:
+            root = Path(StringTemplate(dir_template).format_strict(self.tmpl_data))
+            if root not in roots:
+                roots.append(root)
+        return roots
+
+    def _extra_models_fingerprint(self, extra_models_map: dict[str, list[str]]) -> str:
+        return hash_data({
+            "settings": self.addon_settings["extra_models"],
+            "models": extra_models_map,
+            "config": hash_file(self.comfy_root / "extra_model_paths.yaml"),
+        })
+
+    def __copy_extra_models(self, extra_models_map: dict[str, list[str]], progress_callback=None):
+        model_settings = self.addon_settings["extra_models"]
+        store = None
+        store_settings = model_settings.get("store", {})
+        if store_settings.get("enabled"):
+            store_root = StringTemplate(
+                store_settings["dir_template"]
+            ).format_strict(self.tmpl_data)
+            store = ModelStore(Path(store_root))
+
+        for model_key, model_dirs in extra_models_map.items():
             model_dest = self.comfy_root / "models" / model_key
-            if not model_dest.exists():
-                msg = f"Copying {model_key} from {model_dir} to {model_dest}"
-                log.info(msg)
-                progress_callback(msg)
-                shutil.copytree(model_dir, model_dest)
-            else:
-                log.info(f"Model {model_key} already exists at {model_dest}")
-
-    def __reference_extra_models(self, extra_models_map: dict[str, Path], progress_callback=None):
+            # merge all sources, higher priorities override lower ones
+            src_files = {}
+            src_roots = {}
+            for index in reversed(self.model_indexes):
+                for rel_path, file_stat in index.files(model_key).items():
+                    src_files[rel_path] = file_stat
+                    src_roots[rel_path] = index.root / model_key
+            progress_callback(f"Syncing {model_key} to {model_dest}")
+            with phase(f"models/{model_key}"):
+                stats = sync_tree(
+                    Path(model_dirs[0]),
+                    model_dest,
+                    link_mode=model_settings.get("link_mode", "copy"),
+                    delete=model_settings.get("sync_deletions", False),
+                    max_workers=model_settings.get("max_parallel_copies", 4),
+                    store=store,
+                    src_files=src_files,
+                    src_roots=src_roots,
+                    progress_callback=progress_callback,
+                )
+                record(
+                    cache_hit=not stats["synced"], bytes_transferred=stats["bytes"]
+                )
+            log.info(f"Synced {model_key}: {stats}")
+
+    def __cache_extra_models(self, extra_models_map: dict[str, list[str]]) -> dict[str, list[str]]:
+        """Put the local cache tier in front of every model source.
+
+        Missing files are copied into the cache in the background. Returns
+        the model map with every source directory preceded by its cache
+        directory, so ComfyUI prefers cached files while keeping priorities.
+        """
+        cache_settings = self.addon_settings["extra_models"]["local_cache"]
+        cache_root = StringTemplate(
+            cache_settings["dir_template"]
+        ).format_strict(self.tmpl_data)
+        cache = LocalModelCache(
+            Path(cache_root), int(cache_settings["size_budget_gb"] * 1024 ** 3)
+        )
+        cache.start_background_fill(
+            [(index.root, index.files()) for index in self.model_indexes]
+        )
+
+        cached_map: dict[str, list[str]] = {}
+        for model_key, model_dirs in extra_models_map.items():
+            for model_dir in model_dirs:
+                source_root = Path(model_dir).parent
+                cache_dir = cache.source_dir(source_root) / model_key
+                cache_dir.mkdir(parents=True, exist_ok=True)
+                cached_map.setdefault(model_key, []).extend(
+                    [cache_dir.as_posix(), model_dir]
+                )
+        return cached_map
+
+    def __reference_extra_models(self, extra_models_map: dict[str, list[str]], progress_callback=None):
         progress_callback("Referencing extra models in local config...")
         # get or create config file
         config_file = self.comfy_root / "extra_model_paths.yaml"
@@ -305,60 +859,51 @@ class ComfyUIPreLaunchHook(PreLaunchHook):
             config = yaml.safe_load(config_reader)
             log.info(f"Current config: {config}")
 
-        # update config
+        # update config only if it changed, ComfyUI reads multiple
+        # directories per model type as newline separated paths
         new_conf = config.copy() if config else {}
-        new_conf.update({"comfyui": extra_models_map})
-        with config_file.open("w+") as config_writer:
-            yaml.safe_dump(new_conf, config_writer)
+        new_conf.update({
+            "comfyui": {
+                model_key: "\n".join(model_dirs)
+                for model_key, model_dirs in extra_models_map.items()
+            }
+        })
+        new_content = yaml.safe_dump(new_conf)
+        if config_file.read_text() == new_content:
+            log.info("Extra model config is up to date")
+            return
+        write_atomic(config_file, new_content)
 
     def run_server(self):
-        launch_script = ADDON_ROOT / "tools" / "install_and_run_server_venv.ps1"
-
-        _cmd: list = [launch_script.as_posix()]
-
-        launch_args = []
-        if self.uv_path:
-            launch_args.append("-uvPath")
-            launch_args.append(self.uv_path)
-        if self.plugins:
-            launch_args.append("-plugins")
-            plugin_names = [plugin["root"].name for plugin in self.plugins]
-            launch_args.append(",".join(plugin_names))
-        if self.extra_dependencies:
-            launch_args.append("-extraDependencies")
-            launch_args.append(",".join(self.extra_dependencies))
-        if self.cache_dir:
-            launch_args.append("-cacheDir")
-            launch_args.append(self.cache_dir)
-        if self.extra_flags:
-            launch_args.append("-extraFlags")
-            launch_args.append(",".join(self.extra_flags))
-        if self.pypi_url:
-            launch_args.append("-pypiUrl")
-            launch_args.append(self.pypi_url)
-        if self.py_version:
-            launch_args.append("-pythonVersion")
-            launch_args.append(self.py_version)
-
-        _cmd.extend(launch_args)
-        cmd = " ".join([str(arg) for arg in _cmd])
-        launch_args = [
-            "powershell.exe",
-            "-Command",
-            f"Start-Process powershell.exe -ArgumentList '-NoExit', '-NoProfile', '-Command', '{cmd}'",
-        ]
-        log.info(f"{cmd = }")
-        env = self.data["env"].copy()
-        if "PYTHONPATH" in env:
-            del env["PYTHONPATH"]
-
-        popen_kwargs = {
-            "stdout": None,
-            "stderr": None,
-            "cwd": self.comfy_root,
-            "env": env,
-            "creationflags": subprocess.CREATE_NEW_CONSOLE,
-        }
+        # `--listen` and `--port` were taken out of the extra flags on allocation
+        extra_flags = [*self.extra_flags, "--listen", self.host, "--port", str(self.port)]
+        if self.force_cpu and "--cpu" not in extra_flags:
+            extra_flags.append("--cpu")
+
+        launch_args = self.engine.get_server_command(extra_flags)
+        log.info(f"{launch_args = }")
+        log_file = None
+        if sys.platform != "win32":
+            # closed by the post launch hook once the server started
+            log_file = self.engine.open_server_log()
+            self.data["comfyui_server_log"] = log_file
+        popen_kwargs = self.engine.get_popen_kwargs(log_file)
+        if self.gpu is not None:
+            popen_kwargs["env"]["CUDA_VISIBLE_DEVICES"] = str(self.gpu)
 
         self.launch_context.launch_args = launch_args
         self.launch_context.kwargs = popen_kwargs
+
+    def _dependencies_fingerprint(self) -> str:
+        requirements = {"comfyui": hash_file(self.comfy_root / "requirements.txt")}
+        for plugin in self.plugins:
+            requirements[plugin["root"].name] = hash_file(
+                plugin["root"] / "requirements.txt"
+            )
+        return hash_data({
+            "python_version": self.py_version,
+            "pypi_url": self.pypi_url,
+            "requirements": requirements,
+            "extra_dependencies": sorted(self.extra_dependencies),
+            "lock": bool(self.addon_settings["venv"].get("lock_dependencies")),
+        })
@@ -0,0 +1,372 @@
+import os
+import re
+import json
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+
+from ayon_core.lib import Logger
+
+from .manifest import get_state_dir, hash_data, hash_file, write_atomic
+
+
+log = Logger.get_logger(__name__)
+
+MERGED_REQUIREMENTS_FILENAME = "requirements.ayon.txt"
+BASELINE_FILENAME = "baseline_dependencies.json"
+LOCK_FILENAME = "requirements.ayon.lock"
+LOCK_KEY_PREFIX = "# ayon-lock-key: "
+TORCH_PACKAGES = ["torch", "torchvision", "torchaudio"]
+COMFYUI_SOURCE = "ComfyUI"
+REQUIREMENT_REGEX = re.compile(
+    r"^(?P<name>[A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[[^\]]*\])?\s*(?P<spec>[^;]*)"
+)
+
+
+def normalize_name(name: str) -> str:
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def read_requirements(path: Path) -> list[str]:
+    """Requirement lines of a requirements file without comments and options."""
+    if not path.is_file():
+        return []
+    lines = []
+    for line in path.read_text(encoding="utf-8", errors="replace").splitlines():
+        line = line.split(" #", 1)[0].strip()
+        if not line or line.startswith(("#", "-")):
+            continue
+        lines.append(line)
+    return lines
+
+
+def get_requirement_sources(comfy_root: Path, plugins: list[dict]) -> dict[str, dict]:
+    """Collect requirements of ComfyUI and every plugin.
+
+    Returns:
+        dict[str, dict]: Per source the `file` (requirements.txt or None) and
+            its `extra` dependencies from the settings.
+    """
+    sources = {
+        COMFYUI_SOURCE: {"file": comfy_root / "requirements.txt", "extra": []}
+    }
+    for plugin in plugins:
+        requirements = plugin["root"] / "requirements.txt"
+        sources[plugin["root"].name] = {
+            "file": requirements if requirements.is_file() else None,
+            "extra": list(plugin.get("extra_dependencies") or []),
+        }
+    return sources
+
+
+def _release(version: str) -> tuple[str, ...]:
+    """Version parts without trailing zeros, `1.0` and `1.0.0` are equal."""
+    parts = version.lower().lstrip("v").split(".")
+    while len(parts) > 1 and parts[-1] == "0":
+        parts.pop()
+    return tuple(parts)
+
+
+def pins_compatible(a: str, b: str) -> bool:
+    """Whether two `==` pins, possibly with `.*` wildcards, can both hold."""
+    wildcard_a, wildcard_b = a.endswith(".*"), b.endswith(".*")
+    a, b = a.removesuffix(".*"), b.removesuffix(".*")
+    if not wildcard_a and not wildcard_b:
+        return _release(a) == _release(b)
+    parts_a, parts_b = a.lower().split("."), b.lower().split(".")
+    if wildcard_a and wildcard_b:
+        common = min(len(parts_a), len(parts_b))
+        return parts_a[:common] == parts_b[:common]
+    prefix, version = (parts_a, parts_b) if wildcard_a else (parts_b, parts_a)
+    version += ["0"] * (len(prefix) - len(version))
+    return version[:len(prefix)] == prefix
+
+
+def find_pin_conflicts(sources: dict[str, dict]) -> dict[str, list[str]]:
+    """Find packages pinned to incompatible exact versions by different sources.
+
+    Only pins with the same environment marker are compared. This is a
+    cheap pre-check for readable warnings, the resolver has the final say.
+    Conflicts between ComfyUI and a plugin are attributed to the plugin.
+
+    Returns:
+        dict[str, list[str]]: Conflict messages keyed by source name.
+    """
+    pins: dict[tuple[str, str], dict[str, str]] = {}
+    for source, source_data in sources.items():
+        lines = list(source_data["extra"])
+        if source_data["file"]:
+            lines.extend(read_requirements(source_data["file"]))
+        for line in lines:
+            match = REQUIREMENT_REGEX.match(line)
+            if not match:
+                continue
+            marker = line.partition(";")[2].strip()
+            spec = match.group("spec").replace(" ", "")
+            for part in spec.split(","):
+                if part.startswith("==") and not part.startswith("==="):
+                    key = (normalize_name(match.group("name")), marker)
+                    pins.setdefault(key, {})[source] = part[2:]
+
+    conflicts: dict[str, list[str]] = {}
+    for (name, marker), source_pins in pins.items():
+        comfy_pin = source_pins.get(COMFYUI_SOURCE)
+        culprits = set()
+        for source, version in source_pins.items():
+            if source == COMFYUI_SOURCE:
+                continue
+            if comfy_pin is not None:
+                others = [comfy_pin]
+            else:
+                others = [pin for other, pin in source_pins.items() if other != source]
+            if not all(pins_compatible(version, other) for other in others):
+                culprits.add(source)
+        if not culprits:
+            continue
+        label = f"{name}; {marker}" if marker else name
+        details = ", ".join(
+            f"{source} pins {version}" for source, version in sorted(source_pins.items())
+        )
+        for source in sorted(culprits):
+            conflicts.setdefault(source, []).append(f"{label}: {details}")
+    return conflicts
+
+
+def write_merged_requirements(
+    sources: dict[str, dict], output_path: Path, names: Optional[list[str]] = None
+) -> Path:
+    """Write a single requirements file including all given sources."""
+    lines = []
+    for source, source_data in sources.items():
+        if names is not None and source not in names:
+            continue
+        lines.append(f"# {source}")
+        if source_data["file"]:
+            requirements = Path(os.path.relpath(source_data["file"], output_path.parent))
+            lines.append(f"-r {requirements.as_posix()}")
+        lines.extend(source_data["extra"])
+    output_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return output_path
+
+
+def get_uv_executable(uv_path: str = "") -> Optional[str]:
+    if uv_path:
+        return uv_path
+    return shutil.which("uv")
+
+
+def compile_requirements(
+    uv: str,
+    requirements_file: Path,
+    python_version: str = "",
+    pypi_url: Optional[str] = None,
+    prerelease: bool = False,
+    output_file: Optional[Path] = None,
+    extra_args: Optional[list[str]] = None,
+    env: Optional[dict] = None,
+) -> subprocess.CompletedProcess:
+    """Resolve `requirements_file` with `uv pip compile`."""
+    cmd = [uv, "pip", "compile", requirements_file.as_posix(), "--quiet"]
+    if python_version:
+        cmd.extend(["--python-version", python_version])
+    if pypi_url:
+        cmd.extend(["--extra-index-url", pypi_url, "--index-strategy", "unsafe-best-match"])
+    if prerelease:
+        cmd.extend(["--prerelease", "allow"])
+    if output_file:
+        cmd.extend(["--output-file", output_file.as_posix()])
+    else:
+        cmd.append("--no-header")
+    if extra_args:
+        cmd.extend(extra_args)
+    return subprocess.run(
+        cmd,
+        cwd=requirements_file.parent,
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+
+
+def resolve_requirements(
+    uv: str,
+    merged_file: Path,
+    sources: dict[str, dict],
+    max_workers: int = 4,
+    **compile_kwargs,
+) -> dict[str, str]:
+    """Resolve all sources together and attribute failures to plugins.
+
+    All sources are resolved in a single `uv pip compile` run. Only if that
+    fails every plugin is resolved together with ComfyUI on its own to find
+    the plugins that can't be installed alongside it.
+
+    Returns:
+        dict[str, str]: Resolver errors keyed by source name.
+    """
+    result = compile_requirements(uv, merged_file, **compile_kwargs)
+    if result.returncode == 0:
+        return {}
+
+    def _check_plugin(source: str) -> Optional[str]:
+        check_file = merged_file.parent / f".requirements.check.{source}.txt"
+        write_merged_requirements(sources, check_file, [COMFYUI_SOURCE, source])
+        try:
+            check_result = compile_requirements(uv, check_file, **compile_kwargs)
+        finally:
+            check_file.unlink(missing_ok=True)
+        if check_result.returncode != 0:
+            return check_result.stderr.strip()
+        return None
+
+    plugin_sources = [source for source in sources if source != COMFYUI_SOURCE]
+    errors: dict[str, str] = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for source, error in zip(plugin_sources, executor.map(_check_plugin, plugin_sources)):
+            if error:
+                errors[source] = error
+
+    if not errors:
+        # plugins are fine on their own but not all together
+        errors["all plugins combined"] = result.stderr.strip()
+    return errors
+
+
+def parse_compiled_requirements(output: str) -> list[str]:
+    """Normalized package names of a `uv pip compile` output."""
+    names = set()
+    for line in output.splitlines():
+        line = line.strip()
+        if not line or line.startswith(("#", "-")):
+            continue
+        match = REQUIREMENT_REGEX.match(line)
+        if match:
+            names.add(normalize_name(match.group("name")))
+    return sorted(names)
+
+
+def get_baseline_dependencies(
+    uv: str,
+    comfy_root: Path,
+    python_version: str = "",
+    pypi_url: Optional[str] = None,
+    prerelease: bool = False,
+    env: Optional[dict] = None,
+) -> Optional[Path]:
+    """Get the file listing all packages a bare ComfyUI install consists of.
+
+    The package set is resolved without installing anything and cached in
+    the state dir of `comfy_root`. It's only resolved again if ComfyUI's
+    requirements, the Python version or the torch index change.
+
+    Returns:
+        Optional[Path]: Baseline file or None if it couldn't be resolved.
+    """
+    state_dir = get_state_dir(comfy_root)
+    baseline_file = state_dir / BASELINE_FILENAME
+    key = hash_data({
+        "requirements": hash_file(comfy_root / "requirements.txt"),
+        "python_version": python_version,
+        "pypi_url": pypi_url,
+        "prerelease": prerelease,
+    })
+    if baseline_file.exists():
+        try:
+            if json.loads(baseline_file.read_text()).get("key") == key:
+                log.info("Using cached baseline dependencies")
+                return baseline_file
+        except (OSError, ValueError):
+            pass
+
+    log.info("Resolving baseline dependencies")
+    state_dir.mkdir(exist_ok=True)
+    input_file = state_dir / ".requirements.baseline.txt"
+    requirements = (comfy_root / "requirements.txt").as_posix()
+    input_file.write_text("\n".join(TORCH_PACKAGES + [f"-r {requirements}"]) + "\n")
+    try:
+        result = compile_requirements(
+            uv,
+            input_file,
+            python_version=python_version,
+            pypi_url=pypi_url,
+            prerelease=prerelease,
+            env=env,
+        )
+    finally:
+        input_file.unlink(missing_ok=True)
+    if result.returncode != 0:
+        log.warning(f"Failed to resolve baseline dependencies: {result.stderr}")
+        return None
+
+    packages = parse_compiled_requirements(result.stdout)
+    write_atomic(baseline_file, json.dumps({"key": key, "packages": packages}, indent=2))
+    return baseline_file
+
+
+def get_lock_path(comfy_root: Path) -> Path:
+    """Lockfile of the ComfyUI checkout at `comfy_root`.
+
+    It's stored next to the checkout rather than inside it, where the next
+    repository update would stash it away, so it's reused by every launch
+    and workstation sharing the checkout's directory.
+    """
+    comfy_root = Path(comfy_root)
+    return comfy_root.with_name(f"{comfy_root.name}.{LOCK_FILENAME}")
+
+
+def read_lock_key(lock_file: Path) -> Optional[str]:
+    """Key of the inputs `lock_file` was resolved from."""
+    if not lock_file.is_file():
+        return None
+    with lock_file.open("r", encoding="utf-8") as f:
+        first_line = f.readline().strip()
+    if not first_line.startswith(LOCK_KEY_PREFIX):
+        return None
+    return first_line[len(LOCK_KEY_PREFIX):]
+
+
+def lock_requirements(
+    uv: str,
+    merged_file: Path,
+    lock_file: Path,
+    key: str,
+    **compile_kwargs,
+) -> Optional[str]:
+    """Resolve torch and the merged requirements into an exact lockfile.
+
+    The lockfile contains the used index urls so it can be installed with
+    `uv pip sync` on any workstation of the project.
+
+    Returns:
+        Optional[str]: Resolver error if the lockfile couldn't be created.
+    """
+    log.info(f"Resolving lockfile {lock_file}")
+    input_file = merged_file.parent / ".requirements.lock.in"
+    input_file.write_text(
+        "\n".join(TORCH_PACKAGES + [f"-r {merged_file.name}"]) + "\n"
+    )
+    try:
+        result = compile_requirements(
+            uv, input_file, extra_args=["--emit-index-url"], **compile_kwargs
+        )
+    finally:
+        input_file.unlink(missing_ok=True)
+    if result.returncode != 0:
+        return result.stderr.strip()
+
+    write_atomic(lock_file, f"{LOCK_KEY_PREFIX}{key}\n{result.stdout}")
+    return None
+
+
+def format_dependency_errors(
+    errors: dict[str, object],
+    title: str = "Dependency conflicts found, nothing was installed:",
+) -> str:
+    lines = [title]
+    for source, error in sorted(errors.items()):
+        if isinstance(error, list):
+            error = "\n    ".join(error)
+        lines.append(f"  - {source}:\n    {error}")
+    return "\n".join(lines)
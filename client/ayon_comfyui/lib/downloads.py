@@ -0,0 +1,289 @@
+import os
+import math
+import time
+import hashlib
+import threading
+import http.client
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from typing import Callable, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from ayon_core.lib import Logger
+
+from .models import LOCK_SUFFIX, PARTIAL_SUFFIX, LockFile, format_bytes
+
+
+log = Logger.get_logger(__name__)
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+USER_AGENT = "ayon-comfyui"
+
+
+class DownloadError(Exception):
+    pass
+
+
+def get_download_filename(url: str) -> str:
+    path = urllib.parse.urlparse(url).path
+    return urllib.parse.unquote(path.rstrip("/").rsplit("/", 1)[-1])
+
+
+def get_partial_path(dest: Path) -> Path:
+    return dest.with_name(f".{dest.name}{PARTIAL_SUFFIX}")
+
+
+def get_lock_path(dest: Path) -> Path:
+    return dest.with_name(f".{dest.name}{LOCK_SUFFIX}")
+
+
+def get_expected_size(response, offset: int = 0) -> Optional[int]:
+    """Total size of the resource announced by `response`, None if unknown."""
+    content_range = response.headers.get("Content-Range", "")
+    total = content_range.rpartition("/")[2]
+    if total.isdigit():
+        return int(total)
+    content_length = response.headers.get("Content-Length", "")
+    if content_length.isdigit():
+        return offset + int(content_length)
+    return None
+
+
+class DownloadManager:
+    """Concurrent, resumable HTTP downloads with per-host connection limits.
+
+    Downloads are written to a hidden partial file next to the destination
+    and resumed with HTTP range requests. The sha256 is computed while
+    streaming and the file is only moved into place if it matches. A lock
+    file next to the partial keeps other launches sharing the directory
+    from writing into it, they wait for the download instead.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_connections_per_host: int = 2,
+        timeout: float = 30,
+        retries: int = 3,
+    ):
+        self.max_workers = max(1, max_workers)
+        self.max_connections_per_host = max(1, max_connections_per_host)
+        self.timeout = timeout
+        self.retries = retries
+        self._host_slots: dict[str, threading.Semaphore] = {}
+        self._host_slots_lock = threading.Lock()
+        # bytes received over the network, excluding resumed partial files
+        self.bytes_received = 0
+        self._bytes_lock = threading.Lock()
+
+    def _host_slot(self, url: str) -> threading.Semaphore:
+        host = urllib.parse.urlparse(url).netloc
+        with self._host_slots_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.Semaphore(
+                    self.max_connections_per_host
+                )
+            return self._host_slots[host]
+
+    def _fetch(self, url: str, partial: Path, state: dict, progress) -> int:
+        """Append the remaining bytes of `url` to `partial`.
+
+        `state["hash"]` is updated with every written chunk and replaced if
+        the download has to start over, `state["expected"]` is set to the
+        announced total size.
+
+        Returns:
+            int: Size of `partial` after the request.
+
+        Raises:
+            OSError: If the connection closed before the announced length
+                was received, `partial` is kept for resuming.
+        """
+        offset = partial.stat().st_size if partial.exists() else 0
+        headers = {"User-Agent": USER_AGENT}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+        request = urllib.request.Request(url, headers=headers)
+        with self._host_slot(url):
+            try:
+                response = urllib.request.urlopen(request, timeout=self.timeout)
+            except urllib.error.HTTPError as e:
+                if e.code == 416 and offset:
+                    # range not satisfiable, the partial file is complete
+                    # if it has the size the server announces
+                    total = e.headers.get("Content-Range", "").rpartition("/")[2]
+                    if total.isdigit():
+                        state["expected"] = int(total)
+                    return offset
+                raise
+            with response:
+                if offset and response.status != 206:
+                    log.info(f"{url} doesn't support resuming, restarting")
+                    offset = 0
+                    state["hash"] = hashlib.sha256()
+                expected = get_expected_size(response, offset)
+                if expected is not None:
+                    state["expected"] = expected
+                mode = "ab" if offset else "wb"
+                with open(partial, mode) as f:
+                    while True:
+                        chunk = response.read(DOWNLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        state["hash"].update(chunk)
+                        with self._bytes_lock:
+                            self.bytes_received += len(chunk)
+                        if progress:
+                            progress(len(chunk))
+        written = partial.stat().st_size
+        if expected is not None and written != expected:
+            raise OSError(f"connection closed after {written} of {expected} bytes")
+        return written
+
+    def download(
+        self,
+        url: str,
+        dest: Path,
+        sha256: str = "",
+        size: int = 0,
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> bool:
+        """Download `url` to `dest` unless it's there already.
+
+        Returns:
+            bool: Whether anything was downloaded.
+
+        Raises:
+            DownloadError: If the download failed or doesn't match the
+                expected size or checksum.
+        """
+        try:
+            return self._download(url, Path(dest), sha256, size, progress)
+        except DownloadError:
+            raise
+        except Exception as e:
+            # e.g. malformed urls, report them like any other failed download
+            raise DownloadError(f"{url}: {e}") from e
+
+    def _download(
+        self,
+        url: str,
+        dest: Path,
+        sha256: str,
+        size: int,
+        progress: Optional[Callable[[int], None]],
+    ) -> bool:
+        if dest.exists() and (not size or dest.stat().st_size == size):
+            return False
+
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        lock = LockFile(get_lock_path(dest))
+        if not lock.acquire():
+            log.info(f"{dest} is being downloaded by another launch, waiting for it")
+            # the holder refreshes the lock, it only goes stale if it died
+            lock.acquire(timeout=math.inf)
+        try:
+            if dest.exists() and (not size or dest.stat().st_size == size):
+                return False
+            return self._download_locked(url, dest, sha256, size, progress, lock)
+        finally:
+            lock.release()
+
+    def _download_locked(
+        self,
+        url: str,
+        dest: Path,
+        sha256: str,
+        size: int,
+        progress: Optional[Callable[[int], None]],
+        lock: LockFile,
+    ) -> bool:
+        def _progress(chunk_size: int):
+            lock.refresh()
+            if progress:
+                progress(chunk_size)
+
+        partial = get_partial_path(dest)
+        state = {"hash": hashlib.sha256()}
+        if partial.exists():
+            # seed the hash with what was downloaded before
+            with open(partial, "rb") as f:
+                for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+                    state["hash"].update(chunk)
+                    lock.refresh()
+            if progress:
+                progress(partial.stat().st_size)
+
+        written = 0
+        for attempt in range(1, self.retries + 1):
+            try:
+                written = self._fetch(url, partial, state, _progress)
+                break
+            except (urllib.error.URLError, http.client.HTTPException, OSError) as e:
+                if attempt == self.retries:
+                    raise DownloadError(f"{url}: {e}") from e
+                log.warning(f"Download of {url} interrupted, resuming: {e}")
+                time.sleep(attempt)
+
+        # the announced size guards downloads without a configured one
+        expected = size or state.get("expected")
+        if expected and written != expected:
+            if written > expected:
+                # can't be resumed, start over next time
+                partial.unlink(missing_ok=True)
+            raise DownloadError(f"{url}: expected {expected} bytes, got {written}")
+        if sha256 and state["hash"].hexdigest() != sha256.lower():
+            partial.unlink(missing_ok=True)
+            raise DownloadError(f"{url}: checksum mismatch")
+        os.replace(partial, dest)
+        return True
+
+    def download_all(
+        self, downloads: list[dict], progress_callback=None, label: str = "models"
+    ) -> dict[str, str]:
+        """Download all entries concurrently.
+
+        Every entry needs `url` and `dest`, `sha256` and `size` are optional.
+
+        Returns:
+            dict[str, str]: Errors keyed by url.
+        """
+        total = sum(item.get("size") or 0 for item in downloads)
+        received = [0]
+        last_report = [0.0]
+        lock = threading.Lock()
+
+        def _progress(size: int):
+            with lock:
+                received[0] += size
+                now = time.monotonic()
+                if not progress_callback or now - last_report[0] < 0.25:
+                    return
+                last_report[0] = now
+            total_msg = f" / {format_bytes(total)}" if total else ""
+            progress_callback(f"Downloading {label}: {format_bytes(received[0])}{total_msg}")
+
+        errors = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(
+                    self.download,
+                    item["url"],
+                    item["dest"],
+                    sha256=item.get("sha256", ""),
+                    size=item.get("size") or 0,
+                    progress=_progress,
+                ): item["url"]
+                for item in downloads
+            }
+            for future in as_completed(futures):
+                try:
+                    if future.result():
+                        log.info(f"Downloaded {futures[future]}")
+                except DownloadError as e:
+                    log.error(str(e))
+                    errors[futures[future]] = str(e)
+        return errors
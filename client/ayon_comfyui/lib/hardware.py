@@ -0,0 +1,289 @@
+import os
+import sys
+import json
+import shutil
+import platform
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+from ayon_core.lib import Logger
+
+from .manifest import hash_data, write_atomic
+from .profiling import record
+
+
+log = Logger.get_logger(__name__)
+
+HARDWARE_CACHE_PREFIX = "hardware"
+NVIDIA_SMI = "nvidia-smi"
+ROCM_SMI = "rocm-smi"
+NVIDIA_PROC_VERSION = Path("/proc/driver/nvidia/version")
+ROCM_VERSION_FILE = Path("/opt/rocm/.info/version")
+PROBE_TIMEOUT = 15
+
+
+def get_hardware_cache_path(cache_dir: Optional[Path] = None) -> Path:
+    """Per machine cache file, home directories may be shared between hosts."""
+    cache_dir = cache_dir or Path.home() / ".ayon" / "comfyui"
+    return Path(cache_dir) / f"{HARDWARE_CACHE_PREFIX}_{platform.node() or 'local'}.json"
+
+
+def _version_tuple(version: str) -> tuple:
+    parts = []
+    for part in version.split("."):
+        digits = "".join(char for char in part if char.isdigit())
+        parts.append(int(digits or 0))
+    return tuple(parts)
+
+
+def _run(cmd: list[str]) -> Optional[str]:
+    try:
+        return subprocess.run(
+            cmd, capture_output=True, text=True, timeout=PROBE_TIMEOUT, check=True
+        ).stdout
+    except (OSError, subprocess.SubprocessError) as e:
+        log.debug(f"{cmd[0]} failed: {e}")
+        return None
+
+
+def get_system_ram() -> int:
+    """Total physical memory in bytes, 0 if unknown."""
+    if sys.platform == "win32":
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [
+                ("dwLength", ctypes.c_ulong),
+                ("dwMemoryLoad", ctypes.c_ulong),
+                ("ullTotalPhys", ctypes.c_ulonglong),
+                ("ullAvailPhys", ctypes.c_ulonglong),
+                ("ullTotalPageFile", ctypes.c_ulonglong),
+                ("ullAvailPageFile", ctypes.c_ulonglong),
+                ("ullTotalVirtual", ctypes.c_ulonglong),
+                ("ullAvailVirtual", ctypes.c_ulonglong),
+                ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+            ]
+
+        status = MemoryStatus()
+        status.dwLength = ctypes.sizeof(MemoryStatus)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullTotalPhys
+        return 0
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return 0
+
+
+def probe_nvidia(nvidia_smi: str) -> Optional[dict]:
+    """Query driver, CUDA version and GPUs from `nvidia-smi`."""
+    output = _run([
+        nvidia_smi,
+        "--query-gpu=name,driver_version,memory.total",
+        "--format=csv,noheader,nounits",
+    ])
+    if output is None:
+        return None
+    gpus = []
+    driver_version = ""
+    for line in output.strip().splitlines():
+        parts = [part.strip() for part in line.split(",")]
+        if len(parts) != 3:
+            continue
+        name, driver_version, memory = parts
+        try:
+            vram = int(float(memory)) * 1024 * 1024
+        except ValueError:
+            vram = 0
+        gpus.append({"name": name, "vram": vram})
+
+    # the CUDA version is only part of the human readable output
+    cuda_version = ""
+    for args in (["--version"], []):
+        output = _run([nvidia_smi, *args]) or ""
+        for line in output.splitlines():
+            if "CUDA Version" not in line:
+                continue
+            cuda_version = line.split("CUDA Version", 1)[1].strip(" :|\t").split()[0]
+            break
+        if cuda_version:
+            break
+    if not gpus and not cuda_version:
+        return None
+    return {
+        "vendor": "nvidia",
+        "driver_version": driver_version,
+        "cuda_version": cuda_version,
+        "gpus": gpus,
+    }
+
+
+def probe_amd(rocm_smi: str) -> Optional[dict]:
+    """Query ROCm version and GPUs from `rocm-smi`."""
+    output = _run([rocm_smi, "--showproductname", "--showmeminfo", "vram", "--json"])
+    if output is None:
+        return None
+    try:
+        cards = json.loads(output)
+    except ValueError:
+        return None
+    gpus = []
+    for card in cards.values():
+        if not isinstance(card, dict):
+            continue
+        name = card.get("Card series") or card.get("Card model") or ""
+        vram = card.get("VRAM Total Memory (B)") or 0
+        gpus.append({"name": name, "vram": int(vram)})
+    rocm_version = ""
+    if ROCM_VERSION_FILE.exists():
+        rocm_version = ROCM_VERSION_FILE.read_text().strip().split("-")[0]
+    return {
+        "vendor": "amd",
+        "driver_version": rocm_version,
+        "rocm_version": rocm_version,
+        "gpus": gpus,
+    }
+
+
+class HardwareProbe:
+    """Detect GPU vendor, driver, compute versions, VRAM and RAM.
+
+    Probing runs vendor tools, so results are cached per machine and only
+    probed again when the driver changes. The driver is fingerprinted by
+    the vendor tools' file stats and the kernel driver version, both of
+    which are cheap to read.
+    """
+
+    def __init__(
+        self,
+        cache_path: Optional[Path] = None,
+        nvidia_smi: str = NVIDIA_SMI,
+        rocm_smi: str = ROCM_SMI,
+    ):
+        self.cache_path = Path(cache_path) if cache_path else get_hardware_cache_path()
+        self.nvidia_smi = shutil.which(nvidia_smi)
+        self.rocm_smi = shutil.which(rocm_smi)
+
+    def _driver_fingerprint(self) -> str:
+        data = {"platform": sys.platform}
+        for tool in (self.nvidia_smi, self.rocm_smi):
+            if tool:
+                stat = os.stat(tool)
+                data[tool] = [stat.st_size, stat.st_mtime_ns]
+        for version_file in (NVIDIA_PROC_VERSION, ROCM_VERSION_FILE):
+            try:
+                data[version_file.as_posix()] = version_file.read_text()
+            except OSError:
+                pass
+        return hash_data(data)
+
+    def _probe(self) -> dict:
+        info = None
+        if self.nvidia_smi:
+            info = probe_nvidia(self.nvidia_smi)
+        if not info and self.rocm_smi:
+            info = probe_amd(self.rocm_smi)
+        if not info and sys.platform == "darwin" and platform.machine() == "arm64":
+            info = {"vendor": "apple", "driver_version": "", "gpus": []}
+        if not info:
+            info = {"vendor": "cpu", "driver_version": "", "gpus": []}
+        info["ram"] = get_system_ram()
+        return info
+
+    def get_info(self) -> dict:
+        """Get the hardware info from cache or by probing it.
+
+        Returns:
+            dict: `vendor` (nvidia, amd, apple or cpu), `driver_version`,
+                `cuda_version` or `rocm_version`, `gpus` with `name` and
+                `vram` in bytes and system `ram` in bytes.
+        """
+        fingerprint = self._driver_fingerprint()
+        if self.cache_path.exists():
+            try:
+                cached = json.loads(self.cache_path.read_text())
+                if cached.get("fingerprint") == fingerprint:
+                    record(cache_hit=True)
+                    return cached["info"]
+            except (OSError, ValueError, KeyError):
+                pass
+
+        log.info("Probing hardware")
+        record(cache_hit=False)
+        info = self._probe()
+        try:
+            write_atomic(
+                self.cache_path,
+                json.dumps({"fingerprint": fingerprint, "info": info}, indent=2),
+            )
+        except OSError as e:
+            log.warning(f"Failed to cache hardware info: {e}")
+        return info
+
+
+def select_torch_index(
+    info: dict, indices: list[dict], nightly: bool = False, cpu: bool = False
+) -> tuple[Optional[dict], Optional[str]]:
+    """Pick the torch wheel index matching the hardware.
+
+    GPU backends use the highest index version not newer than the one
+    supported by the driver. If no nightly index matches, the stable one
+    is used and after that the default index. Only machines without a
+    supported GPU, or when forced, use the CPU index.
+
+    Args:
+        info: Hardware info of `HardwareProbe.get_info`.
+        indices: Entries with `backend` (cuda, rocm, cpu or default),
+            `version`, `stable_url` and `nightly_url`.
+        nightly: Prefer nightly over stable wheels.
+        cpu: Force the CPU index.
+
+    Returns:
+        tuple[Optional[dict], Optional[str]]: Selected entry and its url. The
+            url is None to install torch from the default index.
+    """
+    channels = ["nightly_url", "stable_url"] if nightly else ["stable_url"]
+
+    def _pick(
+        backend: str, version: Optional[str] = None
+    ) -> tuple[Optional[dict], Optional[str]]:
+        for channel in channels:
+            candidates = [
+                entry for entry in indices
+                if entry["backend"] == backend and entry.get(channel)
+            ]
+            if version is not None:
+                candidates = [
+                    entry for entry in candidates
+                    if _version_tuple(entry["version"]) <= _version_tuple(version)
+                ]
+            if candidates:
+                entry = max(
+                    candidates, key=lambda entry: _version_tuple(entry["version"] or "0")
+                )
+                if channel != channels[0]:
+                    log.info(f"No nightly {backend} index matches, using the stable one")
+                return entry, entry[channel]
+        return None, None
+
+    vendor = "cpu" if cpu else info.get("vendor")
+    if vendor == "apple":
+        return _pick("default")
+
+    entry, url = None, None
+    if vendor == "nvidia" and info.get("cuda_version"):
+        entry, url = _pick("cuda", info["cuda_version"])
+    elif vendor == "amd" and info.get("rocm_version"):
+        entry, url = _pick("rocm", info["rocm_version"])
+    if entry:
+        return entry, url
+
+    if vendor in ("nvidia", "amd"):
+        # a GPU is present, the default index beats a CPU only torch
+        log.warning(f"No torch index for {vendor} hardware, using the default index")
+        default = [entry for entry in indices if entry["backend"] == "default"]
+        if default and default[0].get("stable_url"):
+            return default[0], default[0]["stable_url"]
+        return None, None
+    return _pick("cpu")
@@ -0,0 +1,203 @@
+import os
+import sys
+import json
+import time
+from pathlib import Path
+from typing import Optional
+
+from ayon_core.lib import Logger
+
+from .manifest import write_atomic
+from .server import is_port_open
+
+
+log = Logger.get_logger(__name__)
+
+REGISTRY_ENV = "AYON_COMFYUI_INSTANCE_REGISTRY"
+# time between allocating an instance and its process being started
+STARTUP_GRACE = 600
+LOCK_TIMEOUT = 10
+STALE_LOCK_AGE = 30
+
+
+def get_registry_path() -> Path:
+    if os.environ.get(REGISTRY_ENV):
+        return Path(os.environ[REGISTRY_ENV])
+    return Path.home() / ".ayon" / "comfyui" / "instances.json"
+
+
+def is_pid_alive(pid: int) -> bool:
+    if sys.platform == "win32":
+        import ctypes
+
+        process_query_limited_information = 0x1000
+        still_active = 259
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(process_query_limited_information, False, pid)
+        if not handle:
+            return False
+        try:
+            exit_code = ctypes.c_ulong()
+            if not kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+                return False
+            return exit_code.value == still_active
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class RegistryLock:
+    """Cross process lock using an exclusively created lock file."""
+
+    def __init__(self, path: Path):
+        self.path = Path(f"{path}.lock")
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - self.path.stat().st_mtime > STALE_LOCK_AGE:
+                        self.path.unlink(missing_ok=True)
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Timed out waiting for {self.path}")
+                time.sleep(0.05)
+
+    def __exit__(self, *args):
+        self.path.unlink(missing_ok=True)
+
+
+class InstanceRegistry:
+    """Workstation wide registry of running ComfyUI servers.
+
+    Each entry records pid, port, project, GPU index and ComfyUI root of a
+    server. Entries of dead servers are removed on every access.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else get_registry_path()
+        self._lock = RegistryLock(self.path)
+
+    def _read(self) -> list[dict]:
+        if not self.path.exists():
+            return []
+        try:
+            return json.loads(self.path.read_text()).get("instances", [])
+        except (OSError, ValueError):
+            log.warning(f"Ignoring unreadable instance registry {self.path}")
+            return []
+
+    def _write(self, instances: list[dict]):
+        write_atomic(self.path, json.dumps({"instances": instances}, indent=2))
+
+    @staticmethod
+    def _is_alive(instance: dict) -> bool:
+        if instance.get("pid"):
+            return is_pid_alive(instance["pid"])
+        if time.time() - instance["created"] < STARTUP_GRACE:
+            return True
+        return is_port_open(instance["host"], instance["port"])
+
+    def _alive_instances(self) -> list[dict]:
+        instances = self._read()
+        alive = [instance for instance in instances if self._is_alive(instance)]
+        if len(alive) != len(instances):
+            log.info(f"Removing {len(instances) - len(alive)} stale instance(s)")
+        return alive
+
+    def instances(self) -> list[dict]:
+        with self._lock:
+            alive = self._alive_instances()
+            self._write(alive)
+        return alive
+
+    def register(
+        self,
+        project: str,
+        comfy_root: Path,
+        host: str,
+        base_port: int,
+        pool_size: int = 1,
+        gpu_indices: Optional[list[int]] = None,
+    ) -> dict:
+        """Allocate a free port and GPU for a new server and register it.
+
+        The port is the first one of `base_port` to `base_port + pool_size`
+        which is neither registered nor open. The GPU is the one of
+        `gpu_indices` running the fewest servers.
+
+        Raises:
+            RuntimeError: If the project already runs a server or the port
+                pool is exhausted.
+        """
+        with self._lock:
+            alive = self._alive_instances()
+            for instance in alive:
+                if instance["project"] == project:
+                    raise RuntimeError(
+                        f"ComfyUI server of project {project} is already running "
+                        f"on port {instance['port']}. Please stop it before launching again."
+                    )
+
+            used_ports = {instance["port"] for instance in alive}
+            port = None
+            for candidate in range(base_port, base_port + max(1, pool_size)):
+                if candidate not in used_ports and not is_port_open(host, candidate):
+                    port = candidate
+                    break
+            if port is None:
+                raise RuntimeError(
+                    f"No free port in {base_port}-{base_port + pool_size - 1}. "
+                    "Stop a ComfyUI server or increase the port pool."
+                )
+
+            gpu = None
+            if gpu_indices:
+                usage = {index: 0 for index in gpu_indices}
+                for instance in alive:
+                    if instance.get("gpu") in usage:
+                        usage[instance["gpu"]] += 1
+                gpu = min(gpu_indices, key=lambda index: usage[index])
+
+            instance = {
+                "pid": None,
+                "host": host,
+                "port": port,
+                "project": project,
+                "gpu": gpu,
+                "comfy_root": Path(comfy_root).as_posix(),
+                "created": time.time(),
+            }
+            alive.append(instance)
+            self._write(alive)
+        return instance
+
+    def set_pid(self, port: int, pid: int):
+        """Attach the pid of the started server to its instance."""
+        with self._lock:
+            alive = self._alive_instances()
+            for instance in alive:
+                if instance["port"] == port:
+                    instance["pid"] = pid
+            self._write(alive)
+
+    def unregister(self, port: int):
+        with self._lock:
+            self._write([
+                instance for instance in self._alive_instances()
+                if instance["port"] != port
+            ])
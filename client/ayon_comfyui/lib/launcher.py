@@ -0,0 +1,306 @@
+import os
+import sys
+import json
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+from ayon_core.lib import Logger
+
+from .dependencies import (
+    TORCH_PACKAGES,
+    get_baseline_dependencies,
+    get_uv_executable,
+    normalize_name,
+    read_requirements,
+    REQUIREMENT_REGEX,
+)
+from .manifest import DEPENDENCIES_STAMP_FILENAME
+from .profiling import phase
+
+
+log = Logger.get_logger(__name__)
+
+VENV_DIRNAME = ".venv"
+SERVER_LOG_FILENAME = ".ayon_server.log"
+UV_INSTALL_COMMANDS = {
+    "win32": [
+        "powershell.exe", "-NoProfile", "-ExecutionPolicy", "ByPass",
+        "-Command", "irm https://astral.sh/uv/install.ps1 | iex",
+    ],
+    "default": ["sh", "-c", "curl -LsSf https://astral.sh/uv/install.sh | sh"],
+}
+SERVER_ENV = {
+    "OPENCV_IO_ENABLE_OPENEXR": "1",  # workaround for opencv error
+}
+
+
+def get_venv_python(venv_dir: Path) -> Path:
+    if sys.platform == "win32":
+        return venv_dir / "Scripts" / "python.exe"
+    return venv_dir / "bin" / "python"
+
+
+def ensure_uv(uv_path: str = "", install: bool = True) -> str:
+    """Get the `uv` executable, installing it for the current user if missing.
+
+    Args:
+        uv_path: Explicit path of the executable.
+        install: Whether a missing `uv` may be installed.
+
+    Raises:
+        RuntimeError: If `uv` couldn't be found or installed.
+    """
+    uv = get_uv_executable(uv_path)
+    if uv:
+        return uv
+    if not install:
+        raise RuntimeError("uv not found and installing it is disabled for offline launches")
+
+    log.info("uv not found, installing it for the current user")
+    cmd = UV_INSTALL_COMMANDS.get(sys.platform, UV_INSTALL_COMMANDS["default"])
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(f"Failed to install uv:\n{result.stderr.strip()}")
+
+    for bin_dir in (Path.home() / ".local" / "bin", Path.home() / ".cargo" / "bin"):
+        uv = shutil.which("uv", path=bin_dir.as_posix())
+        if uv:
+            return uv
+    raise RuntimeError("uv was installed but couldn't be found")
+
+
+def get_requirement_names(requirements_file: Path) -> set[str]:
+    names = set()
+    for line in read_requirements(requirements_file):
+        match = REQUIREMENT_REGEX.match(line)
+        if match:
+            names.add(normalize_name(match.group("name")))
+    return names
+
+
+class LaunchEngine:
+    """Prepare the venv of a ComfyUI checkout and build its server command.
+
+    Every step calls `uv` with a plain argument list from `comfy_root`, so
+    it behaves the same on Windows and Linux and `uv` can be swapped for a
+    stub executable.
+    """
+
+    def __init__(
+        self,
+        comfy_root: Path,
+        uv: str,
+        python_version: str = "",
+        pypi_url: Optional[str] = None,
+        prerelease: bool = False,
+        env: Optional[dict] = None,
+        venv_dir: Optional[Path] = None,
+    ):
+        self.comfy_root = Path(comfy_root)
+        self.uv = uv
+        self.python_version = python_version
+        self.pypi_url = pypi_url
+        self.prerelease = prerelease
+        self.env = dict(os.environ if env is None else env)
+        self.venv_dir = Path(venv_dir) if venv_dir else self.comfy_root / VENV_DIRNAME
+
+    def with_venv(self, venv_dir: Path) -> "LaunchEngine":
+        """Same engine operating on another venv."""
+        return LaunchEngine(
+            self.comfy_root,
+            self.uv,
+            python_version=self.python_version,
+            pypi_url=self.pypi_url,
+            prerelease=self.prerelease,
+            env=self.env,
+            venv_dir=venv_dir,
+        )
+
+    @property
+    def python(self) -> Path:
+        return get_venv_python(self.venv_dir)
+
+    def run_uv(self, *args: str) -> bool:
+        """Run `uv` with `args` and log its output.
+
+        Returns:
+            bool: Whether the command succeeded.
+        """
+        cmd = [self.uv, *args]
+        log.debug(f"Running {cmd}")
+        result = subprocess.run(
+            cmd,
+            cwd=self.comfy_root,
+            env=self.env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+        if result.stdout:
+            log.debug(result.stdout.rstrip())
+        if result.returncode:
+            log.error(f"{' '.join(cmd)} failed:\n{result.stdout.strip()}")
+            return False
+        return True
+
+    def _pip(self, command: str, *args: str) -> bool:
+        return self.run_uv("pip", command, "--python", self.python.as_posix(), *args)
+
+    def create_venv(self, relocatable: bool = False):
+        """Create the venv or reuse an existing one.
+
+        Args:
+            relocatable: Use relative paths in scripts and entry points, so
+                the venv keeps working when moved or cloned.
+
+        Raises:
+            RuntimeError: If the venv couldn't be created.
+        """
+        args = ["venv", "--allow-existing", self.venv_dir.as_posix()]
+        if relocatable:
+            args.append("--relocatable")
+        if self.python_version:
+            args.extend(["--python", self.python_version])
+        with phase("venv/create"):
+            if not self.run_uv(*args):
+                raise RuntimeError(f"Failed to create venv in {self.venv_dir}")
+
+    def remove_unwanted_plugins(self, plugins: list[str]) -> dict[str, set[str]]:
+        """Delete every folder in `custom_nodes` that is not a configured plugin.
+
+        Returns:
+            dict[str, set[str]]: Requirement names of the removed plugins.
+        """
+        custom_nodes = self.comfy_root / "custom_nodes"
+        removed = {}
+        if not custom_nodes.is_dir():
+            return removed
+        for entry in os.scandir(custom_nodes):
+            if not entry.is_dir() or entry.name in plugins:
+                continue
+            log.info(f"Removing plugin: {entry.name}")
+            removed[entry.name] = get_requirement_names(Path(entry.path) / "requirements.txt")
+            shutil.rmtree(entry.path)
+        return removed
+
+    def sync(self, lock_file: Path) -> bool:
+        """Make the venv match `lock_file` exactly."""
+        log.info(f"Syncing venv with {lock_file.name}")
+        with phase("venv/sync"):
+            return self._pip(
+                "sync", lock_file.as_posix(), "--index-strategy", "unsafe-best-match"
+            )
+
+    def _get_protected_dependencies(self, baseline_file: Optional[Path]) -> Optional[set[str]]:
+        if not baseline_file or not baseline_file.exists():
+            baseline_file = get_baseline_dependencies(
+                self.uv,
+                self.comfy_root,
+                python_version=self.python_version,
+                pypi_url=self.pypi_url,
+                prerelease=self.prerelease,
+                env=self.env,
+            )
+        if not baseline_file:
+            return None
+        packages = json.loads(baseline_file.read_text()).get("packages", [])
+        return {normalize_name(package) for package in packages}
+
+    def install(
+        self,
+        requirements_file: Path,
+        plugins: list[str],
+        baseline_file: Optional[Path] = None,
+    ) -> bool:
+        """Install torch and the merged requirements of ComfyUI and its plugins.
+
+        Requirements only used by removed plugins are uninstalled unless
+        they are part of a bare ComfyUI install.
+
+        Returns:
+            bool: Whether every install step succeeded.
+        """
+        succeeded = self.install_torch()
+
+        removed = self.remove_unwanted_plugins(plugins)
+        if removed:
+            kept = set()
+            for plugin in plugins:
+                kept |= get_requirement_names(
+                    self.comfy_root / "custom_nodes" / plugin / "requirements.txt"
+                )
+            protected = self._get_protected_dependencies(baseline_file)
+            if protected is None:
+                log.warning("Baseline dependencies unknown, keeping removed plugin dependencies")
+            else:
+                to_remove = sorted(set().union(*removed.values()) - kept - protected)
+                if to_remove:
+                    log.info(f"Found {len(to_remove)} dependencies to remove: {', '.join(to_remove)}")
+                    with phase("venv/uninstall"):
+                        succeeded &= self._pip("uninstall", *to_remove)
+
+        succeeded &= self.install_requirements(requirements_file)
+        return succeeded
+
+    def install_torch(self) -> bool:
+        torch_args = list(TORCH_PACKAGES)
+        if self.pypi_url:
+            torch_args.extend(["--index-url", self.pypi_url])
+        if self.prerelease:
+            torch_args.append("--pre")
+        with phase("venv/torch"):
+            return self._pip("install", *torch_args)
+
+    def install_requirements(self, requirements_file: Path) -> bool:
+        log.info(f"Installing dependencies from {requirements_file.name}")
+        install_args = ["-r", requirements_file.as_posix()]
+        if self.pypi_url:
+            install_args.extend([
+                "--extra-index-url", self.pypi_url, "--index-strategy", "unsafe-best-match"
+            ])
+        with phase("venv/requirements"):
+            return self._pip("install", *install_args)
+
+    def write_stamp(self, fingerprint: str):
+        """Remember what was installed so unchanged launches can skip installing."""
+        (self.venv_dir / DEPENDENCIES_STAMP_FILENAME).write_text(fingerprint)
+
+    def get_server_command(self, extra_flags: list[str]) -> list[str]:
+        return [self.python.as_posix(), "main.py", *extra_flags]
+
+    def get_server_env(self) -> dict:
+        env = dict(self.env)
+        env.pop("PYTHONPATH", None)
+        env.update(SERVER_ENV)
+        env["VIRTUAL_ENV"] = self.venv_dir.as_posix()
+        env["PATH"] = os.pathsep.join([self.python.parent.as_posix(), env.get("PATH", "")])
+        return env
+
+    def open_server_log(self):
+        """Open the server log file for appending, the caller closes it."""
+        return open(self.comfy_root / SERVER_LOG_FILENAME, "ab")
+
+    def get_popen_kwargs(self, log_file=None) -> dict:
+        """Process arguments to run the server detached from the launcher.
+
+        Windows gets its own console, elsewhere output goes to `log_file`,
+        see `open_server_log`. The process inherits the handle, so it can be
+        closed as soon as the process started.
+        """
+        kwargs = {"cwd": self.comfy_root, "env": self.get_server_env()}
+        if sys.platform == "win32":
+            kwargs.update({
+                "stdout": None,
+                "stderr": None,
+                "creationflags": subprocess.CREATE_NEW_CONSOLE,
+            })
+        else:
+            kwargs.update({
+                "stdin": subprocess.DEVNULL,
+                "stdout": subprocess.DEVNULL if log_file is None else log_file,
+                "stderr": subprocess.STDOUT,
+                "start_new_session": True,
+            })
+        return kwargs
@@ -0,0 +1,92 @@
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Optional
+
+from ayon_core.lib import Logger
+
+
+log = Logger.get_logger(__name__)
+
+# inside the git dir of the ComfyUI checkout, see `get_state_dir`
+STATE_DIRNAME = "ayon"
+MANIFEST_FILENAME = "launch_manifest.json"
+# written into the venv by LaunchEngine.write_stamp after a successful install
+DEPENDENCIES_STAMP_FILENAME = "ayon_deps_fingerprint"
+
+
+def hash_data(data) -> str:
+    """Stable hash of any json serializable data."""
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def hash_file(path: Path, chunk_size: int = 1024 * 1024) -> Optional[str]:
+    if not path.is_file():
+        return None
+    hash_obj = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hash_obj.update(chunk)
+    return hash_obj.hexdigest()
+
+
+def write_atomic(path: Path, content: str):
+    """Write `content` to a temp file next to `path` and rename it."""
+    tmp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    tmp_path.write_text(content)
+    os.replace(tmp_path, path)
+
+
+def get_state_dir(comfy_root: Path) -> Path:
+    """Directory of the launcher state of a ComfyUI checkout.
+
+    Files in the work tree would show up as untracked and be stashed away
+    by the next repository update, the git dir is never touched by that.
+    """
+    return Path(comfy_root) / ".git" / STATE_DIRNAME
+
+
+class LaunchManifest:
+    """Fingerprints of the launch setup stages stored in the state dir.
+
+    Each stage (e.g. repositories, extra models) stores the fingerprint of
+    the inputs it was last run with. A stage whose fingerprint still matches
+    can be skipped.
+    """
+
+    def __init__(self, state_dir: Path):
+        self.path = Path(state_dir) / MANIFEST_FILENAME
+        self.stages: dict[str, str] = {}
+        if self.path.exists():
+            try:
+                self.stages = json.loads(self.path.read_text()).get("stages", {})
+            except (OSError, ValueError):
+                log.warning(f"Ignoring unreadable launch manifest {self.path}")
+
+    def is_current(self, stage: str, fingerprint: str) -> bool:
+        return self.stages.get(stage) == fingerprint
+
+    def update(self, stage: str, fingerprint: str):
+        self.stages[stage] = fingerprint
+        self.save()
+
+    def invalidate(self, stage: str):
+        if self.stages.pop(stage, None) is not None:
+            self.save()
+
+    def save(self):
+        if not self.path.parent.exists():
+            return
+        try:
+            write_atomic(self.path, json.dumps({"stages": self.stages}, indent=2))
+        except OSError as e:
+            log.warning(f"Failed to write launch manifest {self.path}: {e}")
+
+
+def get_dependencies_stamp(venv_dir: Path) -> Optional[str]:
+    stamp = venv_dir / DEPENDENCIES_STAMP_FILENAME
+    if not stamp.exists():
+        return None
+    return stamp.read_text().strip()
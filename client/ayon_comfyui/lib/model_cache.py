@@ -0,0 +1,264 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from typing import Optional
+
+from ayon_core.lib import Logger
+
+from .models import LOCK_SUFFIX, PARTIAL_SUFFIX, LockFile, format_bytes, place_file
+from .manifest import write_atomic
+
+
+log = Logger.get_logger(__name__)
+
+CACHE_INDEX_FILENAME = ".ayon_cache_index.json"
+# time to wait for another launch writing the index
+INDEX_LOCK_TIMEOUT = 10
+
+
+class LocalModelCache:
+    """Workstation local cache tier in front of network model sources.
+
+    Files are stored per source under `<root>/<source hash>/<rel path>` so
+    sources of different projects never collide. The cache is kept below
+    `budget` bytes by evicting the least recently used files. Usage is taken
+    from the file access time where the filesystem records it.
+
+    Several launches may fill the same cache. Every file is copied under a
+    lock file and the index is merged with the saved one on every save.
+    """
+
+    def __init__(self, root: Path, budget: int):
+        self.root = Path(root)
+        self.budget = budget
+        self.index_path = self.root / CACHE_INDEX_FILENAME
+        # keys removed since the last save, dropped from the saved index
+        self._removed: set[str] = set()
+        self._lock = threading.Lock()
+        self.entries: dict[str, dict] = self._read_index()
+
+    def _read_index(self) -> dict[str, dict]:
+        if not self.index_path.exists():
+            return {}
+        try:
+            return json.loads(self.index_path.read_text()).get("files", {})
+        except (OSError, ValueError):
+            log.warning(f"Ignoring unreadable cache index {self.index_path}")
+            return {}
+
+    def source_dir(self, source_root: Path) -> Path:
+        source_hash = hashlib.sha1(
+            Path(source_root).as_posix().encode("utf-8")
+        ).hexdigest()[:12]
+        return self.root / source_hash
+
+    def _cache_key(self, source_root: Path, rel_path: str) -> str:
+        return f"{self.source_dir(source_root).name}/{rel_path}"
+
+    def _last_used(self, key: str) -> float:
+        entry = self.entries[key]
+        try:
+            atime = os.stat(self.root / key).st_atime
+        except OSError:
+            return 0.0
+        return max(atime, entry.get("last_used", 0.0))
+
+    def _used_bytes(self) -> int:
+        return sum(entry["size"] for entry in self.entries.values())
+
+    def _forget(self, key: str):
+        self.entries.pop(key, None)
+        self._removed.add(key)
+
+    def _remove(self, key: str):
+        (self.root / key).unlink(missing_ok=True)
+        self._forget(key)
+
+    def _evict(self, required: int, used_before: float) -> Optional[int]:
+        """Evict least recently used files until `required` bytes are free.
+
+        Only files last used before `used_before` are evicted.
+
+        Returns:
+            Optional[int]: Number of evicted files or None if not enough
+                space could be freed.
+        """
+        free = self.budget - self._used_bytes()
+        if free >= required:
+            return 0
+        candidates = []
+        for key in self.entries:
+            last_used = self._last_used(key)
+            if last_used < used_before:
+                candidates.append((last_used, key))
+        candidates.sort()
+
+        evict = []
+        for _, key in candidates:
+            evict.append(key)
+            free += self.entries[key]["size"]
+            if free >= required:
+                break
+        if free < required:
+            return None
+        for key in evict:
+            log.debug(f"Evicting {key} from model cache")
+            self._remove(key)
+        return len(evict)
+
+    def save(self):
+        """Write the index, merged with entries other launches saved meanwhile."""
+        lock = LockFile(self.index_path.with_name(f"{CACHE_INDEX_FILENAME}{LOCK_SUFFIX}"))
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            if not lock.acquire(timeout=INDEX_LOCK_TIMEOUT):
+                log.warning(f"Cache index {self.index_path} is locked, not saving it")
+                return
+            try:
+                with self._lock:
+                    entries = self._read_index()
+                    for key in self._removed:
+                        # unless another launch cached it again
+                        if not (self.root / key).exists():
+                            entries.pop(key, None)
+                    entries.update(self.entries)
+                    self.entries = entries
+                    self._removed.clear()
+                    payload = json.dumps({"files": entries})
+                write_atomic(self.index_path, payload)
+            finally:
+                lock.release()
+        except OSError as e:
+            log.warning(f"Failed to write cache index {self.index_path}: {e}")
+
+    def fill(
+        self,
+        sources: list[tuple[Path, dict[str, tuple[int, int]]]],
+        stop_event: Optional[threading.Event] = None,
+    ) -> dict[str, int]:
+        """Copy missing or outdated files of `sources` into the cache.
+
+        Args:
+            sources: Source roots with their files (relative path to size and
+                mtime) in priority order, highest first.
+            stop_event: Stops filling after the current file when set.
+
+        Returns:
+            dict[str, int]: Number of `filled`, `evicted` and `skipped` files.
+        """
+        stats = {"filled": 0, "evicted": 0, "skipped": 0}
+        wanted: dict[str, tuple[Path, str, int, int]] = {}
+        for source_root, files in sources:
+            for rel_path, (size, mtime_ns) in files.items():
+                key = self._cache_key(source_root, rel_path)
+                wanted[key] = (source_root, rel_path, size, mtime_ns)
+
+        with self._lock:
+            for key in list(self.entries):
+                if not (self.root / key).exists():
+                    self._forget(key)
+                    continue
+                # the cache is shared, files of other sources are only
+                # evicted to stay within the budget
+                source = wanted.get(key)
+                if not source:
+                    continue
+                entry = self.entries[key]
+                if [source[2], source[3]] != [entry["size"], entry["mtime_ns"]]:
+                    # changed at the source
+                    self._remove(key)
+                    stats["evicted"] += 1
+
+        # most recently used source files first
+        missing = []
+        for key, (source_root, rel_path, _, _) in wanted.items():
+            if key in self.entries:
+                continue
+            try:
+                source_atime = os.stat(source_root / rel_path).st_atime
+            except OSError:
+                continue
+            missing.append((source_atime, key))
+        missing.sort(reverse=True)
+
+        for source_atime, key in missing:
+            if stop_event and stop_event.is_set():
+                break
+            source_root, rel_path, size, mtime_ns = wanted[key]
+            with self._lock:
+                evicted = None
+                if size <= self.budget:
+                    evicted = self._evict(size, source_atime)
+                if evicted is None:
+                    stats["skipped"] += 1
+                    continue
+                stats["evicted"] += evicted
+                self.entries[key] = {
+                    "size": size,
+                    "mtime_ns": mtime_ns,
+                    "last_used": time.time(),
+                }
+            dst = self.root / key
+            partial = dst.with_name(f".{dst.name}.{size}-{mtime_ns}{PARTIAL_SUFFIX}")
+            lock = LockFile(dst.with_name(f".{dst.name}{LOCK_SUFFIX}"))
+            try:
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                if not lock.acquire():
+                    # another launch is caching it and records it on save
+                    with self._lock:
+                        self._forget(key)
+                    stats["skipped"] += 1
+                    continue
+                try:
+                    self._copy(source_root / rel_path, partial, dst, size, mtime_ns, lock)
+                finally:
+                    lock.release()
+            except OSError as e:
+                log.warning(f"Failed to cache {source_root / rel_path}: {e}")
+                with self._lock:
+                    self._forget(key)
+                continue
+            stats["filled"] += 1
+            if stats["filled"] % 10 == 0:
+                self.save()
+
+        self.save()
+        log.info(
+            f"Model cache {self.root}: {stats}, "
+            f"{format_bytes(self._used_bytes())} of {format_bytes(self.budget)} used"
+        )
+        return stats
+
+    @staticmethod
+    def _copy(src: Path, partial: Path, dst: Path, size: int, mtime_ns: int, lock: LockFile):
+        """Copy `src` into the cache at `dst` while holding `lock`.
+
+        Raises:
+            OSError: If the copy failed or doesn't match the indexed size.
+        """
+        try:
+            dst_stat = os.stat(dst)
+            if (dst_stat.st_size, dst_stat.st_mtime_ns) == (size, mtime_ns):
+                # cached by another launch before we got the lock
+                return
+        except FileNotFoundError:
+            pass
+        place_file(src, partial, "copy", progress=lock.refresh)
+        copied = partial.stat().st_size
+        if copied != size:
+            # changed at the source while copying
+            partial.unlink(missing_ok=True)
+            raise OSError(f"copied {copied} bytes, expected {size}")
+        os.replace(partial, dst)
+
+    def start_background_fill(
+        self, sources: list[tuple[Path, dict[str, tuple[int, int]]]]
+    ) -> threading.Thread:
+        thread = threading.Thread(
+            target=self.fill, args=(sources,), daemon=True, name="ModelCacheFill"
+        )
+        thread.start()
+        return thread
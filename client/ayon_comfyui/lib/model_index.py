@@ -0,0 +1,268 @@
+import os
+import sys
+import json
+import time
+import struct
+import hashlib
+import select
+import threading
+from pathlib import Path
+from typing import Optional
+
+from ayon_core.lib import Logger
+
+from .manifest import write_atomic
+
+
+log = Logger.get_logger(__name__)
+
+MODEL_INDEX_PREFIX = "model_index"
+IGNORED_FILE_SUFFIXES = (".ayon-part", ".ayon-lock")
+
+# inotify constants, see <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (
+    IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def get_model_index_path(cache_dir: Path, root: Path) -> Path:
+    """Index file of model root `root` stored in `cache_dir`."""
+    root_hash = hashlib.sha1(Path(root).as_posix().encode("utf-8")).hexdigest()[:12]
+    return Path(cache_dir) / f"{MODEL_INDEX_PREFIX}.{root_hash}.json"
+
+
+class ModelIndex:
+    """Persisted recursive index of a model root directory.
+
+    Every directory stores its mtime, files and subdirectories. A directory
+    whose mtime didn't change since the last scan isn't listed again, only
+    its known files are stat'ed to pick up files rewritten in place, which
+    doesn't touch the directory mtime.
+    """
+
+    def __init__(self, cache_path: Path, root: Path):
+        self.cache_path = Path(cache_path)
+        self.root = Path(root)
+        self.dirs: dict[str, dict] = {}
+        self.changed = False
+        self._lock = threading.Lock()
+        if self.cache_path.exists():
+            try:
+                data = json.loads(self.cache_path.read_text())
+                if data.get("root") == self.root.as_posix():
+                    self.dirs = data.get("dirs", {})
+            except (OSError, ValueError):
+                log.warning(f"Ignoring unreadable model index {self.cache_path}")
+
+    def _list_dir(self, rel_dir: str, mtime_ns: int) -> dict:
+        files = {}
+        subdirs = []
+        with os.scandir(self.root / rel_dir) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=True):
+                    subdirs.append(entry.name)
+                elif entry.is_file(follow_symlinks=True):
+                    if entry.name.startswith(".") or entry.name.endswith(IGNORED_FILE_SUFFIXES):
+                        continue
+                    entry_stat = entry.stat(follow_symlinks=True)
+                    files[entry.name] = [entry_stat.st_size, entry_stat.st_mtime_ns]
+        return {"mtime_ns": mtime_ns, "files": files, "dirs": sorted(subdirs)}
+
+    def _restat_files(self, rel_dir: str, entry: dict) -> Optional[dict]:
+        """Entry of an unchanged directory with current file stats.
+
+        Returns:
+            Optional[dict]: Updated entry, None if a file is gone and the
+                directory has to be listed again.
+        """
+        files = {}
+        dir_path = self.root / rel_dir
+        for name, cached_stat in entry["files"].items():
+            try:
+                file_stat = os.stat(dir_path / name)
+            except OSError:
+                return None
+            files[name] = [file_stat.st_size, file_stat.st_mtime_ns]
+            if files[name] != list(cached_stat):
+                self.changed = True
+        return {**entry, "files": files}
+
+    def _scan_from(self, rel_dir: str, force: bool = False) -> dict[str, dict]:
+        scanned = {}
+        stack = [rel_dir]
+        while stack:
+            rel = stack.pop()
+            try:
+                mtime_ns = os.stat(self.root / rel).st_mtime_ns
+            except OSError:
+                continue
+            cached = self.dirs.get(rel)
+            entry = None
+            if cached and cached["mtime_ns"] == mtime_ns and not (force and rel == rel_dir):
+                entry = self._restat_files(rel, cached)
+            if entry is None:
+                try:
+                    entry = self._list_dir(rel, mtime_ns)
+                except OSError as e:
+                    log.warning(f"Failed to scan {self.root / rel}: {e}")
+                    continue
+                self.changed = True
+            scanned[rel] = entry
+            stack.extend(f"{rel}/{name}" if rel else name for name in entry["dirs"])
+        return scanned
+
+    def scan(self) -> bool:
+        """Update the index from disk.
+
+        Returns:
+            bool: Whether anything changed since the last scan.
+        """
+        with self._lock:
+            scanned = self._scan_from("")
+            if set(scanned) != set(self.dirs):
+                self.changed = True
+            self.dirs = scanned
+            return self.changed
+
+    def refresh_dir(self, rel_dir: str):
+        """List `rel_dir` again and update its subtree."""
+        with self._lock:
+            prefix = f"{rel_dir}/" if rel_dir else ""
+            old = {
+                rel for rel in self.dirs
+                if rel == rel_dir or rel.startswith(prefix)
+            }
+            scanned = self._scan_from(rel_dir, force=True)
+            for rel in old - set(scanned):
+                del self.dirs[rel]
+            self.dirs.update(scanned)
+            self.changed = True
+
+    def top_level_dirs(self) -> list[str]:
+        root = self.dirs.get("")
+        return list(root["dirs"]) if root else []
+
+    def files(self, rel_root: str = "") -> dict[str, tuple[int, int]]:
+        """Size and mtime of all files below `rel_root` keyed by relative path."""
+        prefix = f"{rel_root}/" if rel_root else ""
+        files = {}
+        with self._lock:
+            for rel, entry in self.dirs.items():
+                if rel != rel_root and not rel.startswith(prefix):
+                    continue
+                sub = rel[len(prefix):] if rel != rel_root else ""
+                for name, (size, mtime_ns) in entry["files"].items():
+                    files[f"{sub}/{name}" if sub else name] = (size, mtime_ns)
+        return files
+
+    def save(self):
+        with self._lock:
+            if not self.changed:
+                return
+            payload = json.dumps({"root": self.root.as_posix(), "dirs": self.dirs})
+            self.changed = False
+        try:
+            write_atomic(self.cache_path, payload)
+        except OSError as e:
+            log.warning(f"Failed to write model index {self.cache_path}: {e}")
+
+
+class ModelIndexWatcher(threading.Thread):
+    """Keeps a `ModelIndex` up to date using inotify. Linux only.
+
+    Note that inotify doesn't report changes made by other hosts on
+    network filesystems.
+    """
+
+    def __init__(self, index: ModelIndex, debounce: float = 2.0):
+        super().__init__(daemon=True, name="ModelIndexWatcher")
+        import ctypes
+
+        self.index = index
+        self.debounce = debounce
+        self._stop_event = threading.Event()
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._watches: dict[int, str] = {}
+        for rel in list(index.dirs):
+            self._add_watch(rel)
+
+    def _add_watch(self, rel_dir: str):
+        path = os.fsencode(self.index.root / rel_dir)
+        wd = self._libc.inotify_add_watch(self._fd, path, WATCH_MASK)
+        if wd >= 0:
+            self._watches[wd] = rel_dir
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _read_events(self) -> set[str]:
+        changed = set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size + name_len
+            rel_dir = self._watches.get(wd)
+            if rel_dir is None:
+                continue
+            if mask & IN_DELETE_SELF:
+                self._watches.pop(wd, None)
+            changed.add(rel_dir)
+        return changed
+
+    def run(self):
+        pending: set[str] = set()
+        last_event = 0.0
+        try:
+            while not self._stop_event.is_set():
+                readable, _, _ = select.select([self._fd], [], [], 0.5)
+                if readable:
+                    pending |= self._read_events()
+                    last_event = time.monotonic()
+                if not pending or time.monotonic() - last_event < self.debounce:
+                    continue
+                # only refresh the topmost changed directories
+                for rel_dir in sorted(pending):
+                    if any(rel_dir.startswith(f"{p}/") for p in pending if p != rel_dir and p):
+                        continue
+                    self.index.refresh_dir(rel_dir)
+                known = set(self._watches.values())
+                for rel_dir in list(self.index.dirs):
+                    if rel_dir not in known:
+                        self._add_watch(rel_dir)
+                self.index.save()
+                pending.clear()
+        finally:
+            os.close(self._fd)
+
+
+def start_model_index_watcher(index: ModelIndex) -> Optional[ModelIndexWatcher]:
+    if not sys.platform.startswith("linux"):
+        log.info("Watching model directories is only supported on Linux")
+        return None
+    try:
+        watcher = ModelIndexWatcher(index)
+    except OSError as e:
+        log.warning(f"Failed to watch model directories: {e}")
+        return None
+    watcher.start()
+    return watcher
@@ -0,0 +1,146 @@
+import os
+import mmap
+import json
+import stat
+import hashlib
+import threading
+from pathlib import Path
+from typing import Optional
+
+from ayon_core.lib import Logger
+
+from .models import place_file
+
+
+log = Logger.get_logger(__name__)
+
+HASH_INDEX_FILENAME = "index.json"
+HASH_CHUNK_SIZE = 64 * 1024 * 1024
+
+
+def hash_file_mmap(path: Path) -> str:
+    """SHA256 of `path` read through a memory map."""
+    hash_obj = hashlib.sha256()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return hash_obj.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, size, HASH_CHUNK_SIZE):
+                    # hashlib releases the GIL for large buffers
+                    hash_obj.update(view[offset:offset + HASH_CHUNK_SIZE])
+            finally:
+                view.release()
+    return hash_obj.hexdigest()
+
+
+class HashIndex:
+    """Persisted file hashes keyed by path and validated by size, mtime and inode."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.entries: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        if self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text()).get("files", {})
+            except (OSError, ValueError):
+                log.warning(f"Ignoring unreadable hash index {self.path}")
+
+    @staticmethod
+    def _key(file_stat: os.stat_result) -> list[int]:
+        return [file_stat.st_size, file_stat.st_mtime_ns, file_stat.st_ino]
+
+    def get(self, path: Path, file_stat: os.stat_result) -> Optional[str]:
+        entry = self.entries.get(Path(path).as_posix())
+        if entry and entry["key"] == self._key(file_stat):
+            return entry["sha256"]
+        return None
+
+    def set(self, path: Path, file_stat: os.stat_result, sha256: str):
+        with self._lock:
+            self.entries[Path(path).as_posix()] = {
+                "key": self._key(file_stat),
+                "sha256": sha256,
+            }
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = json.dumps({"files": self.entries})
+            self._dirty = False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(
+            f"{self.path.name}.tmp-{os.getpid()}-{threading.get_ident()}"
+        )
+        tmp_path.write_text(payload)
+        os.replace(tmp_path, self.path)
+
+
+class ModelStore:
+    """Content addressed store of model files shared between projects.
+
+    Every file is stored once under `objects/<sha[:2]>/<sha>` and linked
+    into the projects using it. Hashes are cached in a persisted index so
+    unchanged files are never hashed twice.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.index = HashIndex(self.root / HASH_INDEX_FILENAME)
+
+    def object_path(self, sha256: str) -> Path:
+        return self.objects_dir / sha256[:2] / sha256
+
+    def hash_file(self, path: Path) -> str:
+        file_stat = os.stat(path)
+        sha256 = self.index.get(path, file_stat)
+        if sha256:
+            return sha256
+        sha256 = hash_file_mmap(path)
+        self.index.set(path, file_stat, sha256)
+        return sha256
+
+    def ingest(self, path: Path) -> str:
+        """Add `path` to the store if its content isn't stored yet.
+
+        Returns:
+            str: SHA256 of the file content.
+        """
+        sha256 = self.hash_file(path)
+        object_path = self.object_path(sha256)
+        if object_path.exists():
+            return sha256
+
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = object_path.with_name(
+            f"{sha256}.tmp-{os.getpid()}-{threading.get_ident()}"
+        )
+        # never hardlink sources, edits to them would corrupt the store
+        place_file(path, tmp_path, "reflink")
+        # objects are shared through hardlinks, protect them from edits
+        os.chmod(tmp_path, stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
+        os.replace(tmp_path, object_path)
+        return sha256
+
+    def materialize(self, sha256: str, dst: Path, link_mode: str = "hardlink") -> str:
+        """Place the stored object `sha256` at `dst`.
+
+        Returns:
+            str: The link mode that was actually used.
+        """
+        if link_mode == "copy":
+            link_mode = "hardlink"
+        return place_file(self.object_path(sha256), dst, link_mode)
+
+    def save(self):
+        try:
+            self.index.save()
+        except OSError as e:
+            log.warning(f"Failed to write hash index {self.index.path}: {e}")
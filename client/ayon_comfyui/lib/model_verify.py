@@ -0,0 +1,193 @@
+import os
+import json
+import mmap
+import math
+import struct
+import threading
+from pathlib import Path
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+
+from ayon_core.lib import Logger
+
+from .manifest import write_atomic
+from .model_store import hash_file_mmap
+
+
+log = Logger.get_logger(__name__)
+
+VERIFY_CACHE_FILENAME = "model_verify.json"
+SAFETENSORS_SUFFIXES = (".safetensors", ".sft")
+# https://github.com/huggingface/safetensors#format
+SAFETENSORS_DTYPE_SIZES = {
+    "BOOL": 1, "U8": 1, "I8": 1, "F8_E4M3": 1, "F8_E5M2": 1, "F8_E8M0": 1,
+    "U16": 2, "I16": 2, "F16": 2, "BF16": 2,
+    "U32": 4, "I32": 4, "F32": 4,
+    "U64": 8, "I64": 8, "F64": 8,
+}
+MAX_SAFETENSORS_HEADER = 100 * 1024 * 1024
+
+
+def check_safetensors(path: Path) -> Optional[str]:
+    """Validate a safetensors file by its header only.
+
+    Checks that the declared tensor sizes match their data offsets and that
+    the file is exactly as long as the header says.
+
+    Returns:
+        Optional[str]: Description of the problem or None if the file is fine.
+    """
+    with open(path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        if file_size < 8:
+            return f"file too small ({file_size} bytes)"
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            (header_size,) = struct.unpack("<Q", mapped[:8])
+            if header_size > MAX_SAFETENSORS_HEADER or 8 + header_size > file_size:
+                return f"invalid header size {header_size}"
+            try:
+                header = json.loads(mapped[8:8 + header_size])
+            except ValueError as e:
+                return f"unreadable header: {e}"
+
+    data_size = 0
+    for name, tensor in header.items():
+        if name == "__metadata__":
+            continue
+        start, end = tensor["data_offsets"]
+        dtype_size = SAFETENSORS_DTYPE_SIZES.get(tensor.get("dtype"))
+        tensor_size = math.prod(tensor["shape"]) * (dtype_size or 0)
+        if dtype_size and end - start != tensor_size:
+            return f"tensor {name} has {end - start} bytes but its shape needs {tensor_size}"
+        data_size = max(data_size, end)
+
+    expected = 8 + header_size + data_size
+    if expected != file_size:
+        return f"expected {expected} bytes, file has {file_size} (truncated?)"
+    return None
+
+
+def read_checksum_manifest(path: Path) -> dict[str, str]:
+    """Read expected sha256 checksums keyed by path relative to the manifest.
+
+    Supports json (`{"path": "sha256"}`) and `sha256sum` output.
+    """
+    content = path.read_text(encoding="utf-8")
+    if path.suffix == ".json":
+        return {Path(k).as_posix(): v.lower() for k, v in json.loads(content).items()}
+
+    checksums = {}
+    for line in content.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        checksum, _, rel_path = line.partition(" ")
+        # sha256sum marks binary mode with a leading '*'
+        rel_path = rel_path.strip().lstrip("*")
+        checksums[Path(rel_path).as_posix()] = checksum.lower()
+    return checksums
+
+
+class VerificationCache:
+    """Persisted verification results validated by size, mtime and inode."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.results: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            try:
+                self.results = json.loads(self.path.read_text()).get("files", {})
+            except (OSError, ValueError):
+                log.warning(f"Ignoring unreadable verification cache {self.path}")
+
+    @staticmethod
+    def _key(file_stat: os.stat_result) -> list[int]:
+        return [file_stat.st_size, file_stat.st_mtime_ns, file_stat.st_ino]
+
+    def get(self, path: Path, file_stat: os.stat_result, expected: Optional[str]):
+        """Cached result as `(error,)` tuple or None if unknown."""
+        result = self.results.get(path.as_posix())
+        if (
+            result
+            and result["key"] == self._key(file_stat)
+            and result.get("expected") == expected
+        ):
+            return (result["error"],)
+        return None
+
+    def set(self, path: Path, file_stat: os.stat_result, expected: Optional[str], error: Optional[str]):
+        with self._lock:
+            self.results[path.as_posix()] = {
+                "key": self._key(file_stat),
+                "expected": expected,
+                "error": error,
+            }
+
+    def save(self):
+        with self._lock:
+            payload = json.dumps({"files": self.results})
+        try:
+            write_atomic(self.path, payload)
+        except OSError as e:
+            log.warning(f"Failed to write verification cache {self.path}: {e}")
+
+
+def verify_file(path: Path, expected: Optional[str] = None) -> Optional[str]:
+    try:
+        if path.suffix.lower() in SAFETENSORS_SUFFIXES:
+            error = check_safetensors(path)
+            if error:
+                return error
+        if expected and hash_file_mmap(path) != expected:
+            return "checksum mismatch"
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        return f"failed to read: {e}"
+    return None
+
+
+def verify_models(
+    files: list[Path],
+    checksums: dict[Path, str],
+    cache: VerificationCache,
+    max_workers: int = 4,
+) -> dict[Path, str]:
+    """Verify `files` in parallel, skipping files verified before.
+
+    Safetensors files get their header checked, files with an entry in
+    `checksums` get their sha256 compared.
+
+    Returns:
+        dict[Path, str]: Problems keyed by file path.
+    """
+    def _verify(path: Path) -> Optional[str]:
+        expected = checksums.get(path)
+        try:
+            file_stat = os.stat(path)
+        except OSError as e:
+            return f"failed to read: {e}"
+        cached = cache.get(path, file_stat, expected)
+        if cached is not None:
+            return cached[0]
+        error = verify_file(path, expected)
+        cache.set(path, file_stat, expected, error)
+        return error
+
+    to_verify = [
+        path for path in files
+        if path in checksums or path.suffix.lower() in SAFETENSORS_SUFFIXES
+    ]
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for path, error in zip(to_verify, executor.map(_verify, to_verify)):
+            if error:
+                errors[path] = error
+    cache.save()
+    return errors
+
+
+def format_verification_errors(errors: dict[Path, str]) -> str:
+    lines = [f"{len(errors)} corrupt model file(s) found:"]
+    for path, error in sorted(errors.items()):
+        lines.append(f"  - {path}: {error}")
+    return "\n".join(lines)
@@ -0,0 +1,399 @@
+import os
+import sys
+import json
+import stat
+import time
+import errno
+import shutil
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from ayon_core.lib import Logger
+
+
+log = Logger.get_logger(__name__)
+
+LINK_MODES = ("copy", "hardlink", "reflink", "symlink")
+# linux ioctl to share extents between files on CoW filesystems (btrfs, xfs)
+FICLONE = 0x40049409
+SYNC_INDEX_FILENAME = ".ayon_model_sync.json"
+PARTIAL_SUFFIX = ".ayon-part"
+LOCK_SUFFIX = ".ayon-lock"
+# locks not refreshed for this long belong to a writer that died
+LOCK_STALE_SECONDS = 120
+LOCK_REFRESH_SECONDS = 10
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def reflink_file(src: Path, dst: Path):
+    """Create a copy-on-write clone of `src` at `dst`.
+
+    Raises:
+        OSError: If the platform or filesystem doesn't support it.
+    """
+    if sys.platform.startswith("linux"):
+        import fcntl
+
+        with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+            try:
+                fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+            except OSError:
+                dst_file.close()
+                os.unlink(dst)
+                raise
+    elif sys.platform == "darwin":
+        import ctypes
+
+        libc = ctypes.CDLL("libc.dylib", use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), str(dst))
+    else:
+        raise OSError(errno.ENOTSUP, "Reflinks are not supported", str(dst))
+
+
+def make_replaceable(path: Path):
+    """Allow replacing or deleting `path` if it's a read-only store object.
+
+    Windows refuses to replace or delete read-only files, and hardlinks
+    share the attribute with the store object. Elsewhere only the directory
+    permissions matter and store objects stay protected.
+    """
+    if sys.platform != "win32":
+        return
+    try:
+        mode = os.stat(path).st_mode
+    except OSError:
+        return
+    if not mode & stat.S_IWRITE:
+        os.chmod(path, mode | stat.S_IWRITE)
+
+
+def same_filesystem(src: Path, dst: Path) -> bool:
+    """Whether `src` and the existing parent directory of `dst` share a device."""
+    dst_dir = Path(dst).parent
+    while not dst_dir.exists() and dst_dir != dst_dir.parent:
+        dst_dir = dst_dir.parent
+    try:
+        return os.stat(src).st_dev == os.stat(dst_dir).st_dev
+    except OSError:
+        return False
+
+
+def copy_file_resumable(
+    src: Path, dst: Path, progress: Optional[Callable[[int], None]] = None
+):
+    """Copy `src` to `dst` in chunks, appending to an existing partial `dst`."""
+    offset = dst.stat().st_size if dst.exists() else 0
+    if offset > src.stat().st_size:
+        offset = 0
+    with open(src, "rb") as src_file, open(dst, "ab" if offset else "wb") as dst_file:
+        src_file.seek(offset)
+        if offset and progress:
+            progress(offset)
+        while True:
+            chunk = src_file.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                break
+            dst_file.write(chunk)
+            if progress:
+                progress(len(chunk))
+    shutil.copystat(src, dst)
+
+
+class LockFile:
+    """Exclusive lock shared by every process and workstation using `path`.
+
+    The lock file is created with `O_EXCL` and its holder refreshes the
+    mtime while working. A lock that wasn't refreshed for `stale_after`
+    seconds belongs to a writer that died and is taken over.
+    """
+
+    def __init__(self, path: Path, stale_after: float = LOCK_STALE_SECONDS):
+        self.path = Path(path)
+        self.stale_after = stale_after
+        self.locked = False
+        self._refreshed = 0.0
+
+    def _is_stale(self) -> bool:
+        try:
+            return time.time() - self.path.stat().st_mtime > self.stale_after
+        except FileNotFoundError:
+            # released meanwhile, just try again
+            return False
+
+    def acquire(self, timeout: float = 0) -> bool:
+        """Take the lock, waiting up to `timeout` seconds for its holder.
+
+        Returns:
+            bool: Whether the lock was taken.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if self._is_stale():
+                    log.info(f"Taking over stale lock {self.path}")
+                    self.path.unlink(missing_ok=True)
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                time.sleep(min(0.5, remaining))
+                continue
+            os.close(fd)
+            self.locked = True
+            self._refreshed = time.monotonic()
+            return True
+
+    def refresh(self, _size: int = 0):
+        """Mark the lock as alive, can be passed as copy `progress`."""
+        now = time.monotonic()
+        if not self.locked or now - self._refreshed < LOCK_REFRESH_SECONDS:
+            return
+        self._refreshed = now
+        try:
+            os.utime(self.path)
+        except OSError as e:
+            log.debug(f"Failed to refresh lock {self.path}: {e}")
+
+    def release(self):
+        if self.locked:
+            self.locked = False
+            self.path.unlink(missing_ok=True)
+
+
+def place_file(
+    src,
+    dst,
+    link_mode: str = "copy",
+    progress: Optional[Callable[[int], None]] = None,
+) -> str:
+    """Place `src` at `dst` using `link_mode`.
+
+    Hardlinks and reflinks fall back to a regular copy if source and
+    destination are on different filesystems or linking fails. Symlinks
+    fall back to a copy if they can't be created, e.g. due to missing
+    privileges on Windows.
+
+    If `progress` is given copies are done in chunks and `progress` is
+    called with the number of bytes written.
+
+    Returns:
+        str: The link mode that was actually used.
+    """
+    src, dst = Path(src), Path(dst)
+    if link_mode in ("hardlink", "reflink") and not same_filesystem(src, dst):
+        link_mode = "copy"
+
+    try:
+        if link_mode == "hardlink":
+            os.link(src, dst)
+            return link_mode
+        if link_mode == "reflink":
+            reflink_file(src, dst)
+            return link_mode
+        if link_mode == "symlink":
+            os.symlink(src.resolve(), dst)
+            return link_mode
+    except OSError as e:
+        log.debug(f"Failed to {link_mode} {src} to {dst}, copying instead: {e}")
+
+    if progress:
+        copy_file_resumable(src, dst, progress)
+    else:
+        shutil.copy2(src, dst)
+    return "copy"
+
+
+def scan_files(root: Path) -> dict[str, tuple[int, int]]:
+    """Size and mtime of all files below `root` keyed by relative posix path."""
+    files = {}
+    stack = [(root, "")]
+    while stack:
+        dirpath, prefix = stack.pop()
+        try:
+            entries = list(os.scandir(dirpath))
+        except OSError as e:
+            log.warning(f"Failed to scan {dirpath}: {e}")
+            continue
+        for entry in entries:
+            rel_path = f"{prefix}{entry.name}"
+            if entry.is_dir(follow_symlinks=True):
+                stack.append((entry.path, f"{rel_path}/"))
+            elif entry.is_file(follow_symlinks=True):
+                if entry.name.endswith((PARTIAL_SUFFIX, LOCK_SUFFIX)) or entry.name == SYNC_INDEX_FILENAME:
+                    continue
+                file_stat = entry.stat(follow_symlinks=True)
+                files[rel_path] = (file_stat.st_size, file_stat.st_mtime_ns)
+    return files
+
+
+class ModelSyncIndex:
+    """Persisted size/mtime of every source file synced to a destination."""
+
+    def __init__(self, dst_dir: Path):
+        self.path = Path(dst_dir) / SYNC_INDEX_FILENAME
+        self.files: dict[str, list[int]] = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            try:
+                self.files = json.loads(self.path.read_text()).get("files", {})
+            except (OSError, ValueError):
+                log.warning(f"Ignoring unreadable sync index {self.path}")
+
+    def is_synced(self, rel_path: str, stat: tuple[int, int]) -> bool:
+        return self.files.get(rel_path) == list(stat)
+
+    def set(self, rel_path: str, stat: tuple[int, int]):
+        with self._lock:
+            self.files[rel_path] = list(stat)
+
+    def remove(self, rel_path: str):
+        with self._lock:
+            self.files.pop(rel_path, None)
+
+    def save(self):
+        with self._lock:
+            payload = json.dumps({"files": self.files})
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp-{os.getpid()}")
+        tmp_path.write_text(payload)
+        os.replace(tmp_path, self.path)
+
+
+def sync_tree(
+    src_dir: Path,
+    dst_dir: Path,
+    link_mode: str = "copy",
+    delete: bool = False,
+    max_workers: int = 4,
+    store=None,
+    src_files: Optional[dict[str, tuple[int, int]]] = None,
+    src_roots: Optional[dict[str, Path]] = None,
+    progress_callback=None,
+) -> dict[str, int]:
+    """Incrementally sync all files of `src_dir` to `dst_dir`.
+
+    Only files whose size or mtime changed since the last sync, or which are
+    missing at the destination, are placed again. Files are written to a
+    partial file first and renamed when complete, so an interrupted sync
+    resumes cleanly. With `delete` files that were synced before but have
+    been removed from the source are deleted as well.
+
+    If a `ModelStore` is given every file is added to the store and linked
+    from there, so identical files are only stored once. `src_files` can be
+    passed from a `ModelIndex` to avoid scanning the source again.
+    `src_roots` maps relative paths to the root they should be read from
+    instead of `src_dir`, which allows merging several sources.
+
+    Returns:
+        dict[str, int]: Number of `synced`, `skipped` and `deleted` files and
+            the number of `bytes` transferred.
+    """
+    src_dir, dst_dir = Path(src_dir), Path(dst_dir)
+    index = ModelSyncIndex(dst_dir)
+    if src_files is None:
+        src_files = scan_files(src_dir)
+
+    to_sync = [
+        rel_path for rel_path, file_stat in src_files.items()
+        if not index.is_synced(rel_path, file_stat) or not (dst_dir / rel_path).exists()
+    ]
+    stats = {
+        "synced": 0,
+        "skipped": len(src_files) - len(to_sync),
+        "deleted": 0,
+        "bytes": 0,
+    }
+
+    if delete:
+        for rel_path in list(index.files):
+            if rel_path in src_files:
+                continue
+            try:
+                make_replaceable(dst_dir / rel_path)
+                (dst_dir / rel_path).unlink(missing_ok=True)
+            except OSError as e:
+                # e.g. still opened by a running server, retried next sync
+                log.warning(f"Failed to delete {dst_dir / rel_path}: {e}")
+                continue
+            index.remove(rel_path)
+            stats["deleted"] += 1
+
+    total_bytes = sum(src_files[rel_path][0] for rel_path in to_sync)
+    progress_lock = threading.Lock()
+    last_report = [0.0]
+
+    def _progress(size: int):
+        with progress_lock:
+            stats["bytes"] += size
+            now = time.monotonic()
+            if not progress_callback or now - last_report[0] < 0.25:
+                return
+            last_report[0] = now
+        progress_callback(
+            f"Syncing {src_dir.name}: "
+            f"{format_bytes(stats['bytes'])} / {format_bytes(total_bytes)}"
+        )
+
+    def _sync_file(rel_path: str):
+        size, mtime_ns = src_files[rel_path]
+        src = (src_roots or {}).get(rel_path, src_dir) / rel_path
+        dst = dst_dir / rel_path
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        # partial files are unique per source version so they can be resumed
+        partial = dst.with_name(f".{dst.name}.{size}-{mtime_ns}{PARTIAL_SUFFIX}")
+        if link_mode != "copy" or store:
+            make_replaceable(partial)
+            partial.unlink(missing_ok=True)
+        if store:
+            used_mode = store.materialize(store.ingest(src), partial, link_mode)
+        else:
+            used_mode = place_file(src, partial, link_mode, progress=_progress)
+        if used_mode != "copy":
+            _progress(size)
+        make_replaceable(dst)
+        os.replace(partial, dst)
+        index.set(rel_path, (size, mtime_ns))
+
+    if to_sync:
+        log.info(
+            f"Syncing {len(to_sync)} files ({format_bytes(total_bytes)}) "
+            f"from {src_dir} to {dst_dir}"
+        )
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {
+                executor.submit(_sync_file, rel_path): rel_path
+                for rel_path in to_sync
+            }
+            errors = []
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    stats["synced"] += 1
+                except OSError as e:
+                    errors.append(f"{futures[future]}: {e}")
+    finally:
+        if to_sync or stats["deleted"]:
+            index.save()
+        if store:
+            store.save()
+
+    if errors:
+        raise RuntimeError(
+            f"Failed to sync {len(errors)} file(s) to {dst_dir}:\n" + "\n".join(errors)
+        )
+    return stats
@@ -0,0 +1,143 @@
+import threading
+from typing import Callable, Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from ayon_core.lib import Logger
+
+from .profiling import phase
+
+
+log = Logger.get_logger(__name__)
+
+
+class PipelineCancelled(Exception):
+    pass
+
+
+class Step:
+    """Unit of work of a `Pipeline`.
+
+    Args:
+        name: Unique step name.
+        func: Called with `progress_callback` once all inputs are available.
+        inputs: Names of outputs of other steps this step depends on.
+        outputs: Names of what this step provides to other steps.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable,
+        inputs: tuple[str, ...] = (),
+        outputs: tuple[str, ...] = (),
+    ):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+
+    def __repr__(self):
+        return f"<Step {self.name}>"
+
+
+class Pipeline:
+    """Run steps on a worker pool as soon as their inputs are available.
+
+    Independent steps run concurrently, so the total time approaches the
+    longest chain of dependent steps. The first failing step cancels the
+    pipeline. Cancelling is cooperative: running steps stop at their next
+    progress report, steps not started yet are skipped.
+    """
+
+    def __init__(self, steps: list[Step], max_workers: int = 4):
+        self.steps = list(steps)
+        self.max_workers = max(1, max_workers)
+        self._cancelled = threading.Event()
+        self._validate()
+
+    def _validate(self):
+        """Check that every step can run.
+
+        Raises:
+            ValueError: If outputs are ambiguous, inputs are never provided
+                or steps depend on each other in a cycle.
+        """
+        providers = {}
+        for step in self.steps:
+            for output in step.outputs:
+                if output in providers:
+                    raise ValueError(
+                        f"{output} is provided by {providers[output].name} and {step.name}"
+                    )
+                providers[output] = step
+        for step in self.steps:
+            missing = [name for name in step.inputs if name not in providers]
+            if missing:
+                raise ValueError(f"No step provides {', '.join(missing)} for {step.name}")
+
+        provided = set()
+        pending = list(self.steps)
+        while pending:
+            ready = [step for step in pending if provided.issuperset(step.inputs)]
+            if not ready:
+                names = ", ".join(step.name for step in pending)
+                raise ValueError(f"Steps depend on each other in a cycle: {names}")
+            for step in ready:
+                provided.update(step.outputs)
+                pending.remove(step)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def _run_step(self, step: Step, progress_callback: Optional[Callable]):
+        def _progress(message: str):
+            if self._cancelled.is_set():
+                raise PipelineCancelled(f"{step.name} was cancelled")
+            if progress_callback:
+                progress_callback(message)
+
+        _progress(f"Starting {step.name}...")
+        log.debug(f"Starting step {step.name}")
+        with phase(step.name):
+            step.func(progress_callback=_progress)
+        log.debug(f"Finished step {step.name}")
+
+    def run(self, progress_callback: Optional[Callable] = None):
+        """Run all steps.
+
+        Raises:
+            PipelineCancelled: If the pipeline was cancelled.
+            Exception: The error of the first failing step.
+        """
+        provided = set()
+        pending = list(self.steps)
+        running = {}
+        error = None
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                if not self._cancelled.is_set():
+                    for step in [s for s in pending if provided.issuperset(s.inputs)]:
+                        pending.remove(step)
+                        future = pool.submit(self._run_step, step, progress_callback)
+                        running[future] = step
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    step_error = future.exception()
+                    if step_error is None:
+                        provided.update(step.outputs)
+                        continue
+                    if error is None and not isinstance(step_error, PipelineCancelled):
+                        log.debug(f"Step {step.name} failed: {step_error}")
+                        error = step_error
+                    self._cancelled.set()
+        if error:
+            raise error
+        if self._cancelled.is_set():
+            raise PipelineCancelled("Pipeline was cancelled")
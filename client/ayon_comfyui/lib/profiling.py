@@ -0,0 +1,158 @@
+import json
+import time
+import uuid
+import socket
+import threading
+from pathlib import Path
+from typing import Optional
+from contextlib import contextmanager
+
+from ayon_core.lib import Logger
+
+from .models import format_bytes
+
+
+log = Logger.get_logger(__name__)
+
+PROFILE_FILENAME = "launch_profile.jsonl"
+
+_active_profiler = None
+_local = threading.local()
+
+
+class Phase:
+    """Measurements of a single launch phase."""
+
+    def __init__(self, name: str, start: float):
+        self.name = name
+        self.start = start
+        self.duration = 0.0
+        self.bytes = 0
+        self.cache: Optional[str] = None
+        self.status = "ok"
+        self.extra: dict = {}
+
+    def to_dict(self) -> dict:
+        return {
+            "phase": self.name,
+            "start": round(self.start, 4),
+            "duration": round(self.duration, 4),
+            "bytes": self.bytes,
+            "cache": self.cache,
+            "status": self.status,
+            **self.extra,
+        }
+
+
+class LaunchProfiler:
+    """Collect the phases of a launch and write them as a profile.
+
+    Phases are measured with the `phase` context manager of this module,
+    which records into the active profiler of the process. Library code
+    can thereby report phases without passing a profiler around.
+    """
+
+    def __init__(self, **metadata):
+        self.launch_id = uuid.uuid4().hex
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.metadata = {"host": socket.gethostname(), **metadata}
+        self.phases: list[Phase] = []
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def add(self, phase: Phase):
+        with self._lock:
+            self.phases.append(phase)
+
+    def activate(self):
+        global _active_profiler
+        _active_profiler = self
+
+    def deactivate(self):
+        global _active_profiler
+        if _active_profiler is self:
+            _active_profiler = None
+
+    def records(self) -> list[dict]:
+        with self._lock:
+            phases = sorted(self.phases, key=lambda phase: phase.start)
+        records = [
+            {"launch_id": self.launch_id, **phase.to_dict()} for phase in phases
+        ]
+        records.append({
+            "launch_id": self.launch_id,
+            "phase": "launch",
+            "timestamp": self.started,
+            "duration": round(self.elapsed(), 4),
+            "bytes": sum(phase.bytes for phase in phases),
+            **self.metadata,
+        })
+        return records
+
+    def write(self, directory: Path) -> Path:
+        """Append this launch's records to the profile in `directory`."""
+        path = Path(directory) / PROFILE_FILENAME
+        lines = "".join(json.dumps(record) + "\n" for record in self.records())
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(lines)
+        return path
+
+    def format_summary(self) -> str:
+        with self._lock:
+            phases = sorted(self.phases, key=lambda phase: phase.start)
+        width = max([len(phase.name) for phase in phases] + [5])
+        lines = [
+            f"{'Phase':<{width}}  {'Start':>8}  {'Time':>8}  {'Bytes':>10}  Cache",
+            "-" * (width + 40),
+        ]
+        for phase in phases:
+            status = "" if phase.status == "ok" else f" ({phase.status})"
+            lines.append(
+                f"{phase.name:<{width}}  {phase.start:>7.2f}s  {phase.duration:>7.2f}s  "
+                f"{format_bytes(phase.bytes) if phase.bytes else '-':>10}  "
+                f"{phase.cache or '-'}{status}"
+            )
+        lines.append(f"{'Total':<{width}}  {'':>8}  {self.elapsed():>7.2f}s")
+        return "\n".join(lines)
+
+
+@contextmanager
+def phase(name: str, **extra):
+    """Measure the wall time of the enclosed block as launch phase `name`.
+
+    Does nothing without an active profiler.
+    """
+    profiler = _active_profiler
+    if profiler is None:
+        yield None
+        return
+
+    current = Phase(name, profiler.elapsed())
+    current.extra.update(extra)
+    stack = _local.__dict__.setdefault("stack", [])
+    stack.append(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.status = type(e).__name__
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        stack.pop()
+        profiler.add(current)
+
+
+def record(cache_hit: Optional[bool] = None, bytes_transferred: int = 0, **extra):
+    """Annotate the innermost phase of the calling thread."""
+    stack = getattr(_local, "stack", None)
+    if not stack:
+        return
+    current = stack[-1]
+    if cache_hit is not None:
+        current.cache = "hit" if cache_hit else "miss"
+    current.bytes += bytes_transferred
+    current.extra.update(extra)
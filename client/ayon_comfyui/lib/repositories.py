@@ -0,0 +1,382 @@
+import os
+import re
+import git
+import json
+import time
+import shutil
+import hashlib
+import threading
+from pathlib import Path
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from ayon_core.lib import Logger
+
+from .profiling import phase, record
+
+
+log = Logger.get_logger(__name__)
+
+COMMIT_SHA_REGEX = re.compile(r"^(?:[0-9a-f]{40}|[0-9a-f]{64})$")
+REF_CACHE_FILENAME = "ayon_comfyui_refs.json"
+MIRROR_STAMP_FILENAME = "ayon_comfyui_last_fetch"
+# tags can be moved upstream, they are fetched again after this many seconds
+REF_CACHE_TTL = 24 * 60 * 60
+
+
+def is_commit_sha(ref: str) -> bool:
+    return bool(COMMIT_SHA_REGEX.match(ref.lower()))
+
+
+class RefCache:
+    """Local cache of resolved tag and commit SHAs of a repository.
+
+    Stored inside the repository's git dir so it moves and dies with the
+    clone. Keeps track of when each ref was last fetched from the remote,
+    so tags moved upstream are picked up once the fetch is `REF_CACHE_TTL`
+    old.
+    """
+
+    def __init__(self, repo: git.Repo):
+        self.path = Path(repo.git_dir) / REF_CACHE_FILENAME
+        self.data = {"refs": {}}
+        if self.path.exists():
+            try:
+                self.data = json.loads(self.path.read_text())
+            except (OSError, ValueError):
+                log.warning(f"Ignoring unreadable ref cache {self.path}")
+
+    def get(self, ref: str) -> Optional[str]:
+        entry = self.data["refs"].get(ref)
+        return entry["sha"] if entry else None
+
+    def set(self, ref: str, sha: str, fetched: bool = False):
+        entry = self.data["refs"].setdefault(ref, {})
+        entry["sha"] = sha
+        if fetched:
+            entry["fetched_at"] = time.time()
+
+    def last_fetched(self, ref: str) -> Optional[float]:
+        return self.data["refs"].get(ref, {}).get("fetched_at")
+
+    def is_fresh(self, ref: str, ttl: float = REF_CACHE_TTL) -> bool:
+        """Whether `ref` can be trusted without asking the remote."""
+        if is_commit_sha(ref):
+            # commits can't move
+            return True
+        fetched_at = self.last_fetched(ref)
+        return fetched_at is not None and time.time() - fetched_at < ttl
+
+    def save(self):
+        try:
+            self.path.write_text(json.dumps(self.data, indent=2))
+        except OSError as e:
+            log.warning(f"Failed to write ref cache {self.path}: {e}")
+
+
+def resolve_local_ref(repo: git.Repo, ref: str) -> Optional[str]:
+    """Resolve `ref` to a commit SHA without touching the network."""
+    try:
+        return repo.git.rev_parse("--verify", "--quiet", f"{ref}^{{commit}}")
+    except git.GitCommandError:
+        return None
+
+
+class MirrorCache:
+    """Shared store of bare mirror repositories keyed by URL.
+
+    Project clones borrow their objects from the mirror via git alternates,
+    so each repository is only downloaded and stored once per workstation
+    or site. Mirrors are refreshed at most once per `ttl` seconds.
+    """
+
+    def __init__(self, root: Path, ttl: float = 3600):
+        self.root = Path(root)
+        self.ttl = ttl
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def mirror_path(self, url: str) -> Path:
+        url_hash = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+        return self.root / f"{Path(url).stem}-{url_hash}.git"
+
+    def _lock_for(self, url: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(url, threading.Lock())
+
+    def _is_stale(self, path: Path) -> bool:
+        stamp = path / MIRROR_STAMP_FILENAME
+        if not stamp.exists():
+            return True
+        return time.time() - stamp.stat().st_mtime > self.ttl
+
+    def _touch(self, path: Path):
+        (path / MIRROR_STAMP_FILENAME).touch()
+
+    @staticmethod
+    def _disable_gc(mirror: git.Repo):
+        # project clones borrow objects through alternates, pruning them
+        # from the mirror would corrupt those clones
+        mirror.git.config("gc.auto", "0")
+        mirror.git.config("gc.pruneExpire", "never")
+
+    def ensure(self, url: str) -> Optional[Path]:
+        """Create or refresh the mirror of `url`.
+
+        Returns:
+            Optional[Path]: Mirror path or None if it couldn't be created.
+        """
+        path = self.mirror_path(url)
+        with self._lock_for(url):
+            if path.exists():
+                if self._is_stale(path):
+                    log.info(f"Refreshing mirror {path}")
+                    try:
+                        mirror = git.Repo(path)
+                        # mirrors created before gc was disabled
+                        self._disable_gc(mirror)
+                        mirror.git.fetch("origin", prune=True, tags=True, force=True)
+                        self._touch(path)
+                    except git.GitCommandError as e:
+                        log.warning(f"Failed to refresh mirror {path}, using it as is: {e}")
+                return path
+
+            log.info(f"Creating mirror of {url} at {path}")
+            tmp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}-{threading.get_ident()}")
+            try:
+                self.root.mkdir(parents=True, exist_ok=True)
+                mirror = git.Repo.clone_from(url, tmp_path, bare=True)
+                # only track branches and tags, no pull request refs etc.
+                mirror.git.config("remote.origin.fetch", "+refs/heads/*:refs/heads/*")
+                self._disable_gc(mirror)
+                self._touch(tmp_path)
+                tmp_path.rename(path)
+            except (git.GitCommandError, OSError) as e:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                if path.exists():
+                    # another process created it in the meantime
+                    return path
+                log.warning(f"Failed to create mirror of {url}: {e}")
+                return None
+            return path
+
+
+def get_head_sha(path: Path) -> Optional[str]:
+    """Commit SHA of HEAD of the repository at `path` if there is one."""
+    if not path.exists():
+        return None
+    try:
+        repo = git.Repo(path)
+        if not repo.head.is_valid():
+            return None
+        return repo.head.commit.hexsha
+    except (git.InvalidGitRepositoryError, git.NoSuchPathError, ValueError):
+        return None
+
+
+def fetch_from_mirror(repo: git.Repo, mirror_path: Path):
+    """Update the remote tracking refs of `repo` from a local mirror."""
+    repo.git.fetch(
+        mirror_path.as_posix(),
+        "+refs/heads/*:refs/remotes/origin/*",
+        "+refs/tags/*:refs/tags/*",
+    )
+
+
+def fetch_ref(repo: git.Repo, ref: str, depth: int = 0):
+    """Fetch only `ref` from origin and store it in FETCH_HEAD."""
+    fetch_kwargs = {"depth": depth} if depth else {}
+    repo.git.fetch("origin", ref, no_tags=True, **fetch_kwargs)
+
+
+def get_object_bytes(repo: git.Repo) -> int:
+    """Size of all objects of `repo` in bytes."""
+    counts = {}
+    for line in repo.git.count_objects("-v").splitlines():
+        key, _, value = line.partition(":")
+        counts[key.strip()] = value.strip()
+    return (int(counts.get("size", 0)) + int(counts.get("size-pack", 0))) * 1024
+
+
+def git_clone(
+    url: str,
+    dest: Path,
+    tag: str = "",
+    depth: int = 0,
+    blob_filter: bool = False,
+    mirror: Optional[MirrorCache] = None,
+) -> git.Repo:
+    """Clone `url` to `dest` or update an existing clone.
+
+    Checks out `tag` if given, otherwise pulls the latest changes. `tag` may
+    also be a full commit SHA. If the existing clone is already at the
+    requested tag or commit no network calls are made.
+
+    A `depth` > 0 creates a shallow clone and only fetches the requested ref
+    on updates. `blob_filter` creates a partial clone which downloads file
+    contents on demand. Both are ignored if a `mirror` is given, in which
+    case the repository is cloned and updated from the local mirror.
+    """
+    with phase(f"git/{dest.name}") as current:
+        before = 0
+        if current and dest.exists():
+            before = get_object_bytes(git.Repo(dest))
+        repo = _git_clone(url, dest, tag, depth, blob_filter, mirror)
+        if current and current.cache is None:
+            record(
+                cache_hit=False,
+                bytes_transferred=max(0, get_object_bytes(repo) - before),
+            )
+        return repo
+
+
+def _git_clone(
+    url: str,
+    dest: Path,
+    tag: str = "",
+    depth: int = 0,
+    blob_filter: bool = False,
+    mirror: Optional[MirrorCache] = None,
+) -> git.Repo:
+    fetch_kwargs = {"depth": depth} if depth else {}
+    mirror_path = None
+    if not dest.exists():
+        if mirror:
+            mirror_path = mirror.ensure(url)
+        if mirror_path:
+            log.info(f"Cloning {url} to {dest} via mirror {mirror_path}")
+            repo = git.Repo.clone_from(
+                mirror_path.as_posix(),
+                dest,
+                reference=mirror_path.as_posix(),
+                no_checkout=bool(tag),
+            )
+            repo.remotes.origin.set_url(url)
+        else:
+            log.info(f"Cloning {url} to {dest}")
+            clone_kwargs = dict(fetch_kwargs)
+            if blob_filter:
+                clone_kwargs["filter"] = "blob:none"
+            if depth and tag:
+                if is_commit_sha(tag):
+                    clone_kwargs["no_checkout"] = True
+                else:
+                    clone_kwargs["branch"] = tag
+            repo = git.Repo.clone_from(url, dest, **clone_kwargs)
+        cloned = True
+    else:
+        repo = git.Repo(dest)
+        cloned = False
+
+    ref_cache = RefCache(repo)
+    if tag and not cloned:
+        pinned_sha = ref_cache.get(tag)
+        if not pinned_sha:
+            pinned_sha = resolve_local_ref(repo, tag)
+            if pinned_sha:
+                ref_cache.set(tag, pinned_sha)
+                ref_cache.save()
+        if pinned_sha and repo.head.is_valid() and repo.head.commit.hexsha == pinned_sha:
+            if ref_cache.is_fresh(tag):
+                log.info(f"{repo} is already at {tag}, skipping fetch")
+                record(cache_hit=True)
+                if repo.is_dirty(untracked_files=True):
+                    log.info(f"Stashing uncommitted changes in {repo}")
+                    repo.git.stash("save", "--include-untracked")
+                return repo
+            log.info(f"{repo} is at {tag}, checking whether the tag moved upstream")
+
+    if not cloned and mirror:
+        mirror_path = mirror.ensure(url)
+
+    checkout_ref = tag
+    if mirror_path:
+        if not cloned:
+            fetch_from_mirror(repo, mirror_path)
+    elif tag and depth:
+        # shallow clones only ever fetch the requested ref
+        if not cloned or is_commit_sha(tag):
+            fetch_ref(repo, tag, depth)
+            checkout_ref = "FETCH_HEAD"
+    elif tag and not cloned:
+        # force updates tags moved upstream
+        repo.git.fetch(tags=True, force=True)
+
+    if not cloned and repo.is_dirty(untracked_files=True):
+        log.info(f"Stashing uncommitted changes in {repo}")
+        repo.git.stash("save", "--include-untracked")
+
+    if tag:
+        if checkout_ref == tag and is_commit_sha(tag) and not resolve_local_ref(repo, tag):
+            # commits not reachable from any branch or tag need an explicit fetch
+            fetch_ref(repo, tag)
+            checkout_ref = "FETCH_HEAD"
+        log.info(f"Checking out {tag} for {repo}")
+        repo.git.checkout(checkout_ref)
+        ref_cache.set(tag, repo.head.commit.hexsha, fetched=True)
+        ref_cache.save()
+    elif mirror_path:
+        if not cloned:
+            repo.git.merge("--ff-only", "@{upstream}")
+    elif depth:
+        if not cloned:
+            # shallow histories can't be merged, move to the fetched tip instead
+            branch = "HEAD" if repo.head.is_detached else repo.active_branch.name
+            fetch_ref(repo, branch, depth)
+            repo.git.reset("--hard", "FETCH_HEAD")
+    else:
+        repo.remotes.origin.pull(**fetch_kwargs)
+    return repo
+
+
+def clone_plugins(
+    plugins: list[dict],
+    max_workers: int = 1,
+    mirror: Optional[MirrorCache] = None,
+    progress_callback=None,
+) -> dict[str, Exception]:
+    """Clone or update all plugins using up to `max_workers` threads.
+
+    Every plugin is expected to have its `root` already resolved. A failing
+    plugin doesn't abort the others.
+
+    Returns:
+        dict[str, Exception]: Errors keyed by plugin name.
+    """
+    def _setup_plugin(plugin: dict):
+        plugin_name = plugin["root"].name
+        if progress_callback:
+            progress_callback(f"Setting up Plugin: {plugin_name}")
+        git_clone(
+            url=plugin["url"],
+            dest=plugin["root"],
+            tag=plugin["tag"],
+            depth=plugin.get("depth", 0),
+            blob_filter=plugin.get("blob_filter", False),
+            mirror=mirror,
+        )
+        if progress_callback:
+            progress_callback(f"Plugin ready: {plugin_name}")
+
+    errors: dict[str, Exception] = {}
+    max_workers = max(1, min(max_workers, len(plugins) or 1))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_setup_plugin, plugin): plugin["root"].name
+            for plugin in plugins
+        }
+        for future in as_completed(futures):
+            plugin_name = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                log.error(f"Failed to set up plugin {plugin_name}: {e}")
+                errors[plugin_name] = e
+    return errors
+
+
+def format_clone_errors(errors: dict[str, Exception]) -> str:
+    lines = [f"Failed to set up {len(errors)} plugin(s):"]
+    for plugin_name, error in sorted(errors.items()):
+        lines.append(f"  - {plugin_name}: {error}")
+    return "\n".join(lines)
@@ -0,0 +1,111 @@
+import json
+import socket
+import asyncio
+import urllib.error
+import urllib.request
+from typing import Optional
+
+from ayon_core.lib import Logger
+
+
+log = Logger.get_logger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8188
+READINESS_ENDPOINT = "system_stats"
+
+
+def get_probe_host(host: str) -> str:
+    """Address to reach a server listening on `host` from this machine."""
+    if host in ("", "0.0.0.0", "::"):
+        return DEFAULT_HOST
+    return host
+
+
+def split_server_flags(flags: list[str]) -> tuple[list[str], Optional[str], Optional[int]]:
+    """Take `--listen` and `--port` out of ComfyUI command line flags.
+
+    Both accept `--flag value` and `--flag=value`. A bare `--listen` listens
+    on all interfaces like ComfyUI does.
+
+    Returns:
+        tuple[list[str], Optional[str], Optional[int]]: Remaining flags,
+            listen address and port, None if not given.
+
+    Raises:
+        ValueError: If the port isn't a number.
+    """
+    rest = []
+    host = port = None
+    index = 0
+    while index < len(flags):
+        flag = flags[index]
+        name, has_value, value = flag.partition("=")
+        index += 1
+        if name not in ("--listen", "--port"):
+            rest.append(flag)
+            continue
+        if not has_value and index < len(flags) and not flags[index].startswith("-"):
+            value = flags[index]
+            index += 1
+        if name == "--listen":
+            host = value or "0.0.0.0"
+        elif value.isdigit():
+            port = int(value)
+        else:
+            raise ValueError(f"Invalid port in extra flags: {flag} {value}".strip())
+    return rest, host, port
+
+
+def is_port_open(host: str, port: int, timeout: float = 1.0) -> bool:
+    try:
+        with socket.create_connection((get_probe_host(host), port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def get_system_stats(host: str, port: int, timeout: float = 2.0) -> Optional[dict]:
+    """ComfyUI's system stats or None if no ComfyUI server answers."""
+    url = f"http://{get_probe_host(host)}:{port}/{READINESS_ENDPOINT}"
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            stats = json.loads(response.read())
+    except (urllib.error.URLError, OSError, ValueError):
+        return None
+    if not isinstance(stats, dict) or "system" not in stats:
+        return None
+    return stats
+
+
+async def wait_until_ready(
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    timeout: float = 300,
+    initial_delay: float = 0.25,
+    max_delay: float = 5.0,
+) -> Optional[dict]:
+    """Poll ComfyUI's `system_stats` endpoint until it answers.
+
+    The delay between attempts doubles up to `max_delay`.
+
+    Returns:
+        Optional[dict]: System stats of the ready server or None on timeout.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    delay = initial_delay
+    while True:
+        stats = await loop.run_in_executor(None, get_system_stats, host, port)
+        if stats:
+            return stats
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return None
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * 2, max_delay)
+
+
+def wait_until_ready_blocking(*args, **kwargs) -> Optional[dict]:
+    """Blocking variant of `wait_until_ready` for non async callers."""
+    return asyncio.run(wait_until_ready(*args, **kwargs))
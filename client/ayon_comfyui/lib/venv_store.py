@@ -0,0 +1,158 @@
+import os
+import sys
+import json
+import shutil
+import platform
+import threading
+from pathlib import Path
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+
+from ayon_core.lib import Logger
+
+from .launcher import LaunchEngine
+from .manifest import hash_data, hash_file
+from .models import place_file
+from .profiling import phase, record
+
+
+log = Logger.get_logger(__name__)
+
+TEMPLATE_INFO_FILENAME = "ayon_venv_template.json"
+# written into cloned venvs, names the template they were cloned from
+TEMPLATE_MARKER_FILENAME = "ayon_venv_template"
+CLONE_WORKERS = 8
+
+
+def get_template_key(venv_dir: Path) -> Optional[str]:
+    """Key of the template `venv_dir` was cloned from."""
+    marker = Path(venv_dir) / TEMPLATE_MARKER_FILENAME
+    try:
+        return marker.read_text().strip()
+    except OSError:
+        return None
+
+
+def _is_linkable(rel_path: Path) -> bool:
+    # installers only ever replace files in site-packages, everything else
+    # like pyvenv.cfg may be rewritten in place and must not be shared
+    return "site-packages" in rel_path.parts
+
+
+class VenvTemplateStore:
+    """Pre-built venvs with torch and the ComfyUI requirements.
+
+    One template is built per Python version, torch channel, torch index
+    and ComfyUI requirements. Project venvs are cloned from it by linking
+    the installed packages, so only plugin requirements are installed per
+    project. Templates are built in a temp directory and renamed into
+    place, concurrent builds of the same template just discard the loser.
+    """
+
+    def __init__(self, root: Path, link_mode: str = "hardlink", max_workers: int = CLONE_WORKERS):
+        self.root = Path(root)
+        # symlinks would let project installs write into the template
+        self.link_mode = "hardlink" if link_mode == "symlink" else link_mode
+        self.max_workers = max_workers
+
+    @staticmethod
+    def get_key(
+        python_version: str,
+        pypi_url: Optional[str],
+        prerelease: bool,
+        requirements_file: Path,
+    ) -> str:
+        return hash_data({
+            "platform": sys.platform,
+            "machine": platform.machine(),
+            "python": python_version,
+            "pypi_url": pypi_url,
+            "prerelease": prerelease,
+            "requirements": hash_file(requirements_file),
+        })
+
+    def template_dir(self, key: str) -> Path:
+        return self.root / key
+
+    def ensure(self, key: str, engine: LaunchEngine, requirements_file: Path) -> Optional[Path]:
+        """Get the template `key`, building it with `engine` if missing.
+
+        Returns:
+            Optional[Path]: The template venv, None if it couldn't be built.
+        """
+        template_dir = self.template_dir(key)
+        with phase("venv/template"):
+            if (template_dir / TEMPLATE_INFO_FILENAME).exists():
+                record(cache_hit=True)
+                return template_dir
+            record(cache_hit=False)
+
+            log.info(f"Building venv template {key[:12]}")
+            self.root.mkdir(parents=True, exist_ok=True)
+            build_dir = self.root / f".{key}.tmp-{os.getpid()}-{threading.get_ident()}"
+            builder = engine.with_venv(build_dir)
+            try:
+                builder.create_venv(relocatable=True)
+                succeeded = builder.install_torch()
+                succeeded = succeeded and builder.install_requirements(requirements_file)
+            except RuntimeError as e:
+                log.warning(f"Failed to build venv template: {e}")
+                succeeded = False
+            if not succeeded:
+                shutil.rmtree(build_dir, ignore_errors=True)
+                return None
+
+            (build_dir / TEMPLATE_INFO_FILENAME).write_text(json.dumps({
+                "key": key,
+                "python": engine.python_version,
+                "pypi_url": engine.pypi_url,
+                "prerelease": engine.prerelease,
+                "requirements": requirements_file.read_text(),
+            }, indent=2))
+            try:
+                os.rename(build_dir, template_dir)
+            except OSError:
+                if not (template_dir / TEMPLATE_INFO_FILENAME).exists():
+                    shutil.rmtree(build_dir, ignore_errors=True)
+                    raise
+                log.debug(f"Venv template {key[:12]} was built concurrently")
+                shutil.rmtree(build_dir, ignore_errors=True)
+        return template_dir
+
+    def clone(self, key: str, venv_dir: Path):
+        """Replace `venv_dir` with a clone of the template `key`."""
+        template_dir = self.template_dir(key)
+        venv_dir = Path(venv_dir)
+        clone_dir = venv_dir.with_name(f"{venv_dir.name}.tmp-{os.getpid()}")
+        shutil.rmtree(clone_dir, ignore_errors=True)
+
+        files = []
+        with phase("venv/clone"):
+            for dirpath, dirnames, filenames in os.walk(template_dir):
+                rel_dir = Path(dirpath).relative_to(template_dir)
+                (clone_dir / rel_dir).mkdir(parents=True, exist_ok=True)
+                for name in dirnames + filenames:
+                    src = Path(dirpath) / name
+                    if src.is_symlink():
+                        # e.g. bin/python pointing at the base interpreter
+                        os.symlink(os.readlink(src), clone_dir / rel_dir / name)
+                    elif name in filenames and name != TEMPLATE_INFO_FILENAME:
+                        files.append(rel_dir / name)
+                # symlinked directories were recreated above, don't descend
+                dirnames[:] = [
+                    name for name in dirnames if not (Path(dirpath) / name).is_symlink()
+                ]
+
+            def _place(rel_path: Path):
+                link_mode = self.link_mode if _is_linkable(rel_path) else "copy"
+                return place_file(template_dir / rel_path, clone_dir / rel_path, link_mode)
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                modes = list(executor.map(_place, files))
+            (clone_dir / TEMPLATE_MARKER_FILENAME).write_text(key)
+
+            if venv_dir.exists():
+                shutil.rmtree(venv_dir)
+            os.replace(clone_dir, venv_dir)
+            record(files=len(files), linked=sum(mode != "copy" for mode in modes))
+        log.info(f"Cloned venv template {key[:12]} into {venv_dir}")
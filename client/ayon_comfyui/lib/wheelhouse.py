@@ -0,0 +1,248 @@
+import sys
+import json
+import platform
+from pathlib import Path
+
+from ayon_core.lib import Logger
+
+from .dependencies import TORCH_PACKAGES, compile_requirements
+from .downloads import DownloadManager, get_download_filename
+from .manifest import write_atomic
+from .profiling import record
+
+
+log = Logger.get_logger(__name__)
+
+WHEELHOUSE_INDEX_FILENAME = "index.json"
+WINDOWS_PLATFORM_TAGS = {"amd64": "win_amd64", "arm64": "win_arm64", "x86": "win32"}
+# lockfile sources of packages that are installed from where they live
+SOURCE_ONLY_KEYS = ("vcs", "directory", "archive")
+
+
+def _load_toml(content: str) -> dict:
+    try:
+        import tomllib
+    except ImportError:  # Python < 3.11
+        try:
+            import tomli as tomllib
+        except ImportError:
+            raise RuntimeError("Building a wheelhouse needs Python 3.11+ or `tomli`")
+    return tomllib.loads(content)
+
+
+def _platform_matches(tag: str, system: str, machine: str) -> bool:
+    if tag == "any":
+        return True
+    if system == "win32":
+        return tag == WINDOWS_PLATFORM_TAGS.get(machine)
+    if system == "darwin":
+        return tag.startswith("macosx_") and tag.endswith((machine, "universal2"))
+    return tag.startswith(("manylinux", "linux_")) and tag.endswith(f"_{machine}")
+
+
+def is_compatible_wheel(
+    filename: str,
+    python_version: str,
+    system: str = sys.platform,
+    machine: str = platform.machine(),
+) -> bool:
+    """Whether wheel `filename` installs on CPython `python_version` here.
+
+    Only CPython and the common manylinux, macOS and Windows platform tags
+    are considered, which covers everything ComfyUI depends on.
+    """
+    if not filename.endswith(".whl"):
+        return False
+    parts = filename[:-len(".whl")].split("-")
+    if len(parts) < 5:
+        return False
+    pythons, abis, platforms = (set(part.split(".")) for part in parts[-3:])
+
+    major, minor = (python_version.split(".") + ["0"])[:2]
+    cpython = f"cp{major}{minor}"
+    python_ok = bool(pythons & {cpython, f"py{major}{minor}", f"py{major}"})
+    if not python_ok and "abi3" in abis:
+        # stable ABI wheels work on every later CPython
+        python_ok = any(
+            tag.startswith(f"cp{major}") and int(tag[len(f"cp{major}"):] or 0) <= int(minor)
+            for tag in pythons
+        )
+    if not python_ok or not abis & {"none", "abi3", cpython}:
+        return False
+    machine = machine.lower()
+    return any(_platform_matches(tag, system, machine) for tag in platforms)
+
+
+def resolve_distributions(
+    uv: str,
+    merged_file: Path,
+    python_version: str = "",
+    strict: bool = False,
+    **compile_kwargs,
+) -> tuple[list[dict], list[str]]:
+    """Resolve torch and `merged_file` into the distributions to download.
+
+    The closure is resolved as PEP 751 lockfile, which lists the url and
+    hash of every file of the pinned versions. Of those only wheels
+    compatible with this machine are kept, sdists only for packages
+    without one.
+
+    Packages required from a git repository, a directory or a direct url
+    have no files in the lockfile. They can't be served by the wheelhouse
+    and are left to the online install, unless `strict` is set.
+
+    Returns:
+        tuple[list[dict], list[str]]: Entries with `url`, `filename`,
+            `sha256` and `size`, and the names of source only packages.
+
+    Raises:
+        RuntimeError: If the requirements couldn't be resolved, or with
+            `strict` if a package can only be installed from its source.
+    """
+    input_file = merged_file.parent / ".requirements.wheelhouse.in"
+    input_file.write_text(
+        "\n".join(TORCH_PACKAGES + [f"-r {merged_file.name}"]) + "\n"
+    )
+    try:
+        result = compile_requirements(
+            uv,
+            input_file,
+            python_version=python_version,
+            extra_args=["--format", "pylock.toml"],
+            **compile_kwargs,
+        )
+    finally:
+        input_file.unlink(missing_ok=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Failed to resolve wheelhouse:\n{result.stderr.strip()}")
+
+    distributions = []
+    source_only = []
+    for package in _load_toml(result.stdout).get("packages", []):
+        files = [
+            wheel for wheel in package.get("wheels", [])
+            if is_compatible_wheel(
+                wheel.get("name") or get_download_filename(wheel["url"]), python_version
+            )
+        ]
+        if not files and package.get("sdist"):
+            log.warning(
+                f"No compatible wheel for {package['name']}, building it offline "
+                "needs its build dependencies in the wheelhouse"
+            )
+            files = [package["sdist"]]
+        if not files and any(key in package for key in SOURCE_ONLY_KEYS):
+            source_only.append(package["name"])
+            continue
+        if not files:
+            raise RuntimeError(f"No downloadable distribution for {package['name']}")
+        for file in files:
+            distributions.append({
+                "url": file["url"],
+                "filename": file.get("name") or get_download_filename(file["url"]),
+                "sha256": file.get("hashes", {}).get("sha256", ""),
+                "size": file.get("size", 0),
+            })
+
+    if source_only:
+        message = (
+            "Packages only installable from their source, "
+            f"they can't be installed offline: {', '.join(sorted(source_only))}"
+        )
+        if strict:
+            raise RuntimeError(message)
+        log.warning(message)
+    return distributions, source_only
+
+
+class Wheelhouse:
+    """Shared directory of distributions for offline installs.
+
+    Every distribution is stored once by filename next to `index.json`,
+    which records its sha256 and size. `uv` installs from the directory as
+    flat index with every remote index disabled, so launches never touch
+    the network and run at local disk speed.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.index_path = self.root / WHEELHOUSE_INDEX_FILENAME
+        self.entries = self._read_index()
+
+    def _read_index(self) -> dict[str, dict]:
+        try:
+            return json.loads(self.index_path.read_text()).get("files", {})
+        except (OSError, ValueError):
+            return {}
+
+    def has(self, filename: str, sha256: str = "") -> bool:
+        entry = self.entries.get(filename)
+        if not entry or not (self.root / filename).is_file():
+            return False
+        return not sha256 or entry["sha256"] == sha256
+
+    def build(
+        self,
+        distributions: list[dict],
+        max_workers: int = 8,
+        max_connections_per_host: int = 4,
+        progress_callback=None,
+    ) -> dict[str, str]:
+        """Download every distribution missing from the wheelhouse.
+
+        Returns:
+            dict[str, str]: Download errors keyed by url.
+        """
+        missing = [
+            dist for dist in distributions
+            if not self.has(dist["filename"], dist["sha256"])
+        ]
+        record(cache_hit=not missing)
+        if not missing:
+            log.info(f"Wheelhouse has all {len(distributions)} distributions")
+            return {}
+
+        log.info(f"Downloading {len(missing)} distributions into {self.root}")
+        manager = DownloadManager(
+            max_workers=max_workers,
+            max_connections_per_host=max_connections_per_host,
+        )
+        for dist in missing:
+            # files without a matching index entry are unverified
+            (self.root / dist["filename"]).unlink(missing_ok=True)
+        errors = manager.download_all(
+            [{**dist, "dest": self.root / dist["filename"]} for dist in missing],
+            progress_callback,
+            label="wheels",
+        )
+        record(bytes_transferred=manager.bytes_received)
+
+        for dist in missing:
+            if dist["url"] not in errors:
+                self.entries[dist["filename"]] = {
+                    "sha256": dist["sha256"],
+                    "size": (self.root / dist["filename"]).stat().st_size,
+                }
+        self.save()
+        return errors
+
+    def save(self):
+        # merge with entries other workstations added meanwhile
+        entries = {**self._read_index(), **self.entries}
+        self.root.mkdir(parents=True, exist_ok=True)
+        write_atomic(self.index_path, json.dumps({"files": entries}, indent=2, sort_keys=True))
+        self.entries = entries
+
+    def get_uv_env(self) -> dict:
+        """Environment making `uv` resolve and install from the wheelhouse only."""
+        return {
+            "UV_NO_INDEX": "1",
+            "UV_FIND_LINKS": self.root.as_posix(),
+            "UV_OFFLINE": "1",
+        }
+
+
+def format_wheelhouse_errors(errors: dict[str, str]) -> str:
+    return f"Failed to download {len(errors)} distribution(s):\n" + "\n".join(
+        f"  - {error}" for error in errors.values()
+    )
@@ -33,8 +33,12 @@ import logging
 import collections
 import zipfile
 import hashlib
+import struct
 import subprocess
+import threading
+import zlib
 
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -52,6 +56,28 @@ CLIENT_VERSION_CONTENT = '''# -*- coding: utf-8 -*-
 __version__ = "{1}"
 '''
 
+# Zip entries get fixed metadata so identical sources give identical zips
+ZIP_TIMESTAMP = (1980, 1, 1, 0, 0, 0)
+ZIP_FILE_MODE = 0o644 << 16
+ZIP_CREATE_SYSTEM = 3
+COMPRESS_LEVEL = zlib.Z_DEFAULT_COMPRESSION
+# Zip format records, see the PKWARE APPNOTE
+LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+LOCAL_HEADER_SIGNATURE = 0x04034B50
+CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+CENTRAL_HEADER_SIGNATURE = 0x02014B50
+END_RECORD = struct.Struct("<IHHHHIIH")
+END_RECORD_SIGNATURE = 0x06054B50
+# version 2.0 introduced deflate
+ZIP_VERSION = 20
+ZIP_UTF8_FLAG = 0x800
+ZIP_MAX_SIZE = 0xFFFFFFFF
+ZIP_MAX_ENTRIES = 0xFFFF
+# CRC32 and size of a cached deflate stream
+CACHE_HEADER = struct.Struct("<II")
+# Deflated files keyed by their path, size and mtime, reused across runs
+DEFAULT_CACHE_DIR = os.path.join(CURRENT_DIR, ".package_cache")
+
 # Patterns of directories to be skipped for server part of addon
 IGNORE_DIR_PATTERNS = [
     re.compile(pattern)
@@ -107,6 +133,170 @@ class ZipFileLongPaths(zipfile.ZipFile):
         return super(ZipFileLongPaths, self)._extract_member(member, tpath, pwd)
 
 
+class DeflateCache:
+    """Raw deflate streams of files keyed by their path, size and mtime.
+
+    Args:
+        cache_dir (Optional[str]): Directory of the cache. Nothing is cached
+            if not set.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self.used = set()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def compress(self, src_path):
+        """Get the raw deflate stream of the file `src_path`.
+
+        Args:
+            src_path (str): Path of the file.
+
+        Returns:
+            tuple[bytes, int, int]: Deflated data, CRC32 and size of the
+                file content, from the cache if the file didn't change.
+        """
+        file_stat = os.stat(src_path)
+        key = hashlib.sha256(
+            f"{os.path.abspath(src_path)}\0{file_stat.st_size}"
+            f"\0{file_stat.st_mtime_ns}\0{COMPRESS_LEVEL}".encode()
+        ).hexdigest()
+        if self.cache_dir:
+            path = self._path(key)
+            with self._lock:
+                self.used.add(key)
+            if os.path.exists(path):
+                with open(path, "rb") as stream:
+                    cached = stream.read()
+                crc, file_size = CACHE_HEADER.unpack_from(cached)
+                with self._lock:
+                    self.hits += 1
+                return cached[CACHE_HEADER.size:], crc, file_size
+
+        with open(src_path, "rb") as stream:
+            content = stream.read()
+        compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+        data = compressor.compress(content) + compressor.flush()
+        crc = zlib.crc32(content)
+        with self._lock:
+            self.misses += 1
+        if self.cache_dir:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as stream:
+                stream.write(CACHE_HEADER.pack(crc, len(content)) + data)
+            os.replace(tmp_path, path)
+        return data, crc, len(content)
+
+    def prune(self):
+        """Remove cached streams not used since this cache was created."""
+        if not self.cache_dir or not os.path.isdir(self.cache_dir):
+            return
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_dir():
+                continue
+            for item in os.scandir(entry.path):
+                if item.name not in self.used:
+                    os.remove(item.path)
+
+
+def _dos_date_time(date_time):
+    year, month, day, hour, minute, second = date_time
+    return (
+        (year - 1980) << 9 | month << 5 | day,
+        hour << 11 | minute << 5 | second // 2,
+    )
+
+
+def build_zip(entries):
+    """Build a zip file from already deflated entries.
+
+    The archive is assembled following the ZIP format specification, which
+    `zipfile` only allows for content it compresses itself. Every entry gets
+    the same fixed metadata. Archives beyond the ZIP64 limits aren't
+    supported, which addon packages never come close to.
+
+    Args:
+        entries (list[tuple[str, bytes, int, int]]): Path in the zip, raw
+            deflate stream, CRC32 and size of the content per entry.
+
+    Returns:
+        bytes: Content of the zip file.
+    """
+    dos_date, dos_time = _dos_date_time(ZIP_TIMESTAMP)
+    local_parts = []
+    central_parts = []
+    offset = 0
+    for arcname, data, crc, file_size in entries:
+        if max(offset, len(data), file_size) > ZIP_MAX_SIZE:
+            raise ValueError(f"Zip file too large at {arcname}")
+        name = arcname.encode("utf-8")
+        flags = 0 if name.isascii() else ZIP_UTF8_FLAG
+        local_parts.append(LOCAL_HEADER.pack(
+            LOCAL_HEADER_SIGNATURE, ZIP_VERSION, flags, zipfile.ZIP_DEFLATED,
+            dos_time, dos_date, crc, len(data), file_size, len(name), 0,
+        ))
+        local_parts.extend((name, data))
+        central_parts.append(CENTRAL_HEADER.pack(
+            CENTRAL_HEADER_SIGNATURE, ZIP_CREATE_SYSTEM << 8 | ZIP_VERSION,
+            ZIP_VERSION, flags, zipfile.ZIP_DEFLATED, dos_time, dos_date,
+            crc, len(data), file_size, len(name), 0, 0, 0, 0,
+            ZIP_FILE_MODE, offset,
+        ))
+        central_parts.append(name)
+        offset += LOCAL_HEADER.size + len(name) + len(data)
+
+    central_dir = b"".join(central_parts)
+    if len(entries) > ZIP_MAX_ENTRIES:
+        raise ValueError(f"Too many zip entries: {len(entries)}")
+    end_record = END_RECORD.pack(
+        END_RECORD_SIGNATURE, 0, 0, len(entries), len(entries),
+        len(central_dir), offset, 0,
+    )
+    return b"".join(local_parts) + central_dir + end_record
+
+
+def write_reproducible_zip(zip_filepath, files, cache, max_workers=None):
+    """Write `files` into a zip with fixed ordering and metadata.
+
+    Files are compressed in parallel, unchanged files are taken from
+    `cache`. The zip file is only rewritten if its content changed, so it
+    keeps its mtime for the cache of the server package.
+
+    Args:
+        zip_filepath (str): Output zip file path.
+        files (list[tuple[str, str]]): Source path and path in the zip.
+        cache (DeflateCache): Cache of compressed files.
+        max_workers (Optional[int]): Compression threads, defaults to the
+            number of CPUs.
+    """
+    files = sorted(
+        ((src_path, sub_path.replace(os.path.sep, "/")) for src_path, sub_path in files),
+        key=lambda item: item[1],
+    )
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        compressed = executor.map(cache.compress, [src_path for src_path, _ in files])
+        entries = [
+            (sub_path, *result) for (_, sub_path), result in zip(files, compressed)
+        ]
+    content = build_zip(entries)
+
+    if os.path.exists(zip_filepath):
+        with open(zip_filepath, "rb") as stream:
+            if stream.read() == content:
+                return
+    tmp_path = f"{zip_filepath}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as stream:
+        stream.write(content)
+    os.replace(tmp_path, zip_filepath)
+
+
 def safe_copy_file(src_path, dst_path):
     """Copy file and make sure destination directory exists.
 
@@ -150,19 +340,19 @@ def find_files_in_subdir(src_path, ignore_file_patterns=None, ignore_dir_pattern
     while hierarchy_queue:
         item = hierarchy_queue.popleft()
         dirpath, parents = item
-        for name in os.listdir(dirpath):
-            path = os.path.join(dirpath, name)
-            if os.path.isfile(path):
-                if not _value_match_regexes(name, ignore_file_patterns):
+        with os.scandir(dirpath) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                if entry.is_file():
+                    if not _value_match_regexes(entry.name, ignore_file_patterns):
+                        items = list(parents)
+                        items.append(entry.name)
+                        output.append((entry.path, os.path.sep.join(items)))
+                    continue
+
+                if not _value_match_regexes(entry.name, ignore_dir_patterns):
                     items = list(parents)
-                    items.append(name)
-                    output.append((path, os.path.sep.join(items)))
-                continue
-
-            if not _value_match_regexes(name, ignore_dir_patterns):
-                items = list(parents)
-                items.append(name)
-                hierarchy_queue.append((path, items))
+                    items.append(entry.name)
+                    hierarchy_queue.append((entry.path, items))
 
     return output
 
@@ -202,11 +392,26 @@ def copy_server_content(addon_output_dir, current_dir, log):
         dst_path = os.path.join(addon_output_dir, "server", dst_subpath)
         filepaths_to_copy.append((src_path, dst_path))
 
-    # Copy files
+    # Copy files, skipping the ones unchanged since the last run
     for src_path, dst_path in filepaths_to_copy:
+        if _is_up_to_date(src_path, dst_path):
+            continue
         safe_copy_file(src_path, dst_path)
 
 
+def _is_up_to_date(src_path, dst_path):
+    """Whether `dst_path` is an unchanged copy made by `shutil.copy2`."""
+    try:
+        src_stat = os.stat(src_path)
+        dst_stat = os.stat(dst_path)
+    except OSError:
+        return False
+    return (
+        src_stat.st_size == dst_stat.st_size
+        and src_stat.st_mtime_ns == dst_stat.st_mtime_ns
+    )
+
+
 def _update_client_version(client_addon_dir):
     """Write version.py file to 'client' directory.
 
@@ -217,17 +422,24 @@ def _update_client_version(client_addon_dir):
     """
 
     dst_version_path = os.path.join(client_addon_dir, "version.py")
+    content = CLIENT_VERSION_CONTENT.format(ADDON_TITLE, ADDON_VERSION)
+    if os.path.exists(dst_version_path):
+        with open(dst_version_path, "r") as stream:
+            if stream.read() == content:
+                return
     with open(dst_version_path, "w") as stream:
-        stream.write(CLIENT_VERSION_CONTENT.format(ADDON_TITLE, ADDON_VERSION))
+        stream.write(content)
 
 
-def zip_client_side(addon_package_dir, current_dir, log):
+def zip_client_side(addon_package_dir, current_dir, log, cache, max_workers=None):
     """Copy and zip `client` content into 'addon_package_dir'.
 
     Args:
         addon_package_dir (str): Output package directory path.
         current_dir (str): Directory path of addon source.
         log (logging.Logger): Logger object.
+        cache (DeflateCache): Cache of compressed files.
+        max_workers (Optional[int]): Compression threads.
     """
 
     client_dir = os.path.join(current_dir, "client")
@@ -244,16 +456,22 @@ def zip_client_side(addon_package_dir, current_dir, log):
     _update_client_version(client_addon_dir)
 
     zip_filepath = os.path.join(os.path.join(private_dir, "client.zip"))
-    with ZipFileLongPaths(zip_filepath, "w", zipfile.ZIP_DEFLATED) as zipf:
-        # Add client code content to zip
-        for path, sub_path in find_files_in_subdir(client_addon_dir):
-            sub_path = os.path.join(ADDON_CLIENT_DIR, sub_path)
-            zipf.write(path, sub_path)
+    files = [
+        (path, os.path.join(ADDON_CLIENT_DIR, sub_path))
+        for path, sub_path in find_files_in_subdir(client_addon_dir)
+    ]
+    write_reproducible_zip(zip_filepath, files, cache, max_workers)
 
     shutil.copy(os.path.join(client_dir, "pyproject.toml"), private_dir)
 
 
-def create_server_package(output_dir: str, addon_output_dir: str, log: logging.Logger):
+def create_server_package(
+    output_dir: str,
+    addon_output_dir: str,
+    log: logging.Logger,
+    cache: "DeflateCache",
+    max_workers: Optional[int] = None,
+):
     """Create server package zip file.
 
     The zip file can be installed to a server using UI or rest api endpoints.
@@ -262,26 +480,17 @@ def create_server_package(output_dir: str, addon_output_dir: str, log: logging.L
         output_dir (str): Directory path to output zip file.
         addon_output_dir (str): Directory path to addon output directory.
         log (logging.Logger): Logger object.
+        cache (DeflateCache): Cache of compressed files.
+        max_workers (Optional[int]): Compression threads.
     """
 
     log.info("Creating server package")
     output_path = os.path.join(output_dir, f"{ADDON_NAME}-{ADDON_VERSION}.zip")
-    with ZipFileLongPaths(output_path, "w", zipfile.ZIP_DEFLATED) as zipf:
-        # Move addon content to zip into 'addon' directory
-        addon_output_dir_offset = len(addon_output_dir) + 1
-        for root, _, filenames in os.walk(addon_output_dir):
-            if not filenames:
-                continue
-
-            dst_root = None
-            if root != addon_output_dir:
-                dst_root = root[addon_output_dir_offset:]
-            for filename in filenames:
-                src_path = os.path.join(root, filename)
-                dst_path = filename
-                if dst_root:
-                    dst_path = os.path.join(dst_root, dst_path)
-                zipf.write(src_path, dst_path)
+    # Move addon content to zip into 'addon' directory
+    files = find_files_in_subdir(
+        addon_output_dir, ignore_file_patterns=[], ignore_dir_patterns=[]
+    )
+    write_reproducible_zip(output_path, files, cache, max_workers)
 
     log.info(f"Output package can be found: {output_path}")
 
@@ -291,6 +500,8 @@ def main(
     skip_zip: bool = False,
     keep_sources: bool = False,
     clear_output_dir: bool = False,
+    cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+    max_workers: Optional[int] = None,
 ):
     log = logging.getLogger("create_package")
     log.info("Start creating package")
@@ -317,16 +528,21 @@ def main(
     safe_copy_file(
         PACKAGE_PATH, os.path.join(addon_output_dir, os.path.basename(PACKAGE_PATH))
     )
-    zip_client_side(addon_output_dir, current_dir, log)
+    cache = DeflateCache(cache_dir)
+    zip_client_side(addon_output_dir, current_dir, log, cache, max_workers)
 
     # Skip server zipping
     if not skip_zip:
-        create_server_package(output_dir, addon_output_dir, log)
+        create_server_package(output_dir, addon_output_dir, log, cache, max_workers)
+        cache.prune()
         # Remove sources only if zip file is created
         if not keep_sources:
             log.info("Removing source files for server package")
             shutil.rmtree(addon_output_root)
-    log.info("Package creation finished")
+    log.info(
+        f"Package creation finished, compressed {cache.misses} files,"
+        f" reused {cache.hits} from cache"
+    )
 
 
 if __name__ == "__main__":
@@ -364,5 +580,34 @@ if __name__ == "__main__":
         ),
     )
 
+    parser.add_argument(
+        "--cache-dir",
+        dest="cache_dir",
+        default=DEFAULT_CACHE_DIR,
+        help=("Directory caching compressed files between runs."),
+    )
+    parser.add_argument(
+        "--no-cache",
+        dest="cache_dir",
+        action="store_const",
+        const=None,
+        help=("Compress all files without reading or writing the cache."),
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        dest="max_workers",
+        type=int,
+        default=None,
+        help=("Number of compression threads. Defaults to the number of CPUs."),
+    )
+
     args = parser.parse_args(sys.argv[1:])
-    main(args.output_dir, args.skip_zip, args.keep_sources, args.clear_output_dir)
+    main(
+        args.output_dir,
+        args.skip_zip,
+        args.keep_sources,
+        args.clear_output_dir,
+        args.cache_dir,
+        args.max_workers,
+    )
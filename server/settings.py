@@ -9,15 +9,98 @@ from ayon_server.settings import (
 class RepositorySettings(BaseSettingsModel):
     url: str = SettingsField(default="", description="Repository URL.", title="URL")
     tag: str = SettingsField(
-        default="", description="Repository tag. Leave empty for latest."
+        default="",
+        description="Repository tag or full commit SHA. Leave empty for latest.",
     )
     name: str = SettingsField(default="", description="Repository name.", title="Name")
+    depth: int = SettingsField(
+        default=0,
+        ge=0,
+        title="Clone Depth",
+        description="Shallow clone depth. 0 clones the full history.",
+    )
+    blob_filter: bool = SettingsField(
+        default=False,
+        title="Partial Clone",
+        description="Clone with `--filter=blob:none`. File contents are downloaded on demand.",
+    )
 
     def __init__(self, **data):
         super().__init__(**data)
         self.name = Path(self.url).stem
 
 
+def _link_mode_enum():
+    return [
+        {"value": "copy", "label": "Copy"},
+        {"value": "hardlink", "label": "Hardlink"},
+        {"value": "reflink", "label": "Reflink (Copy-on-Write)"},
+        {"value": "symlink", "label": "Symlink"},
+    ]
+
+
+def _venv_link_mode_enum():
+    # symlinked packages would let project installs modify the template
+    return [mode for mode in _link_mode_enum() if mode["value"] != "symlink"]
+
+
+def _torch_backend_enum():
+    return [
+        {"value": "cuda", "label": "NVIDIA CUDA"},
+        {"value": "rocm", "label": "AMD ROCm"},
+        {"value": "cpu", "label": "CPU"},
+        {"value": "default", "label": "Default Index (Apple Silicon)"},
+    ]
+
+
+class TorchIndexSettings(BaseSettingsModel):
+    backend: str = SettingsField(
+        default="cuda",
+        title="Backend",
+        enum_resolver=_torch_backend_enum,
+    )
+    version: str = SettingsField(
+        default="",
+        title="Version",
+        description="CUDA or ROCm version of the wheels. Used when the driver supports this version or newer.",
+    )
+    stable_url: str = SettingsField(default="", title="Stable Index URL")
+    nightly_url: str = SettingsField(
+        default="",
+        title="Nightly Index URL",
+        description="Leave empty if there are no nightly wheels.",
+    )
+
+
+class VenvTemplateStoreSettings(BaseSettingsModel):
+    enabled: bool = SettingsField(
+        default=False,
+        title="Use Venv Templates",
+        description=(
+            "Build a venv with torch and the ComfyUI requirements once per Python "
+            "version, torch index and ComfyUI version and clone it into projects. "
+            "Only plugin requirements are installed per project."
+        ),
+    )
+    dir_template: str = SettingsField(
+        default="",
+        title="Template Directory Template",
+        description=(
+            "Workstation wide directory of the venv templates. Should be on the "
+            "same filesystem as the projects for links to work."
+        ),
+    )
+    link_mode: str = SettingsField(
+        default="hardlink",
+        enum_resolver=_venv_link_mode_enum,
+        title="Link Mode",
+        description=(
+            "How installed packages are placed in project venvs. Hardlinks and "
+            "reflinks fall back to copying across filesystems."
+        ),
+    )
+
+
 class VirtualEnvSettings(BaseSettingsModel):
     uv_path: str = SettingsField(
         default="",
@@ -34,6 +117,27 @@ class VirtualEnvSettings(BaseSettingsModel):
         title="Use PyTorch Nightly",
         description="Use the nightly version of PyTorch.",
     )
+    lock_dependencies: bool = SettingsField(
+        default=False,
+        title="Lock Dependencies",
+        description=(
+            "Resolve all dependencies into a lockfile next to the ComfyUI checkout "
+            "and sync the venv exactly to it. Only resolves again when requirements change."
+        ),
+    )
+    torch_indices: list[TorchIndexSettings] = SettingsField(
+        default_factory=list,
+        title="PyTorch Indices",
+        description=(
+            "Torch wheel index per backend. The index is picked by the detected GPU "
+            "and driver. A GPU without a matching index uses the default index. "
+            "Machines without a GPU, or `--cpu` in the extra flags, use the CPU index."
+        ),
+    )
+    template_store: VenvTemplateStoreSettings = SettingsField(
+        default_factory=VenvTemplateStoreSettings,
+        title="Venv Templates",
+    )
 
 
 class CustomNodeSettings(RepositorySettings):
@@ -44,18 +148,216 @@ class CustomNodeSettings(RepositorySettings):
     )
 
 
+class ComfyUIModelStoreSettings(BaseSettingsModel):
+    enabled: bool = SettingsField(
+        default=False,
+        title="Use Model Store",
+        description=(
+            "Store copied models once in a content addressed store and link them "
+            "into projects. Identical files across projects share one copy."
+        ),
+    )
+    dir_template: str = SettingsField(
+        default="",
+        title="Store Directory Template",
+        description="Workstation wide directory of the model store.",
+    )
+
+
+class ModelSourceSettings(BaseSettingsModel):
+    dir_template: str = SettingsField(
+        default="",
+        title="Source Directory",
+        description="Where to load extra models from. Can also contain template keys",
+    )
+    priority: int = SettingsField(
+        default=0,
+        title="Priority",
+        description="Sources with higher priority win for models with the same path.",
+    )
+
+
+class ModelCacheSettings(BaseSettingsModel):
+    enabled: bool = SettingsField(
+        default=False,
+        title="Use Local Cache",
+        description=(
+            "Cache referenced models on a local disk. Missing models are copied "
+            "in the background and loaded from the sources until then."
+        ),
+    )
+    dir_template: str = SettingsField(
+        default="",
+        title="Cache Directory Template",
+        description="Workstation local directory, ideally on an SSD.",
+    )
+    size_budget_gb: float = SettingsField(
+        default=200.0,
+        gt=0,
+        title="Size Budget (GB)",
+        description="Least recently used models are evicted above this size.",
+    )
+
+
+class ModelVerificationSettings(BaseSettingsModel):
+    enabled: bool = SettingsField(
+        default=False,
+        title="Verify Models",
+        description=(
+            "Check safetensors headers against the file size before launch. "
+            "Results are cached until a file changes."
+        ),
+    )
+    checksum_manifest: str = SettingsField(
+        default="",
+        title="Checksum Manifest",
+        description=(
+            "Optional file name in each source directory with sha256 checksums "
+            "(sha256sum output or json). Listed files get fully hashed."
+        ),
+    )
+    max_workers: int = SettingsField(
+        default=4,
+        ge=1,
+        title="Parallel Checks",
+    )
+    fail_on_error: bool = SettingsField(
+        default=True,
+        title="Abort Launch on Corrupt Files",
+        description="Otherwise corrupt files are only logged.",
+    )
+
+
+class ModelDownloadEntry(BaseSettingsModel):
+    url: str = SettingsField(default="", title="URL")
+    model_type: str = SettingsField(
+        default="checkpoints",
+        title="Model Type",
+        description="ComfyUI model folder to download into, e.g. checkpoints or loras.",
+    )
+    filename: str = SettingsField(
+        default="",
+        title="File Name",
+        description="Leave empty to use the file name of the URL.",
+    )
+    sha256: str = SettingsField(
+        default="",
+        title="SHA256",
+        description="Expected checksum, verified while downloading.",
+    )
+    size: int = SettingsField(
+        default=0,
+        ge=0,
+        title="Size (Bytes)",
+        description="Expected size. 0 if unknown.",
+    )
+
+
+class ModelDownloadSettings(BaseSettingsModel):
+    enabled: bool = SettingsField(default=False, title="Download Models")
+    dir_template: str = SettingsField(
+        default="",
+        title="Download Directory Template",
+        description=(
+            "Where downloaded models are stored. Leave empty to use the extra "
+            "models source directory, otherwise it's used as an additional source."
+        ),
+    )
+    priority: int = SettingsField(
+        default=0,
+        title="Priority",
+        description="Source priority of the download directory.",
+    )
+    max_workers: int = SettingsField(default=4, ge=1, title="Parallel Downloads")
+    max_connections_per_host: int = SettingsField(
+        default=2, ge=1, title="Connections per Host"
+    )
+    models: list[ModelDownloadEntry] = SettingsField(
+        default_factory=list,
+        title="Models",
+    )
+
+
 class ComfyUIExtraModelSettings(BaseSettingsModel):
     enabled: bool = SettingsField(default=False)
     dir_template: str = SettingsField(
-        default_factory=list,
+        default="",
         title="Source Directory",
         description="Where to load extra models from. Can also contain template keys",
     )
+    sources: list[ModelSourceSettings] = SettingsField(
+        default_factory=list,
+        title="Additional Sources",
+        description="More model sources. The source directory above has priority 0.",
+    )
+    local_cache: ModelCacheSettings = SettingsField(
+        default_factory=ModelCacheSettings,
+        title="Local Cache",
+    )
+    verify: ModelVerificationSettings = SettingsField(
+        default_factory=ModelVerificationSettings,
+        title="Verification",
+    )
+    downloads: ModelDownloadSettings = SettingsField(
+        default_factory=ModelDownloadSettings,
+        title="Downloads",
+    )
     copy_to_base: bool = SettingsField(
         default=False,
         title="Copy to Base",
         description="Copy all found extra models to their respective ComfyUI base directory.",
     )
+    link_mode: str = SettingsField(
+        default="copy",
+        enum_resolver=_link_mode_enum,
+        title="Link Mode",
+        description=(
+            "How models are placed when copying to base. Hardlinks and reflinks "
+            "fall back to copying across filesystems."
+        ),
+    )
+    sync_deletions: bool = SettingsField(
+        default=False,
+        title="Sync Deletions",
+        description="Delete copied models that were removed from the source directory.",
+    )
+    max_parallel_copies: int = SettingsField(
+        default=4,
+        ge=1,
+        title="Parallel Copies",
+        description="How many model files are copied at the same time.",
+    )
+    watch_changes: bool = SettingsField(
+        default=False,
+        title="Watch Model Directories",
+        description=(
+            "Keep the model index up to date while the launcher runs (Linux only). "
+            "Changes on network shares made by other hosts are not reported."
+        ),
+    )
+    store: ComfyUIModelStoreSettings = SettingsField(
+        default_factory=ComfyUIModelStoreSettings,
+        title="Model Store",
+    )
+
+
+class RepositoryMirrorSettings(BaseSettingsModel):
+    enabled: bool = SettingsField(
+        default=False,
+        title="Use Mirror Cache",
+        description="Clone ComfyUI and plugins through shared local bare mirrors. Overrides clone depth and partial clone settings.",
+    )
+    dir_template: str = SettingsField(
+        default="",
+        title="Mirror Directory Template",
+        description="Workstation or site wide directory holding the bare mirrors.",
+    )
+    ttl_minutes: int = SettingsField(
+        default=60,
+        ge=0,
+        title="Refresh Interval (Minutes)",
+        description="Minimum time between fetches of each mirror from its remote.",
+    )
 
 
 class ComfyUIRepositorySettings(BaseSettingsModel):
@@ -69,10 +371,60 @@ class ComfyUIRepositorySettings(BaseSettingsModel):
         title="Repository URL",
         description="Where to clone the ComfyUI repository from.",
     )
+    base_depth: int = SettingsField(
+        default=0,
+        ge=0,
+        title="Clone Depth",
+        description="Shallow clone depth of the ComfyUI repository. 0 clones the full history.",
+    )
+    base_blob_filter: bool = SettingsField(
+        default=False,
+        title="Partial Clone",
+        description="Clone ComfyUI with `--filter=blob:none`. File contents are downloaded on demand.",
+    )
     plugins: list[CustomNodeSettings] = SettingsField(
         default_factory=list[CustomNodeSettings],
         description="Repository Settings for Extra Nodes.",
     )
+    max_parallel_clones: int = SettingsField(
+        default=4,
+        ge=1,
+        title="Parallel Plugin Clones",
+        description="How many plugins are cloned or updated at the same time. Set to 1 to disable.",
+    )
+    mirror: RepositoryMirrorSettings = SettingsField(
+        default_factory=RepositoryMirrorSettings,
+        title="Mirror Cache",
+    )
+
+
+class ComfyUIWheelhouseSettings(BaseSettingsModel):
+    enabled: bool = SettingsField(
+        default=False,
+        title="Use Wheelhouse",
+        description=(
+            "Download every wheel of ComfyUI, the plugins and torch once into a "
+            "shared directory and install only from there."
+        ),
+    )
+    dir_template: str = SettingsField(
+        default="",
+        title="Wheelhouse Directory Template",
+        description="Shared directory of the wheels and their hash index.",
+    )
+    offline: bool = SettingsField(
+        default=False,
+        title="Offline",
+        description=(
+            "Never access package indexes or install uv, resolve and install from "
+            "the wheelhouse only. Fill the wheelhouse on a connected workstation first."
+        ),
+    )
+    max_parallel_downloads: int = SettingsField(
+        default=8,
+        ge=1,
+        title="Max Parallel Downloads",
+    )
 
 
 class ComfyUICachingSettings(BaseSettingsModel):
@@ -84,15 +436,52 @@ class ComfyUICachingSettings(BaseSettingsModel):
         title="Cache Directory Template",
         description="Where to load dependencies from.",
     )
+    wheelhouse: ComfyUIWheelhouseSettings = SettingsField(
+        default_factory=ComfyUIWheelhouseSettings,
+        title="Wheelhouse",
+    )
 
 
 class AddonSettings(BaseSettingsModel):
     """ComfyUI addon settings."""
 
+    host: str = SettingsField(
+        default="127.0.0.1",
+        title="Host",
+        description="Address the ComfyUI server listens on (`--listen`).",
+    )
+    port: int = SettingsField(
+        default=8188,
+        ge=1,
+        le=65535,
+        title="Port",
+        description="Port of the ComfyUI server (`--port`).",
+    )
+    port_pool_size: int = SettingsField(
+        default=1,
+        ge=1,
+        le=100,
+        title="Port Pool Size",
+        description=(
+            "Number of consecutive ports starting at Port to allocate servers from. "
+            "Allows running several ComfyUI servers of different projects on one workstation."
+        ),
+    )
+    gpu_indices: list[int] = SettingsField(
+        default_factory=list,
+        title="GPU Indices",
+        description=(
+            "GPUs to distribute servers across via `CUDA_VISIBLE_DEVICES`. "
+            "Each server is pinned to the GPU running the fewest servers. Empty to not pin."
+        ),
+    )
     extra_flags: list[str] = SettingsField(
         default=[],
         title="Extra Flags",
-        description="Extra argument flags to pass when launching the ComfyUI server.",
+        description=(
+            "Extra argument flags to pass when launching the ComfyUI server. "
+            "`--listen` and `--port` override the host and port pool."
+        ),
     )
     venv: VirtualEnvSettings = SettingsField(
         default_factory=VirtualEnvSettings,
@@ -115,6 +504,58 @@ class AddonSettings(BaseSettingsModel):
 
 
 DEFAULT_VALUES = {
+    "venv": {
+        "torch_indices": [
+            {
+                "backend": "cuda",
+                "version": "11.8",
+                "stable_url": "https://download.pytorch.org/whl/cu118",
+                "nightly_url": "",
+            },
+            {
+                "backend": "cuda",
+                "version": "12.6",
+                "stable_url": "https://download.pytorch.org/whl/cu126",
+                "nightly_url": "https://download.pytorch.org/whl/nightly/cu126",
+            },
+            {
+                "backend": "cuda",
+                "version": "12.8",
+                "stable_url": "https://download.pytorch.org/whl/cu128",
+                "nightly_url": "https://download.pytorch.org/whl/nightly/cu128",
+            },
+            {
+                "backend": "cuda",
+                "version": "12.9",
+                "stable_url": "https://download.pytorch.org/whl/cu129",
+                "nightly_url": "https://download.pytorch.org/whl/nightly/cu129",
+            },
+            {
+                "backend": "rocm",
+                "version": "6.3",
+                "stable_url": "https://download.pytorch.org/whl/rocm6.3",
+                "nightly_url": "",
+            },
+            {
+                "backend": "rocm",
+                "version": "6.4",
+                "stable_url": "https://download.pytorch.org/whl/rocm6.4",
+                "nightly_url": "https://download.pytorch.org/whl/nightly/rocm6.4",
+            },
+            {
+                "backend": "cpu",
+                "version": "",
+                "stable_url": "https://download.pytorch.org/whl/cpu",
+                "nightly_url": "https://download.pytorch.org/whl/nightly/cpu",
+            },
+            {
+                "backend": "default",
+                "version": "",
+                "stable_url": "https://pypi.org/simple",
+                "nightly_url": "https://download.pytorch.org/whl/nightly/cpu",
+            },
+        ],
+    },
     "repositories": {
         "base_template": "{root[work]}/{project[name]}/comfyui",
         "base_url": "https://github.com/comfyanonymous/ComfyUI.git",
@@ -0,0 +1,29 @@
+"""Make the client importable without AYON, like the benchmarks do."""
+import os
+import sys
+import stat
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [(REPO_ROOT / "client").as_posix(), (REPO_ROOT / "benchmarks").as_posix()]
+
+import stubs  # noqa: E402
+
+stubs.install_stubs()
+
+
+@pytest.fixture
+def bin_dir(tmp_path, monkeypatch):
+    """Directory put in front of PATH for stub executables."""
+    path = tmp_path / "bin"
+    path.mkdir()
+    monkeypatch.setenv("PATH", os.pathsep.join([path.as_posix(), os.environ.get("PATH", "")]))
+    return path
+
+
+def write_executable(path: Path, content: str) -> Path:
+    path.write_text(content)
+    path.chmod(path.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
@@ -0,0 +1,190 @@
+import os
+import time
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ayon_comfyui.lib.downloads import (
+    DOWNLOAD_CHUNK_SIZE,
+    DownloadError,
+    DownloadManager,
+    get_lock_path,
+    get_partial_path,
+)
+
+CONTENT = os.urandom(3 * DOWNLOAD_CHUNK_SIZE + 123)
+SHA256 = hashlib.sha256(CONTENT).hexdigest()
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Serves `server.content` with range support.
+
+    `server.truncate_at` closes the next response after that many bytes,
+    `server.delay` is slept between chunks.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.headers.get("Range"))
+        content = server.content
+        start = 0
+        range_header = self.headers.get("Range")
+        if range_header:
+            start = int(range_header.split("=")[1].rstrip("-"))
+            if start >= len(content):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(content)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(content) - 1}/{len(content)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(content) - start))
+        self.end_headers()
+
+        body = content[start:]
+        if server.truncate_at is not None:
+            body = body[:server.truncate_at]
+            server.truncate_at = None
+            self.close_connection = True
+        for offset in range(0, len(body), DOWNLOAD_CHUNK_SIZE):
+            self.wfile.write(body[offset:offset + DOWNLOAD_CHUNK_SIZE])
+            if server.delay:
+                time.sleep(server.delay)
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.content = CONTENT
+    httpd.requests = []
+    httpd.truncate_at = None
+    httpd.delay = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}/model.safetensors"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_download_with_checksum(server, tmp_path):
+    dest = tmp_path / "models" / "model.safetensors"
+    manager = DownloadManager()
+    assert manager.download(server.url, dest, sha256=SHA256, size=len(CONTENT))
+    assert dest.read_bytes() == CONTENT
+    assert manager.bytes_received == len(CONTENT)
+    assert not get_partial_path(dest).exists()
+    assert not get_lock_path(dest).exists()
+
+    # already there
+    assert not manager.download(server.url, dest, sha256=SHA256, size=len(CONTENT))
+    assert len(server.requests) == 1
+
+
+def test_checksum_mismatch(server, tmp_path):
+    dest = tmp_path / "model.safetensors"
+    with pytest.raises(DownloadError, match="checksum"):
+        DownloadManager().download(server.url, dest, sha256="0" * 64)
+    assert not dest.exists()
+    assert not get_partial_path(dest).exists()
+    assert not get_lock_path(dest).exists()
+
+
+def test_resume_partial(server, tmp_path):
+    dest = tmp_path / "model.safetensors"
+    offset = DOWNLOAD_CHUNK_SIZE + 7
+    get_partial_path(dest).write_bytes(CONTENT[:offset])
+
+    manager = DownloadManager()
+    assert manager.download(server.url, dest, sha256=SHA256)
+    assert dest.read_bytes() == CONTENT
+    assert server.requests == [f"bytes={offset}-"]
+    assert manager.bytes_received == len(CONTENT) - offset
+
+
+def test_resume_after_connection_closed(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda _seconds: None)
+    truncate_at = DOWNLOAD_CHUNK_SIZE + DOWNLOAD_CHUNK_SIZE // 2
+    server.truncate_at = truncate_at
+    dest = tmp_path / "model.safetensors"
+
+    assert DownloadManager().download(server.url, dest, sha256=SHA256)
+    assert dest.read_bytes() == CONTENT
+    assert server.requests == [None, f"bytes={truncate_at}-"]
+
+
+def test_announced_size_without_configured_size(server, tmp_path):
+    # partial longer than the file, e.g. the file was replaced upstream
+    dest = tmp_path / "model.safetensors"
+    get_partial_path(dest).write_bytes(CONTENT + b"stale")
+
+    with pytest.raises(DownloadError, match=f"expected {len(CONTENT)} bytes"):
+        DownloadManager(retries=1).download(server.url, dest)
+    assert not dest.exists()
+    assert not get_partial_path(dest).exists()
+
+
+def test_truncated_without_retries(server, tmp_path):
+    server.truncate_at = DOWNLOAD_CHUNK_SIZE
+    dest = tmp_path / "model.safetensors"
+
+    with pytest.raises(DownloadError):
+        DownloadManager(retries=1).download(server.url, dest)
+    assert not dest.exists()
+    # kept for the next launch to resume
+    assert get_partial_path(dest).stat().st_size == DOWNLOAD_CHUNK_SIZE
+
+
+def test_concurrent_downloads_of_same_file(server, tmp_path):
+    server.delay = 0.2
+    dest = tmp_path / "model.safetensors"
+    results = {}
+
+    def _download(name):
+        results[name] = DownloadManager().download(server.url, dest, sha256=SHA256)
+
+    threads = [threading.Thread(target=_download, args=(name,)) for name in "ab"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results.values()) == [False, True]
+    assert server.requests == [None]
+    assert dest.read_bytes() == CONTENT
+    assert not get_lock_path(dest).exists()
+
+
+def test_stale_lock_is_taken_over(server, tmp_path):
+    dest = tmp_path / "model.safetensors"
+    lock_path = get_lock_path(dest)
+    lock_path.touch()
+    stale = time.time() - 3600
+    os.utime(lock_path, (stale, stale))
+
+    assert DownloadManager().download(server.url, dest, sha256=SHA256)
+    assert dest.read_bytes() == CONTENT
+    assert not lock_path.exists()
+
+
+def test_download_all_reports_errors(server, tmp_path):
+    downloads = [
+        {"url": server.url, "dest": tmp_path / "ok.safetensors", "sha256": SHA256},
+        {"url": f"{server.url}?bad", "dest": tmp_path / "bad.safetensors", "sha256": "0" * 64},
+        {"url": "not a url", "dest": tmp_path / "invalid.safetensors"},
+    ]
+    messages = []
+    errors = DownloadManager().download_all(downloads, messages.append)
+
+    assert sorted(errors) == [f"{server.url}?bad", "not a url"]
+    assert "checksum" in errors[f"{server.url}?bad"]
+    assert (tmp_path / "ok.safetensors").read_bytes() == CONTENT
+    assert not (tmp_path / "bad.safetensors").exists()
@@ -0,0 +1,97 @@
+import sys
+
+import pytest
+
+from conftest import write_executable
+from ayon_comfyui.lib.hardware import HardwareProbe, select_torch_index
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32", reason="stub executables are shell scripts"
+)
+
+INDICES = [
+    {"backend": "cuda", "version": "11.8", "stable_url": "cu118", "nightly_url": ""},
+    {"backend": "cuda", "version": "12.4", "stable_url": "cu124", "nightly_url": "nightly/cu124"},
+    {"backend": "cuda", "version": "12.8", "stable_url": "cu128", "nightly_url": "nightly/cu128"},
+    {"backend": "rocm", "version": "6.2", "stable_url": "rocm6.2", "nightly_url": ""},
+    {"backend": "cpu", "version": "", "stable_url": "cpu", "nightly_url": "nightly/cpu"},
+    {"backend": "default", "version": "", "stable_url": "pypi", "nightly_url": ""},
+]
+
+
+def _fake_nvidia_smi(bin_dir, log_path, gpus=2, cuda_version="12.4", exit_code=0):
+    gpu_lines = "\n".join(["NVIDIA RTX A6000, 550.54, 49140"] * gpus)
+    return write_executable(bin_dir / "nvidia-smi", f"""#!/bin/sh
+echo "$@" >> "{log_path}"
+[ {exit_code} -eq 0 ] || exit {exit_code}
+case "$1" in
+    --query-gpu=*) printf '%s\\n' "{gpu_lines}" ;;
+    *) echo "| NVIDIA-SMI 550.54   Driver Version: 550.54   CUDA Version: {cuda_version} |" ;;
+esac
+""")
+
+
+@pytest.fixture
+def smi_log(tmp_path):
+    return tmp_path / "nvidia_smi_calls.log"
+
+
+@pytest.fixture
+def probe(tmp_path, bin_dir):
+    return lambda: HardwareProbe(cache_path=tmp_path / "hardware.json", rocm_smi="")
+
+
+def _probe_calls(smi_log) -> int:
+    return len(smi_log.read_text().splitlines()) if smi_log.exists() else 0
+
+
+def test_detect_nvidia(probe, bin_dir, smi_log):
+    _fake_nvidia_smi(bin_dir, smi_log)
+    info = probe().get_info()
+    assert info["vendor"] == "nvidia"
+    assert info["driver_version"] == "550.54"
+    assert info["cuda_version"] == "12.4"
+    assert info["gpus"] == [{"name": "NVIDIA RTX A6000", "vram": 49140 * 1024 * 1024}] * 2
+    assert info["ram"] > 0
+
+
+def test_cached_until_driver_changes(probe, bin_dir, smi_log):
+    _fake_nvidia_smi(bin_dir, smi_log)
+    first = probe().get_info()
+    calls = _probe_calls(smi_log)
+    assert calls
+
+    assert probe().get_info() == first
+    assert _probe_calls(smi_log) == calls
+
+    # a driver update replaces the tool
+    _fake_nvidia_smi(bin_dir, smi_log, gpus=1, cuda_version="12.8")
+    info = probe().get_info()
+    assert _probe_calls(smi_log) > calls
+    assert info["cuda_version"] == "12.8"
+    assert len(info["gpus"]) == 1
+
+
+def test_failing_tool_falls_back_to_cpu(probe, bin_dir, smi_log, monkeypatch):
+    monkeypatch.setattr(sys, "platform", "linux")
+    _fake_nvidia_smi(bin_dir, smi_log, exit_code=9)
+    info = probe().get_info()
+    assert info["vendor"] == "cpu"
+    assert info["gpus"] == []
+
+
+@pytest.mark.parametrize("info, kwargs, expected", [
+    ({"vendor": "nvidia", "cuda_version": "12.6"}, {}, "cu124"),
+    ({"vendor": "nvidia", "cuda_version": "13.0"}, {}, "cu128"),
+    ({"vendor": "nvidia", "cuda_version": "11.0"}, {}, "pypi"),
+    ({"vendor": "nvidia", "cuda_version": "12.6"}, {"nightly": True}, "nightly/cu124"),
+    ({"vendor": "nvidia", "cuda_version": "12.0"}, {"nightly": True}, "cu118"),
+    ({"vendor": "nvidia", "cuda_version": "12.6"}, {"cpu": True}, "cpu"),
+    ({"vendor": "amd", "rocm_version": "6.3"}, {}, "rocm6.2"),
+    ({"vendor": "cpu"}, {}, "cpu"),
+    ({"vendor": "apple"}, {}, "pypi"),
+])
+def test_select_torch_index(info, kwargs, expected):
+    entry, url = select_torch_index(info, INDICES, **kwargs)
+    assert url == expected
+    assert entry["stable_url"] == expected or entry["nightly_url"] == expected
@@ -0,0 +1,168 @@
+import sys
+import json
+
+import pytest
+
+from conftest import write_executable
+from ayon_comfyui.lib.launcher import LaunchEngine, ensure_uv
+from ayon_comfyui.lib.manifest import get_dependencies_stamp
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32", reason="stub executables are scripts with a shebang"
+)
+
+STUB_UV = f"""#!{sys.executable}
+import os, sys, json
+with open(os.environ["STUB_UV_LOG"], "a") as f:
+    f.write(json.dumps({{"argv": sys.argv[1:], "cwd": os.getcwd()}}) + "\\n")
+sys.exit(int(os.environ.get("STUB_UV_EXIT", "0")))
+"""
+TORCH_INDEX = "https://download.pytorch.org/whl/cu128"
+
+
+class StubUv:
+    def __init__(self, path, log_path):
+        self.path = path
+        self.log_path = log_path
+
+    def calls(self) -> list[dict]:
+        if not self.log_path.exists():
+            return []
+        return [json.loads(line) for line in self.log_path.read_text().splitlines()]
+
+    def argvs(self) -> list[list[str]]:
+        return [call["argv"] for call in self.calls()]
+
+
+@pytest.fixture
+def stub_uv(tmp_path, bin_dir, monkeypatch):
+    log_path = tmp_path / "uv_calls.jsonl"
+    monkeypatch.setenv("STUB_UV_LOG", log_path.as_posix())
+    monkeypatch.delenv("STUB_UV_EXIT", raising=False)
+    return StubUv(write_executable(bin_dir / "uv", STUB_UV), log_path)
+
+
+@pytest.fixture
+def comfy_root(tmp_path):
+    root = tmp_path / "comfyui"
+    (root / "custom_nodes").mkdir(parents=True)
+    (root / "requirements.txt").write_text("numpy\n")
+    return root
+
+
+def _engine(comfy_root, stub_uv, **kwargs) -> LaunchEngine:
+    return LaunchEngine(comfy_root, ensure_uv(), python_version="3.12", **kwargs)
+
+
+def test_ensure_uv_finds_uv_on_path(stub_uv):
+    assert ensure_uv() == stub_uv.path.as_posix()
+
+
+def test_ensure_uv_without_install(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", tmp_path.as_posix())
+    with pytest.raises(RuntimeError):
+        ensure_uv(install=False)
+
+
+def test_create_venv(comfy_root, stub_uv):
+    engine = _engine(comfy_root, stub_uv)
+    engine.create_venv(relocatable=True)
+    venv = (comfy_root / ".venv").as_posix()
+    assert stub_uv.calls() == [{
+        "argv": ["venv", "--allow-existing", venv, "--relocatable", "--python", "3.12"],
+        "cwd": comfy_root.as_posix(),
+    }]
+
+
+def test_create_venv_failure(comfy_root, stub_uv, monkeypatch):
+    monkeypatch.setenv("STUB_UV_EXIT", "2")
+    with pytest.raises(RuntimeError):
+        _engine(comfy_root, stub_uv).create_venv()
+
+
+def test_install_torch_from_index(comfy_root, stub_uv):
+    engine = _engine(comfy_root, stub_uv, pypi_url=TORCH_INDEX, prerelease=True)
+    assert engine.install_torch()
+    assert stub_uv.argvs() == [[
+        "pip", "install", "--python", engine.python.as_posix(),
+        "torch", "torchvision", "torchaudio", "--index-url", TORCH_INDEX, "--pre",
+    ]]
+
+
+def test_install_requirements_keeps_pypi(comfy_root, stub_uv, tmp_path):
+    engine = _engine(comfy_root, stub_uv, pypi_url=TORCH_INDEX)
+    requirements = tmp_path / "requirements.ayon.txt"
+    assert engine.install_requirements(requirements)
+    assert stub_uv.argvs()[0][-5:] == [
+        requirements.as_posix(),
+        "--extra-index-url", TORCH_INDEX, "--index-strategy", "unsafe-best-match",
+    ]
+
+
+def test_install_uninstalls_dependencies_of_removed_plugins(comfy_root, stub_uv, tmp_path):
+    for plugin, requirements in (
+        ("kept", "shared\n"),
+        ("removed", "shared\nnumpy\nonly-removed>=1.0\n"),
+    ):
+        (comfy_root / "custom_nodes" / plugin).mkdir()
+        (comfy_root / "custom_nodes" / plugin / "requirements.txt").write_text(requirements)
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"packages": ["numpy", "torch"]}))
+    merged = tmp_path / "requirements.ayon.txt"
+
+    engine = _engine(comfy_root, stub_uv)
+    assert engine.install(merged, ["kept"], baseline_file=baseline)
+
+    assert not (comfy_root / "custom_nodes" / "removed").exists()
+    commands = [argv[:2] + argv[4:] for argv in stub_uv.argvs()]
+    assert commands == [
+        ["pip", "install", "torch", "torchvision", "torchaudio"],
+        ["pip", "uninstall", "only-removed"],
+        ["pip", "install", "-r", merged.as_posix()],
+    ]
+
+
+def test_install_reports_failed_steps(comfy_root, stub_uv, tmp_path, monkeypatch):
+    monkeypatch.setenv("STUB_UV_EXIT", "1")
+    engine = _engine(comfy_root, stub_uv)
+    assert not engine.install(tmp_path / "requirements.ayon.txt", [])
+    assert not engine.sync(tmp_path / "requirements.ayon.lock")
+
+
+def test_sync_from_lockfile(comfy_root, stub_uv, tmp_path):
+    engine = _engine(comfy_root, stub_uv)
+    lock_file = tmp_path / "comfyui.requirements.ayon.lock"
+    assert engine.sync(lock_file)
+    assert stub_uv.argvs() == [[
+        "pip", "sync", "--python", engine.python.as_posix(), lock_file.as_posix(),
+        "--index-strategy", "unsafe-best-match",
+    ]]
+
+
+def test_stamp(comfy_root, stub_uv):
+    engine = _engine(comfy_root, stub_uv)
+    engine.venv_dir.mkdir()
+    assert get_dependencies_stamp(engine.venv_dir) is None
+    engine.write_stamp("fingerprint")
+    assert get_dependencies_stamp(engine.venv_dir) == "fingerprint"
+
+
+def test_server_command(comfy_root, stub_uv, monkeypatch):
+    monkeypatch.setenv("PYTHONPATH", "/somewhere")
+    engine = _engine(comfy_root, stub_uv)
+    flags = ["--preview-method", "auto", "--output-directory", "/with space"]
+    assert engine.get_server_command(flags) == [engine.python.as_posix(), "main.py", *flags]
+
+    env = engine.get_server_env()
+    assert "PYTHONPATH" not in env
+    assert env["VIRTUAL_ENV"] == engine.venv_dir.as_posix()
+    assert env["PATH"].split(":")[0] == engine.python.parent.as_posix()
+
+
+def test_popen_kwargs_detach_and_log(comfy_root, stub_uv):
+    engine = _engine(comfy_root, stub_uv)
+    with engine.open_server_log() as log_file:
+        kwargs = engine.get_popen_kwargs(log_file)
+    assert kwargs["cwd"] == comfy_root
+    assert kwargs["stdout"] is log_file
+    assert kwargs["start_new_session"]
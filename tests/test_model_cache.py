@@ -0,0 +1,95 @@
+import os
+import json
+import threading
+
+from ayon_comfyui.lib.model_cache import CACHE_INDEX_FILENAME, LocalModelCache
+from ayon_comfyui.lib.models import LOCK_SUFFIX
+
+GIB = 1024 ** 3
+
+
+def _make_source(root, files: dict[str, bytes]) -> dict[str, tuple[int, int]]:
+    stats = {}
+    for rel_path, content in files.items():
+        path = root / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+        stat = path.stat()
+        stats[rel_path] = (stat.st_size, stat.st_mtime_ns)
+    return stats
+
+
+def test_concurrent_fills_share_the_cache(tmp_path):
+    source_a = tmp_path / "project_a"
+    source_b = tmp_path / "project_b"
+    shared = {f"checkpoints/model_{i}.safetensors": os.urandom(256 * 1024) for i in range(8)}
+    files_a = _make_source(source_a, shared)
+    files_b = _make_source(source_b, {"loras/style.safetensors": b"lora"})
+    cache_root = tmp_path / "cache"
+
+    caches = [LocalModelCache(cache_root, GIB) for _ in range(3)]
+    sources = [
+        [(source_a, files_a)],
+        [(source_a, files_a)],
+        [(source_b, files_b), (source_a, files_a)],
+    ]
+    threads = [
+        threading.Thread(target=cache.fill, args=(cache_sources,))
+        for cache, cache_sources in zip(caches, sources)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    cache = caches[0]
+    for rel_path, content in shared.items():
+        assert (cache.source_dir(source_a) / rel_path).read_bytes() == content
+    assert (cache.source_dir(source_b) / "loras/style.safetensors").read_bytes() == b"lora"
+
+    # every fill's entries survive in the merged index
+    index = json.loads((cache_root / CACHE_INDEX_FILENAME).read_text())["files"]
+    expected = {f"{cache.source_dir(source_a).name}/{rel_path}" for rel_path in shared}
+    expected.add(f"{cache.source_dir(source_b).name}/loras/style.safetensors")
+    assert set(index) == expected
+    leftovers = [
+        path for path in cache_root.rglob(".*")
+        if path.name != CACHE_INDEX_FILENAME
+    ]
+    assert leftovers == []
+
+
+def test_file_locked_by_another_launch_is_skipped(tmp_path):
+    source = tmp_path / "project"
+    files = _make_source(source, {"vae/vae.safetensors": b"vae"})
+    cache = LocalModelCache(tmp_path / "cache", GIB)
+    dst = cache.source_dir(source) / "vae/vae.safetensors"
+    dst.parent.mkdir(parents=True)
+    lock_path = dst.with_name(f".{dst.name}{LOCK_SUFFIX}")
+    lock_path.touch()
+
+    stats = cache.fill([(source, files)])
+    assert stats["filled"] == 0
+    assert stats["skipped"] == 1
+    assert not dst.exists()
+    assert cache.entries == {}
+    assert lock_path.exists()
+
+    # picked up once the other launch is gone
+    lock_path.unlink()
+    assert LocalModelCache(cache.root, GIB).fill([(source, files)])["filled"] == 1
+    assert dst.read_bytes() == b"vae"
+
+
+def test_removed_entries_are_dropped_from_the_index(tmp_path):
+    source = tmp_path / "project"
+    files = _make_source(source, {"a.safetensors": b"a", "b.safetensors": b"b"})
+    cache = LocalModelCache(tmp_path / "cache", GIB)
+    cache.fill([(source, files)])
+    assert len(cache.entries) == 2
+
+    (cache.source_dir(source) / "a.safetensors").unlink()
+    other = LocalModelCache(cache.root, GIB)
+    other.fill([])
+    index = json.loads(other.index_path.read_text())["files"]
+    assert list(index) == [f"{cache.source_dir(source).name}/b.safetensors"]